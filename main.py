@@ -4,6 +4,7 @@ LKS POS System - Single Window Application
 
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QTranslator, QLocale
 from PySide6.QtGui import QIcon, QFont
@@ -53,8 +54,16 @@ class POSApplication:
         self.main_app = MainApplication()
         self.main_app.show()
         
-        return self.app.exec()
+        exit_code = self.app.exec()
+        
+        # Release pooled database connections
+        self.main_app.db_manager.close()
+        self.db_manager.close()
+        
+        return exit_code
 
 if __name__ == "__main__":
+    # Import workers are spawned processes; needed for frozen (packaged) builds
+    multiprocessing.freeze_support()
     app = POSApplication()
     sys.exit(app.run())
@@ -0,0 +1,93 @@
+"""
+Activity Logger - Write-behind queue for activity_logs inserts
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+class ActivityLogger:
+    """Background thread that batches activity log rows into periodic transactions.
+
+    Entries are timestamped when they are logged, not when they are
+    written. When the queue is full the entry is written synchronously
+    instead, so audit records are never dropped.
+    """
+
+    def __init__(self, db_manager, flush_interval: float = 0.25,
+                 max_batch: int = 500, max_queue: int = 10000):
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ActivityLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, user_id: int, action: str, details: str = "", ip_address: str = ""):
+        """Queue an activity entry"""
+        entry = (user_id, action, details, ip_address,
+                 datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+
+        if self._stopping:
+            self._write([entry])
+            return
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._write([entry])
+
+    def flush(self):
+        """Block until every queued entry has been written"""
+        self._queue.join()
+
+    def stop(self):
+        """Write all pending entries and stop the logger thread"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            first = self._queue.get()
+            batch = [] if first is None else [first]
+            running = first is not None
+            deadline = time.monotonic() + self.flush_interval
+
+            # Everything logged within the interval goes into one transaction
+            while running and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    running = False
+                    break
+                batch.append(entry)
+
+            if batch:
+                self._write(batch)
+
+            # One task_done per entry, plus one for the stop sentinel
+            for _ in range(len(batch) + (0 if running else 1)):
+                self._queue.task_done()
+
+        self.db_manager.release_connection()
+
+    def _write(self, batch):
+        try:
+            with self.db_manager.transaction() as conn:
+                conn.executemany('''
+                    INSERT INTO activity_logs (user_id, action, details, ip_address, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', batch)
+        except Exception as e:
+            print(f"Error writing activity log: {e}")
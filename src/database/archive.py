@@ -0,0 +1,189 @@
+"""
+Sales Archive - Move closed years of sales history into per-year database files
+"""
+
+import glob
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from .backup import BackupError, check_integrity, create_backup, uncompressed
+
+# sale_items rows follow their sale; the others are split on created_at
+ARCHIVED_TABLES = ("sales", "sale_items", "activity_logs")
+
+ARCHIVE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_sales_created_at ON sales (created_at)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_sale_items_sale_id ON sale_items (sale_id)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_activity_logs_created_at ON activity_logs (created_at)",
+)
+
+# Sales (with their items) or log entries moved per transaction
+ARCHIVE_BATCH_SIZE = 1000
+
+_ARCHIVE_SCHEMA = re.compile(r"^archive_\d{4}$")
+_ARCHIVE_COPY = re.compile(r"_archive_(\d{4})\.db(\.gz)?$")
+
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?", re.IGNORECASE)
+
+def archive_path(db_path: str, year: int) -> str:
+    """Return the archive file for a year, next to the main database"""
+    return f"{os.path.splitext(db_path)[0]}_archive_{year}.db"
+
+def archive_schema(year: int) -> str:
+    """Return the schema name an archive is attached under"""
+    return f"archive_{year}"
+
+def archived_years(db_path: str) -> List[int]:
+    """Return the years that have an archive file"""
+    pattern = re.compile(r"_archive_(\d{4})\.db$")
+    years = []
+    for path in glob.glob(glob.escape(os.path.splitext(db_path)[0]) + "_archive_*.db"):
+        match = pattern.search(path)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+class ArchiveError(Exception):
+    """Raised when archived sales a query needs cannot be reached"""
+
+def attach_archives(conn: sqlite3.Connection, db_path: str, years) -> List[str]:
+    """ATTACH the archives for the given years (if they exist) and return their schema names"""
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    available = set(archived_years(db_path))
+
+    schemas = []
+    for year in sorted(set(years) & available):
+        schema = archive_schema(year)
+        if schema not in attached:
+            try:
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (archive_path(db_path, year),))
+            except sqlite3.OperationalError as e:
+                # Inside a transaction, or SQLITE_MAX_ATTACHED reached
+                detach_archives(conn, [schema for schema in schemas if schema not in attached])
+                raise ArchiveError(f"Could not attach sales archive {year}: {e}") from e
+        schemas.append(schema)
+    return schemas
+
+def detach_archives(conn: sqlite3.Connection, schemas: List[str] = None):
+    """DETACH the given archive schemas (default: every attached archive)"""
+    if schemas is None:
+        schemas = [row[1] for row in conn.execute("PRAGMA database_list").fetchall()
+                   if _ARCHIVE_SCHEMA.match(row[1])]
+    for schema in schemas:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+def archive_copies(backup_path: str) -> Dict[int, str]:
+    """Return {year: path} of the archive copies saved next to a .db or .db.gz backup"""
+    base = os.path.splitext(backup_path[:-3] if backup_path.endswith(".gz") else backup_path)[0]
+    copies = {}
+    for path in glob.glob(glob.escape(base) + "_archive_*.db*"):
+        match = _ARCHIVE_COPY.search(path)
+        if match:
+            copies[int(match.group(1))] = path
+    return copies
+
+def backup_archives(db_path: str, dest_path: str) -> List[str]:
+    """Back up every archive next to dest_path (see backup.create_backup); returns the copies"""
+    return [create_backup(archive_path(db_path, year), archive_path(dest_path, year))['path']
+            for year in archived_years(db_path)]
+
+def restore_archives(db_path: str, backup_path: str) -> List[int]:
+    """Copy the archives saved with a backup over the live ones; returns their years.
+
+    Live archives the backup has no copy of are kept: their sales may also
+    be back in the restored main database, which reports count once.
+    """
+    years = []
+    for year, path in sorted(archive_copies(backup_path).items()):
+        with uncompressed(path) as plain:
+            integrity = check_integrity(plain)
+            if integrity != "ok":
+                raise BackupError(f"Archive {year} failed integrity check: {integrity}")
+
+            source = sqlite3.connect(plain)
+            dest = sqlite3.connect(archive_path(db_path, year))
+            try:
+                source.backup(dest)
+            except sqlite3.Error as e:
+                raise BackupError(f"Restoring archive {year} failed: {e}") from e
+            finally:
+                source.close()
+                dest.close()
+        years.append(year)
+    return years
+
+def _move_rows(conn: sqlite3.Connection, schema: str, table: str, where: str, params) -> Tuple[int, int]:
+    """Copy the matching rows of a table into the archive, then delete them; return (copied, deleted)"""
+    copied = conn.execute(f"INSERT OR IGNORE INTO {schema}.{table} SELECT * FROM main.{table} WHERE {where}",
+                          params).rowcount
+    deleted = conn.execute(f"DELETE FROM main.{table} WHERE {where}", params).rowcount
+    return copied, deleted
+
+def archive_year(db_manager, year: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, int]:
+    """Move one year of sales, sale items and activity logs into its archive.
+
+    Rows move ``batch_size`` sales (with their items) or log entries at a
+    time, each batch in its own short transaction, so checkouts on other
+    lanes never wait long for the write lock. Rows are copied with INSERT
+    OR IGNORE before they are deleted, so if a crash leaves the two files
+    out of step, simply running the job again finishes the move without
+    duplicating or losing rows.
+    """
+    schema = archive_schema(year)
+    start, end = f"{year}-01-01", f"{year + 1}-01-01"
+
+    conn = db_manager.get_connection()
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (archive_path(db_manager.db_path, year),))
+    try:
+        with db_manager.transaction(immediate=True):
+            for table in ARCHIVED_TABLES:
+                sql = conn.execute(
+                    "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()[0]
+                conn.execute(_CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {schema}.", sql, count=1))
+            for statement in ARCHIVE_INDEXES:
+                conn.execute(statement.format(schema=schema))
+
+        moved = {'sale_items': 0, 'sales': 0, 'activity_logs': 0}
+        params = (start, end, batch_size)
+        for table in ("sales", "activity_logs"):
+            batch = f"SELECT id FROM main.{table} WHERE created_at >= ? AND created_at < ? ORDER BY id LIMIT ?"
+            while True:
+                with db_manager.transaction(immediate=True):
+                    if table == "sales":
+                        # Items first, while their sales still select the batch
+                        copied, _ = _move_rows(conn, schema, "sale_items", f"sale_id IN ({batch})", params)
+                        moved['sale_items'] += copied
+                    copied, deleted = _move_rows(conn, schema, table, f"id IN ({batch})", params)
+                    moved[table] += copied
+                if deleted < batch_size:
+                    break
+    finally:
+        conn.execute(f"DETACH DATABASE {schema}")
+        conn.close()
+
+    return moved
+
+def archive_closed_years(db_manager, keep_years: int = 1, today: datetime = None,
+                         batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[int, Dict[str, int]]:
+    """Archive every year older than the last ``keep_years`` (current year included)"""
+    today = today or datetime.utcnow()
+    first_kept_year = today.year - max(keep_years, 1) + 1
+
+    conn = db_manager.get_connection()
+    cutoff = f"{first_kept_year}-01-01"
+    years = [int(row[0]) for row in conn.execute('''
+        SELECT DISTINCT substr(created_at, 1, 4) FROM sales WHERE created_at < ?
+        UNION
+        SELECT DISTINCT substr(created_at, 1, 4) FROM activity_logs WHERE created_at < ?
+    ''', (cutoff, cutoff))]
+    conn.close()
+
+    results = {}
+    for year in sorted(years):
+        results[year] = archive_year(db_manager, year, batch_size)
+        print(f"Archived {year}: {results[year]}")
+    return results
@@ -0,0 +1,77 @@
+"""
+Async Database - Run DatabaseManager calls on a worker pool and return futures
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+
+class RequestCancelled(Exception):
+    """Set on a request that was superseded or cancelled while it was running"""
+
+class AsyncDatabase:
+    """Non-blocking facade over a DatabaseManager.
+
+    ``submit("get_products")`` runs ``db_manager.get_products()`` on a worker
+    thread and returns a Future. Requests submitted with a ``key`` replace
+    the previous request with the same key: a pending one is cancelled, a
+    running one finishes but its future fails with RequestCancelled, so a
+    slow, stale result never overwrites a newer one.
+    """
+
+    def __init__(self, db_manager, max_workers: int = 2):
+        self.db_manager = db_manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="DatabaseWorker")
+        self._latest: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, method: str, *args, key: str = None, **kwargs) -> Future:
+        """Queue db_manager.<method>(*args, **kwargs)"""
+        future = Future()
+        with self._lock:
+            if key is not None:
+                previous = self._latest.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._latest[key] = future
+
+        self._executor.submit(self._run, future, key, method, args, kwargs)
+        return future
+
+    def cancel(self, key: str):
+        """Cancel the outstanding request for a key"""
+        with self._lock:
+            future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self):
+        """Cancel queued requests and wait for running ones"""
+        with self._lock:
+            pending, self._latest = list(self._latest.values()), {}
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _run(self, future: Future, key: str, method: str, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = getattr(self.db_manager, method)(*args, **kwargs)
+            error = None
+        except Exception as e:
+            result, error = None, e
+
+        with self._lock:
+            stale = key is not None and self._latest.get(key) is not future
+            if key is not None and not stale:
+                del self._latest[key]
+
+        if stale:
+            future.set_exception(RequestCancelled(f"{method} request was superseded"))
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,178 @@
+"""
+Backup - Online backups through the SQLite backup API
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Pages copied per backup step; the source read lock is released in between
+BACKUP_STEP_PAGES = 1024
+
+# Tables a backup must contain to be restorable
+REQUIRED_TABLES = ("users", "categories", "products", "sales", "sale_items",
+                   "settings", "activity_logs")
+
+class BackupError(Exception):
+    """Raised when a backup cannot be created or fails verification"""
+
+def check_integrity(path: str) -> str:
+    """Run PRAGMA integrity_check on a database file ('ok' when healthy)"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+        return "; ".join(row[0] for row in rows)
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        conn.close()
+
+def create_backup(db_path: str, dest_path: str,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  pages: int = BACKUP_STEP_PAGES, sleep: float = 0.0) -> Dict:
+    """Copy a live database to dest_path as a consistent snapshot.
+
+    The copy runs in page-sized steps from a dedicated read transaction, so
+    writers on other connections (WAL mode) keep going and the backup does
+    not restart when they commit. The result is integrity-checked before it
+    is moved into place; a failed backup never replaces an existing file.
+    ``progress(copied_pages, total_pages)`` is called after every step.
+    """
+    part_path = dest_path + ".part"
+    source = sqlite3.connect(db_path, isolation_level=None)
+    dest = sqlite3.connect(part_path)
+    try:
+        # Pin one snapshot for the whole copy
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        def on_step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
+        source.backup(dest, pages=pages, progress=on_step, sleep=sleep)
+        source.execute("COMMIT")
+
+        # The copy is a standalone file: no WAL sidecar to carry around
+        dest.execute("PRAGMA journal_mode = DELETE")
+        page_count = dest.execute("PRAGMA page_count").fetchone()[0]
+    except sqlite3.Error as e:
+        dest.close()
+        _remove(part_path)
+        raise BackupError(f"Backup failed: {e}") from e
+    finally:
+        source.close()
+    dest.close()
+
+    integrity = check_integrity(part_path)
+    if integrity != "ok":
+        _remove(part_path)
+        raise BackupError(f"Backup failed integrity check: {integrity}")
+
+    os.replace(part_path, dest_path)
+    return {
+        'path': dest_path,
+        'pages': page_count,
+        'size': os.path.getsize(dest_path),
+        'integrity': integrity,
+    }
+
+def validate_backup(path: str, latest_version: int) -> Dict:
+    """Check that a backup file can be restored.
+
+    Runs an integrity check, requires every core table and a schema version
+    no newer than ``latest_version``. Returns the schema version and the
+    row count of each table.
+    """
+    if not os.path.isfile(path):
+        raise BackupError(f"Backup file not found: {path}")
+
+    integrity = check_integrity(path)
+    if integrity != "ok":
+        raise BackupError(f"Backup failed integrity check: {integrity}")
+
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [table for table in REQUIRED_TABLES if table not in tables]
+        if missing:
+            raise BackupError(f"Not a POS backup, missing tables: {', '.join(missing)}")
+
+        version = 0
+        if "schema_version" in tables:
+            version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+        if version > latest_version:
+            raise BackupError(f"Backup schema version {version} is newer than this "
+                              f"application (version {latest_version})")
+
+        row_counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in REQUIRED_TABLES}
+    except sqlite3.Error as e:
+        raise BackupError(f"Unreadable backup: {e}") from e
+    finally:
+        conn.close()
+
+    return {'schema_version': version, 'row_counts': row_counts, 'integrity': integrity}
+
+@contextmanager
+def uncompressed(path: str):
+    """Yield a plain database path for a .db or .db.gz backup"""
+    if not path.endswith(".gz"):
+        yield path
+        return
+
+    fd, temp_path = tempfile.mkstemp(suffix=".db")
+    try:
+        try:
+            with os.fdopen(fd, "wb") as out, gzip.open(path, "rb") as src:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+        except (OSError, EOFError) as e:
+            raise BackupError(f"Cannot decompress backup: {e}") from e
+        yield temp_path
+    finally:
+        _remove(temp_path)
+
+def restore_database(db_path: str, backup_path: str, latest_version: int,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     busy_timeout: float = 10.0) -> Dict:
+    """Validate a backup and copy it into the live database.
+
+    The copy goes through the backup API into the live file, so other
+    connections stay open: they keep reading the old data until the copy
+    commits and then see the restored data. The current data is saved to
+    ``<db_path>.pre-restore`` first.
+    """
+    with uncompressed(backup_path) as path:
+        info = validate_backup(path, latest_version)
+
+        safety_path = db_path + ".pre-restore"
+        create_backup(db_path, safety_path)
+
+        source = sqlite3.connect(path)
+        dest = sqlite3.connect(db_path, timeout=busy_timeout)
+        try:
+            def on_step(status, remaining, total):
+                if progress is not None:
+                    progress(total - remaining, total)
+
+            source.backup(dest, pages=BACKUP_STEP_PAGES, progress=on_step)
+        except sqlite3.Error as e:
+            raise BackupError(f"Restore failed, current data kept: {e}") from e
+        finally:
+            source.close()
+            dest.close()
+
+    info['safety_backup'] = safety_path
+    return info
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
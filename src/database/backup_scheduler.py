@@ -0,0 +1,177 @@
+"""
+Backup Scheduler - Periodic compressed backups with hourly/daily/weekly retention
+"""
+
+import gzip
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .archive import archive_copies, backup_archives
+from .backup import create_backup
+
+BACKUP_PREFIX = "pos_backup_"
+_BACKUP_NAME = re.compile(r"^pos_backup_(\d{8}_\d{6})\.db(\.gz)?$")
+
+# A sale within this many seconds counts as "register busy"
+SALES_ACTIVE_WINDOW = 30.0
+
+def parse_backup_settings(settings: Dict[str, Optional[str]]) -> Dict:
+    """Read the auto_backup_* settings (missing ones take their defaults).
+
+    Returns ``interval_hours`` (0 = off), ``backup_dir``, ``compress`` and
+    the ``keep_hourly``/``keep_daily``/``keep_weekly`` limits. Raises
+    ValueError on a malformed value.
+    """
+    interval_hours = float(settings.get("auto_backup_interval_hours") or 1)
+    keep = [int(n) for n in (settings.get("auto_backup_keep") or "24,7,4").split(",")]
+    if not math.isfinite(interval_hours) or interval_hours < 0:
+        raise ValueError(f"bad backup interval: {interval_hours}")
+    if len(keep) != 3 or min(keep) < 0:
+        raise ValueError(f"auto_backup_keep needs three counts, got {settings.get('auto_backup_keep')!r}")
+
+    return {
+        'interval_hours': interval_hours,
+        'backup_dir': settings.get("auto_backup_dir") or "backups",
+        'compress': settings.get("auto_backup_compress") != "0",
+        'keep_hourly': keep[0],
+        'keep_daily': keep[1],
+        'keep_weekly': keep[2],
+    }
+
+class BackupScheduler:
+    """Background thread that takes an online backup every ``interval`` seconds.
+
+    While sales are being written, the copy and compression pause between
+    steps, so the register never competes with a full-speed disk copy.
+    Old backups are pruned grandfather-father-son style: the newest backup
+    of each of the last ``keep_hourly`` hours, ``keep_daily`` days and
+    ``keep_weekly`` ISO weeks is kept, and the newest backup always is
+    (so all-zero limits keep just the latest). Sales archives are copied next to
+    each backup and pruned with it.
+    """
+
+    def __init__(self, db_manager, backup_dir: str = "backups", interval: float = 3600.0,
+                 compress: bool = True, keep_hourly: int = 24, keep_daily: int = 7,
+                 keep_weekly: int = 4, throttle_delay: float = 0.05):
+        self.db_manager = db_manager
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.compress = compress
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.throttle_delay = throttle_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="BackupScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler; a backup in progress is finished first"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+        self.db_manager.release_connection()
+
+    def run_once(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Take one backup, prune old ones and log the run; returns the backup path"""
+        now = now or datetime.now()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        db_path = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{now.strftime('%Y%m%d_%H%M%S')}.db")
+        started = time.monotonic()
+
+        try:
+            create_backup(self.db_manager.db_path, db_path,
+                          progress=lambda done, total: self._throttle())
+            archives = backup_archives(self.db_manager.db_path, db_path)
+            path = db_path
+            if self.compress:
+                path = db_path + ".gz"
+                for copy in [db_path] + archives:
+                    self._compress(copy, copy + ".gz")
+                    os.remove(copy)
+
+            removed = self.prune()
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self._log("auto_backup_created",
+                      f"{os.path.basename(path)} ({size_mb:.1f} MB, "
+                      f"{time.monotonic() - started:.1f}s, {len(removed)} old backups removed)")
+            return path
+
+        except Exception as e:
+            print(f"Automatic backup failed: {e}")
+            self._log("auto_backup_failed", str(e))
+            return None
+
+    def list_backups(self) -> List[Tuple[datetime, str]]:
+        """Return (timestamp, path) of every scheduled backup, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        backups = []
+        for name in os.listdir(self.backup_dir):
+            match = _BACKUP_NAME.match(name)
+            if match:
+                taken = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+                backups.append((taken, os.path.join(self.backup_dir, name)))
+        backups.sort(reverse=True)
+        return backups
+
+    def prune(self) -> List[str]:
+        """Delete backups outside the retention policy; returns removed paths"""
+        buckets = (
+            (self.keep_hourly, lambda t: t.strftime("%Y%m%d%H")),
+            (self.keep_daily, lambda t: t.strftime("%Y%m%d")),
+            (self.keep_weekly, lambda t: "%d-%02d" % t.isocalendar()[:2]),
+        )
+        backups = self.list_backups()
+        # Never delete the backup that was just taken
+        keep = {backups[0][1]} if backups else set()
+        for limit, bucket_of in buckets:
+            seen = set()
+            for taken, path in backups:
+                bucket = bucket_of(taken)
+                if bucket not in seen and len(seen) < limit:
+                    seen.add(bucket)
+                    keep.add(path)
+
+        removed = []
+        for _, path in backups:
+            if path not in keep:
+                for copy in archive_copies(path).values():
+                    os.remove(copy)
+                os.remove(path)
+                removed.append(path)
+        return removed
+
+    def _compress(self, source: str, dest: str):
+        part_path = dest + ".part"
+        with open(source, "rb") as src, gzip.open(part_path, "wb", compresslevel=6) as out:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+                self._throttle()
+        os.replace(part_path, dest)
+
+    def _throttle(self):
+        """Yield to the register while sales are being rung up"""
+        if time.monotonic() - self.db_manager.last_sale_at < SALES_ACTIVE_WINDOW:
+            time.sleep(self.throttle_delay)
+
+    def _log(self, action: str, details: str):
+        self.db_manager.log_system_activity(action, details)
@@ -5,13 +5,145 @@ Database Manager - Handles all database operations with bcrypt encryption
 import sqlite3
 import bcrypt
 import hashlib
+import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from .migrations import run_migrations, get_schema_version, LATEST_VERSION
+from .product_cache import get_product_cache
+from .settings_cache import get_settings_cache
+from .sale_writer import SaleWriter
+from .activity_logger import ActivityLogger
+from .async_database import AsyncDatabase
+from .query_profiler import QueryProfiler, ProfilingCursor, pass_through
+from .backup import create_backup, restore_database
+from .backup_scheduler import BackupScheduler, parse_backup_settings
+from .archive import (ArchiveError, archive_closed_years, attach_archives, backup_archives,
+                      detach_archives, restore_archives)
+from .maintenance import MaintenanceScheduler, run_maintenance
+from .records import Record, RecordFactory
+from .product_import import IMPORT_CHUNK_SIZE, ProductImporter, import_feed, load_checkpoint
+
+# PRAGMAs applied once to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    ("auto_vacuum", "INCREMENTAL"),  # only applies to new files; must precede WAL
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),        # ~16 MB page cache (negative = KiB)
+    ("mmap_size", 268435456),      # 256 MB memory-mapped I/O
+    ("temp_store", "MEMORY"),
+)
+# PRAGMAs for read-only snapshot connections (journal_mode is a property of the file)
+SNAPSHOT_PRAGMAS = (
+    ("query_only", "ON"),
+    ("cache_size", -16000),
+    ("mmap_size", 268435456),
+    ("temp_store", "MEMORY"),
+)
+STATEMENT_CACHE_SIZE = 256
+# Rows fetched per step by the lazy iter_* methods
+ITER_BATCH_SIZE = 500
+BUSY_TIMEOUT_SECONDS = 10.0
+
+# bcrypt cost factor; override with the "password_hash_rounds" setting
+DEFAULT_BCRYPT_ROUNDS = 12
+MIN_BCRYPT_ROUNDS = 4
+MAX_BCRYPT_ROUNDS = 31
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection owned by the DatabaseManager pool.
+
+    Callers keep using the classic ``conn = get_connection() ... conn.close()``
+    pattern; ``close()`` only discards uncommitted work that is not owned by
+    an enclosing ``DatabaseManager.transaction()`` block, and leaves the
+    underlying handle open for the next caller on the same thread.
+    """
+    
+    # Number of DatabaseManager.transaction() blocks currently open
+    transaction_depth = 0
+    # QueryProfiler, only set on ProfiledConnection
+    profiler = None
+    
+    def close(self):
+        """Return the connection to the pool"""
+        if self.in_transaction and not self.transaction_depth:
+            self.rollback()
+    
+    def dispose(self):
+        """Really close the underlying SQLite handle"""
+        super().close()
+
+class ProfiledConnection(PooledConnection):
+    """Pooled connection whose statements go through ProfilingCursor"""
+    
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+    
+    @pass_through
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    @pass_through
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class SnapshotConnection(PooledConnection):
+    """Read-only pooled connection for reports and exports.
+    
+    Opened with ``mode=ro`` and ``query_only=ON``. Inside
+    ``DatabaseManager.snapshot()`` it holds one WAL read transaction, so
+    every query sees the same committed state while checkouts keep writing
+    on the regular connections.
+    """
+
+class ProfiledSnapshotConnection(ProfiledConnection, SnapshotConnection):
+    """Snapshot connection whose statements go through ProfilingCursor"""
+
+class _ConnectionToken:
+    """Lives in a thread's locals next to its pooled connection (see DatabaseManager._add_to_pool)"""
+    
+    __slots__ = ('__weakref__',)
+
+def _discard_connection(pool: list, lock: threading.Lock, conn: PooledConnection):
+    """Close a thread's connection once its locals are gone"""
+    conn.dispose()
+    with lock:
+        if conn in pool:
+            pool.remove(conn)
+
+class InsufficientStockError(Exception):
+    """Raised when a sale would drive product stock below zero"""
+    
+    def __init__(self, failures: List[Dict]):
+        self.failures = failures
+        lines = [f"{f['name'] or f['product_id']}: requested {f['requested']}, available {f['available']}"
+                 for f in failures]
+        super().__init__("Insufficient stock for " + "; ".join(lines))
 
 class DatabaseManager:
     def __init__(self, db_path: str = "pos_system.db"):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        self.product_cache = get_product_cache(db_path)
+        self.settings_cache = get_settings_cache(db_path)
+        self.sale_writer = None
+        self.activity_logger = None
+        self._password_upgrader = None
+        self._async = None
+        self.profiler = None
+        self.backup_scheduler = None
+        self.maintenance_scheduler = None
+        # time.monotonic() of the last committed sale (backup throttling)
+        self.last_sale_at = 0.0
         self.init_database()
         print(f"Database initialized at: {os.path.abspath(self.db_path)}")
     
@@ -22,14 +154,297 @@ class DatabaseManager:
             os.makedirs(db_dir, exist_ok=True)
     
     def get_connection(self):
-        """Get database connection"""
+        """Get the pooled database connection for the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            if conn.profiler is not self.profiler:
+                self._switch_profiling(conn, PooledConnection, ProfiledConnection)
+            return conn
+        
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path,
+                                   timeout=BUSY_TIMEOUT_SECONDS,
+                                   # Each thread only ever uses its own connection;
+                                   # this just lets close() dispose of them all.
+                                   check_same_thread=False,
+                                   factory=PooledConnection if self.profiler is None else ProfiledConnection,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.profiler = self.profiler
             conn.row_factory = sqlite3.Row
+            self._apply_pragmas(conn)
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            raise
+        
+        self._add_to_pool(conn, 'conn')
+        return conn
+    
+    def get_read_connection(self) -> SnapshotConnection:
+        """Get the read-only snapshot connection for the calling thread"""
+        conn = getattr(self._local, 'read_conn', None)
+        if conn is not None:
+            if conn.profiler is not self.profiler:
+                self._switch_profiling(conn, SnapshotConnection, ProfiledSnapshotConnection)
             return conn
+        
+        try:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True,
+                                   timeout=BUSY_TIMEOUT_SECONDS,
+                                   check_same_thread=False,
+                                   factory=SnapshotConnection if self.profiler is None
+                                   else ProfiledSnapshotConnection,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.profiler = self.profiler
+            conn.row_factory = sqlite3.Row
+            self._apply_pragmas(conn, SNAPSHOT_PRAGMAS)
         except Exception as e:
             print(f"Database connection error: {e}")
             raise
+        
+        self._add_to_pool(conn, 'read_conn')
+        return conn
+    
+    def _switch_profiling(self, conn: PooledConnection, plain: type, profiled: type):
+        """Follow an enable/disable_query_profiler() call on an open connection.
+        
+        Callers may still hold the handle, so it is not replaced: it changes
+        class in place (the classes only differ in Python methods).
+        """
+        conn.__class__ = plain if self.profiler is None else profiled
+        conn.profiler = self.profiler
+    
+    def _add_to_pool(self, conn: PooledConnection, attr: str):
+        """Make conn the calling thread's connection (``attr`` of the thread locals).
+        
+        Python drops a thread's locals when its thread state goes away: at
+        thread exit, or for threads Python did not start (QThreadPool
+        workers) possibly after every call into Python. A token kept next
+        to the connection closes it at that point, so worker threads never
+        leave connections in the pool until shutdown.
+        """
+        token = _ConnectionToken()
+        weakref.finalize(token, _discard_connection, self._connections, self._pool_lock, conn)
+        with self._pool_lock:
+            self._connections.append(conn)
+        setattr(self._local, attr, conn)
+        setattr(self._local, attr + '_token', token)
+    
+    @contextmanager
+    def snapshot(self):
+        """Read a consistent point-in-time view of the database.
+        
+        Every query in the block (through the yielded connection, or through
+        read methods such as get_products()) sees the database as it was when
+        the block started. Nothing is locked against writers: in WAL mode a
+        sale commits while a month-end report is still running. Nested (or
+        interleaved, as with the iter_* generators) use shares one snapshot,
+        which ends when the last block exits.
+        """
+        conn = self.get_read_connection()
+        if not conn.transaction_depth:
+            conn.execute("BEGIN")
+            # The WAL read mark is taken on the first read, not on BEGIN
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        finally:
+            conn.transaction_depth -= 1
+            if not conn.transaction_depth:
+                conn.rollback()
+                # Archives attached by _sales_source (DETACH needs the
+                # transaction closed)
+                detach_archives(conn)
+    
+    def _reader(self) -> sqlite3.Connection:
+        """Connection for read methods: the open snapshot if any, else the pooled one"""
+        conn = getattr(self._local, 'read_conn', None)
+        if conn is not None and conn.transaction_depth:
+            return conn
+        return self.get_connection()
+    
+    @staticmethod
+    def _fetch_rows(cursor: sqlite3.Cursor, compact: bool = False) -> list:
+        """Fetch an executed query as dicts, or as compact read-only Records"""
+        if compact:
+            cursor.row_factory = RecordFactory()
+            return cursor.fetchall()
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _iter_rows(cursor: sqlite3.Cursor) -> Iterator[Record]:
+        """Yield the Records of an executed query, ITER_BATCH_SIZE rows at a time"""
+        cursor.row_factory = RecordFactory()
+        try:
+            while True:
+                rows = cursor.fetchmany(ITER_BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    def _apply_pragmas(self, conn: sqlite3.Connection, pragmas=CONNECTION_PRAGMAS):
+        """Apply the connection tuning profile"""
+        for name, value in pragmas:
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.DatabaseError as e:
+                print(f"Could not apply PRAGMA {name}: {e}")
+    
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """Run a block of statements in a single transaction.
+        
+        Commits when the block exits normally and rolls back on error.
+        ``immediate=True`` takes the write lock up front (BEGIN IMMEDIATE).
+        Nested use inside an open transaction becomes a SAVEPOINT.
+        """
+        conn = self.get_connection()
+        depth = conn.transaction_depth
+        
+        if conn.in_transaction:
+            savepoint = f"sp_{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            conn.transaction_depth = depth + 1
+            try:
+                yield conn
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except BaseException:
+                conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                raise
+            finally:
+                conn.transaction_depth = depth
+            return
+        
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        conn.transaction_depth = depth + 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.transaction_depth = depth
+    
+    def enable_query_profiler(self, log_path: str = "slow_queries.log", threshold_ms: float = 100.0,
+                              sample_rate: float = 1.0) -> QueryProfiler:
+        """Time a sample of statements and log slow ones with their query plan.
+        
+        Each thread's connection switches over the next time it is fetched.
+        """
+        if self.profiler is None:
+            self.profiler = QueryProfiler(log_path, threshold_ms, sample_rate)
+        return self.profiler
+    
+    def disable_query_profiler(self):
+        """Stop profiling and close the slow-query log"""
+        if self.profiler is not None:
+            profiler, self.profiler = self.profiler, None
+            profiler.close()
+    
+    def release_connection(self):
+        """Close the calling thread's pooled connections (for worker threads)"""
+        for attr in ('conn', 'read_conn'):
+            setattr(self._local, attr, None)
+            # Dropping the token closes the connection (see _add_to_pool)
+            setattr(self._local, attr + '_token', None)
+    
+    def close(self):
+        """Close every pooled connection (call on application shutdown)"""
+        if self._async is not None:
+            async_db, self._async = self._async, None
+            async_db.shutdown()
+        self.disable_backup_scheduler()
+        self.disable_maintenance_scheduler()
+        self.disable_group_commit()
+        self.disable_async_logging()
+        self.disable_query_profiler()
+        if self._password_upgrader is not None:
+            upgrader, self._password_upgrader = self._password_upgrader, None
+            upgrader.shutdown(wait=True)
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.dispose()
+        self.product_cache.clear()
+        self.settings_cache.clear()
+        self._local = threading.local()
+    
+    def create_backup(self, dest_path: str, progress=None) -> Dict:
+        """Write an integrity-checked online backup of the database (see backup.create_backup)
+        
+        Sales archives are backed up next to it (see archive.backup_archives).
+        """
+        result = create_backup(self.db_path, dest_path, progress=progress)
+        result['archives'] = backup_archives(self.db_path, dest_path)
+        return result
+    
+    def restore_backup(self, backup_path: str, progress=None) -> Dict:
+        """Validate a backup and restore it into the live database.
+        
+        Open connections stay usable; afterwards pending migrations are
+        applied and every in-process cache is rebuilt from the restored data.
+        Sales archives saved with the backup are restored as well.
+        """
+        self.flush_activity_log()
+        was_cached = self.product_cache.loaded
+        
+        result = restore_database(self.db_path, backup_path, LATEST_VERSION, progress=progress)
+        result['archives'] = restore_archives(self.db_path, backup_path)
+        
+        self.migrate()
+        self.settings_cache.clear()
+        self.product_cache.clear()
+        if was_cached:
+            self.preload_product_cache()
+        return result
+    
+    def enable_backup_scheduler(self, **options) -> BackupScheduler:
+        """Start periodic automatic backups (options as for BackupScheduler)"""
+        if self.backup_scheduler is None:
+            self.backup_scheduler = BackupScheduler(self, **options)
+            self.backup_scheduler.start()
+        return self.backup_scheduler
+    
+    def disable_backup_scheduler(self):
+        """Stop automatic backups"""
+        if self.backup_scheduler is not None:
+            scheduler, self.backup_scheduler = self.backup_scheduler, None
+            scheduler.stop()
+    
+    def configure_backup_scheduler(self) -> Optional[BackupScheduler]:
+        """(Re)start automatic backups as configured in the auto_backup_* settings"""
+        settings = self.get_settings([
+            "auto_backup_interval_hours", "auto_backup_dir",
+            "auto_backup_compress", "auto_backup_keep"
+        ])
+        try:
+            options = parse_backup_settings(settings)
+        except ValueError as e:
+            print(f"Invalid automatic backup settings: {e}")
+            return self.backup_scheduler
+        
+        interval_hours = options.pop('interval_hours')
+        self.disable_backup_scheduler()
+        if interval_hours > 0:
+            return self.enable_backup_scheduler(interval=interval_hours * 3600, **options)
+        return None
+    
+    def submit(self, method: str, *args, key: str = None, **kwargs) -> Future:
+        """Run a DatabaseManager method on the worker pool (see AsyncDatabase)"""
+        if self._async is None:
+            self._async = AsyncDatabase(self)
+        return self._async.submit(method, *args, key=key, **kwargs)
+    
+    def cancel_request(self, key: str):
+        """Cancel the outstanding submit() request for a key"""
+        if self._async is not None:
+            self._async.cancel(key)
     
     def create_tables(self):
         """Create all necessary tables"""
@@ -159,10 +574,21 @@ class DatabaseManager:
             conn.close()
             print("Database tables created successfully!")
             
+            # Bring existing databases up to the current schema version
+            self.migrate()
+            
         except Exception as e:
             print(f"Error creating tables: {e}")
             raise
     
+    def migrate(self) -> List[int]:
+        """Apply pending schema migrations and return the applied versions"""
+        return run_migrations(self)
+    
+    def get_schema_version(self) -> int:
+        """Get the current schema version"""
+        return get_schema_version(self.get_connection())
+    
     def create_default_admin(self):
         """Create default admin user if not exists"""
         print("Checking for default admin user...")
@@ -206,7 +632,14 @@ class DatabaseManager:
                     ("company_phone", "+213-XXX-XXX-XXX", "Company phone number"),
                     ("company_email", "info@lkspos.com", "Company email"),
                     ("tax_rate", "0.0", "Tax rate percentage"),
-                    ("receipt_footer", "Thank you for your business!", "Receipt footer message")
+                    ("receipt_footer", "Thank you for your business!", "Receipt footer message"),
+                    ("password_hash_rounds", str(DEFAULT_BCRYPT_ROUNDS), "bcrypt cost factor for password hashes"),
+                    ("auto_backup_interval_hours", "1", "Hours between automatic backups (0 = off)"),
+                    ("auto_backup_dir", "backups", "Directory for automatic backups"),
+                    ("auto_backup_compress", "1", "Gzip automatic backups"),
+                    ("auto_backup_keep", "24,7,4", "Automatic backups kept: hourly,daily,weekly"),
+                    ("archive_keep_years", "0", "Years of sales kept in the main database (0 = never archive)"),
+                    ("maintenance_idle_minutes", "10", "Idle minutes before database maintenance runs (0 = off)")
                 ]
                 
                 cursor.executemany('''
@@ -214,6 +647,7 @@ class DatabaseManager:
                 ''', default_settings)
                 
                 conn.commit()
+                self.settings_cache.clear()
                 print("Default admin user and data created successfully!")
             else:
                 print("Admin user already exists")
@@ -236,9 +670,17 @@ class DatabaseManager:
             print(f"Error creating default admin: {e}")
             raise
     
+    def get_password_rounds(self) -> int:
+        """Return the configured bcrypt cost factor"""
+        try:
+            rounds = int(self.get_setting("password_hash_rounds") or DEFAULT_BCRYPT_ROUNDS)
+        except ValueError:
+            rounds = DEFAULT_BCRYPT_ROUNDS
+        return min(max(rounds, MIN_BCRYPT_ROUNDS), MAX_BCRYPT_ROUNDS)
+    
     def hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=self.get_password_rounds())
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
@@ -256,6 +698,28 @@ class DatabaseManager:
             print(f"Password verification error: {e}")
             return False
     
+    def password_needs_rehash(self, password_hash: str) -> bool:
+        """Check if a hash is legacy or weaker than the configured cost"""
+        if not password_hash.startswith('$2b$'):
+            return True
+        try:
+            return int(password_hash.split('$')[2]) < self.get_password_rounds()
+        except (IndexError, ValueError):
+            return True
+    
+    def _upgrade_password_hash(self, user_id: int, password: str, old_hash: str):
+        """Re-hash a password at the configured cost"""
+        try:
+            new_hash = self.hash_password(password)
+            with self.transaction() as conn:
+                # Skip if the password was changed in the meantime
+                conn.execute(
+                    "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                    (new_hash, user_id, old_hash)
+                )
+        except Exception as e:
+            print(f"Error upgrading password hash: {e}")
+    
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data"""
         print(f"Authenticating user: {username}")
@@ -286,8 +750,18 @@ class DatabaseManager:
                     # Log activity
                     self.log_activity(user['id'], "login", f"User {username} logged in")
                     
+                    # Upgrade weak hashes after the login result is returned
+                    if self.password_needs_rehash(user['password_hash']):
+                        if self._password_upgrader is None:
+                            self._password_upgrader = ThreadPoolExecutor(
+                                max_workers=1, thread_name_prefix="PasswordUpgrade")
+                        self._password_upgrader.submit(
+                            self._upgrade_password_hash, user['id'], password, user['password_hash'])
+                    
                     conn.close()
-                    return dict(user)
+                    user = dict(user)
+                    del user['password_hash']
+                    return user
                 else:
                     print("Password verification failed!")
             else:
@@ -300,45 +774,150 @@ class DatabaseManager:
             print(f"Authentication error: {e}")
             return None
     
+    def enable_async_logging(self, flush_interval: float = 0.25):
+        """Write activity log entries from a background thread"""
+        if self.activity_logger is None:
+            self.activity_logger = ActivityLogger(self, flush_interval=flush_interval)
+    
+    def disable_async_logging(self):
+        """Write pending entries and go back to synchronous logging"""
+        if self.activity_logger is not None:
+            logger, self.activity_logger = self.activity_logger, None
+            logger.stop()
+    
+    def flush_activity_log(self):
+        """Wait until every queued activity entry is in the database"""
+        if self.activity_logger is not None:
+            self.activity_logger.flush()
+    
     def log_activity(self, user_id: int, action: str, details: str = "", ip_address: str = ""):
         """Log user activity"""
+        logger = self.activity_logger
+        if logger is not None:
+            logger.log(user_id, action, details, ip_address)
+            return
+        
+        try:
+            with self.transaction() as conn:
+                self._insert_activity(conn, user_id, action, details, ip_address)
+        except Exception as e:
+            print(f"Error logging activity: {e}")
+    
+    def log_system_activity(self, action: str, details: str = ""):
+        """Log an action taken by a background job (attributed to the first admin)"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO activity_logs (user_id, action, details, ip_address)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, action, details, ip_address))
-            
-            conn.commit()
+            row = conn.execute(
+                "SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1"
+            ).fetchone()
             conn.close()
+            self.log_activity(row['id'] if row else 1, action, details)
         except Exception as e:
-            print(f"Error logging activity: {e}")
+            print(f"Error logging system activity: {e}")
+    
+    def _insert_activity(self, conn: sqlite3.Connection, user_id: int, action: str,
+                         details: str = "", ip_address: str = ""):
+        """Insert an activity log row inside the caller's transaction"""
+        conn.execute('''
+            INSERT INTO activity_logs (user_id, action, details, ip_address)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, action, details, ip_address))
+    
+    @staticmethod
+    def _products_query(search_term: str, category_id: int) -> Tuple[str, list]:
+        query = '''
+            SELECT p.*, c.name as category_name
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            WHERE p.is_active = 1
+        '''
+        params = []
+        
+        if search_term:
+            query += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
+            params.extend([f"%{search_term}%", f"%{search_term}%"])
+        
+        if category_id:
+            query += " AND p.category_id = ?"
+            params.append(category_id)
+        
+        query += " ORDER BY p.name"
+        return query, params
+    
+    def get_products(self, search_term: str = "", category_id: int = None,
+                     compact: bool = False) -> List[Dict]:
+        """Get products with optional search and category filter
+        
+        ``compact=True`` returns read-only Records instead of dicts.
+        """
+        try:
+            conn = self._reader()
+            cursor = conn.execute(*self._products_query(search_term, category_id))
+            products = self._fetch_rows(cursor, compact)
+            conn.close()
+            return products
+        except Exception as e:
+            print(f"Error getting products: {e}")
+            return []
+    
+    def iter_products(self, search_term: str = "", category_id: int = None) -> Iterator[Record]:
+        """Lazily yield products as Records from one snapshot (see get_products)"""
+        with self.snapshot() as conn:
+            yield from self._iter_rows(conn.execute(*self._products_query(search_term, category_id)))
     
-    def get_products(self, search_term: str = "", category_id: int = None) -> List[Dict]:
-        """Get products with optional search and category filter"""
+    @staticmethod
+    def _fts_match_expression(search_term: str) -> str:
+        """Build an FTS5 MATCH expression: every word must match as a prefix"""
+        terms = search_term.replace('"', ' ').split()
+        return " ".join(f'"{term}"*' for term in terms)
+    
+    def has_product_search_index(self) -> bool:
+        """Check whether the FTS5 product index is available"""
+        conn = self.get_connection()
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ).fetchone()
+        return row is not None
+    
+    def search_products(self, search_term: str, category_id: int = None,
+                        limit: int = 50) -> List[Dict]:
+        """Full-text product search over name, description, barcode and category
+        
+        Words are prefix-matched and results are ranked best match first.
+        Pass ``limit=None`` to get every match. Falls back to get_products()
+        when SQLite was built without FTS5.
+        """
+        match = self._fts_match_expression(search_term)
+        if not match:
+            return []
+        
+        if not self.has_product_search_index():
+            products = self.get_products(search_term, category_id)
+            return products[:limit] if limit is not None else products
+        
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
             query = '''
                 SELECT p.*, c.name as category_name
-                FROM products p
+                FROM products_fts f
+                JOIN products p ON p.id = f.rowid
                 LEFT JOIN categories c ON p.category_id = c.id
-                WHERE p.is_active = 1
+                WHERE products_fts MATCH ? AND p.is_active = 1
             '''
-            params = []
-            
-            if search_term:
-                query += " AND (p.name LIKE ? OR p.barcode LIKE ?)"
-                params.extend([f"%{search_term}%", f"%{search_term}%"])
+            params = [match]
             
             if category_id:
                 query += " AND p.category_id = ?"
                 params.append(category_id)
             
-            query += " ORDER BY p.name"
+            # Weight name and barcode hits above description/category hits
+            query += " ORDER BY bm25(products_fts, 10.0, 1.0, 10.0, 2.0)"
+            
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
             
             cursor.execute(query, params)
             products = [dict(row) for row in cursor.fetchall()]
@@ -346,11 +925,15 @@ class DatabaseManager:
             conn.close()
             return products
         except Exception as e:
-            print(f"Error getting products: {e}")
+            print(f"Error searching products: {e}")
             return []
     
     def get_product_by_barcode(self, barcode: str) -> Optional[Dict]:
-        """Get product by barcode"""
+        """Get product by barcode (served from the product cache when possible)"""
+        product = self.product_cache.get(barcode)
+        if product is not None:
+            return product
+        
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
@@ -365,13 +948,21 @@ class DatabaseManager:
             product = cursor.fetchone()
             conn.close()
             
-            return dict(product) if product else None
+            if not product:
+                return None
+            product = dict(product)
+            self.product_cache.put(product)
+            return dict(product)
         except Exception as e:
             print(f"Error getting product by barcode: {e}")
             return None
     
     def get_product_by_id(self, product_id: int) -> Optional[Dict]:
         """Get product by ID"""
+        product = self.product_cache.get_by_id(product_id)
+        if product is not None:
+            return product
+        
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
@@ -391,26 +982,227 @@ class DatabaseManager:
             print(f"Error getting product by ID: {e}")
             return None
     
+    def preload_product_cache(self):
+        """Load every active barcoded product into the scan cache"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT p.*, c.name as category_name
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                WHERE p.is_active = 1 AND p.barcode IS NOT NULL AND p.barcode != ''
+            ''')
+            
+            self.product_cache.load(dict(row) for row in cursor.fetchall())
+            conn.close()
+            print(f"Product cache loaded: {len(self.product_cache)} barcodes")
+        except Exception as e:
+            print(f"Error preloading product cache: {e}")
+    
+    def refresh_cached_products(self, product_ids: List[int]):
+        """Re-read products after a write so the cache matches the database"""
+        product_ids = list(set(product_ids))
+        if not product_ids:
+            return
+        
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            placeholders = ",".join("?" * len(product_ids))
+            cursor.execute(f'''
+                SELECT p.*, c.name as category_name
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                WHERE p.id IN ({placeholders})
+            ''', product_ids)
+            
+            for row in cursor.fetchall():
+                self.product_cache.put(dict(row))
+            conn.close()
+        except Exception as e:
+            # Never serve a stale product - drop what we could not refresh
+            print(f"Error refreshing product cache: {e}")
+            for product_id in product_ids:
+                self.product_cache.invalidate(product_id)
+    
+    def _reload_product_cache(self):
+        """Rebuild the cache after a change that affects many products"""
+        if self.product_cache.loaded:
+            self.preload_product_cache()
+        else:
+            self.product_cache.clear()
+    
+    def create_product(self, product_data: Dict) -> int:
+        """Create a new product"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO products (name, barcode, category_id, description, cost_price,
+                                    price, quantity, min_quantity, image_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                product_data['name'],
+                product_data.get('barcode') or None,
+                product_data.get('category_id'),
+                product_data.get('description', ''),
+                product_data.get('cost_price', 0),
+                product_data['price'],
+                product_data.get('quantity', 0),
+                product_data.get('min_quantity', 5),
+                product_data.get('image_path')
+            ))
+        
+        product_id = cursor.lastrowid
+        self.refresh_cached_products([product_id])
+        return product_id
+    
+    def import_products(self, rows, chunk_size: int = IMPORT_CHUNK_SIZE, upsert: bool = False) -> Dict:
+        """Bulk-import parsed product rows in chunked transactions.
+        
+        Returns {'imported', 'updated', 'unchanged', 'categories_created',
+        'error_count', 'errors'}, where each error is {'row', 'name', 'error'}.
+        With ``upsert`` rows matching an existing barcode update that
+        product (see product_import.ProductImporter).
+        """
+        try:
+            return ProductImporter(self, chunk_size, upsert=upsert).run(rows)
+        finally:
+            self._reload_product_cache()
+    
+    def import_product_feed(self, feed, progress=None, cancel=None, resume: bool = True,
+                            chunk_size: int = IMPORT_CHUNK_SIZE, upsert: bool = False) -> Dict:
+        """Stream a product file into the database with progress, cancel and resume
+        
+        See product_import.import_feed; the result also has 'cancelled' and
+        'resumed_after' (the last row imported before this run).
+        """
+        try:
+            return import_feed(self, feed, chunk_size, progress=progress, cancel=cancel, resume=resume,
+                               upsert=upsert)
+        finally:
+            self._reload_product_cache()
+    
+    def get_import_profiles(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """Return saved supplier column mappings as {name: {field: column header}}"""
+        try:
+            conn = self.get_connection()
+            rows = conn.execute("SELECT name, mapping FROM import_profiles ORDER BY name").fetchall()
+            conn.close()
+            return {row['name']: json.loads(row['mapping']) for row in rows}
+        except Exception as e:
+            print(f"Error getting import profiles: {e}")
+            return {}
+    
+    def save_import_profile(self, name: str, mapping: Dict[str, Optional[str]]):
+        """Save (or replace) a supplier's column mapping"""
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO import_profiles (name, mapping, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(name) DO UPDATE SET
+                    mapping = excluded.mapping,
+                    updated_at = excluded.updated_at
+            ''', (name, json.dumps(mapping, sort_keys=True)))
+    
+    def delete_import_profile(self, name: str):
+        """Delete a saved column mapping"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM import_profiles WHERE name = ?", (name,))
+    
+    def get_import_checkpoint(self, feed) -> Optional[Dict]:
+        """Return the resumable checkpoint of a feed (None if it changed or has none)"""
+        checkpoint = load_checkpoint(self, feed.source)
+        if checkpoint and checkpoint['fingerprint'] == feed.fingerprint():
+            return checkpoint
+        return None
+    
+    def update_product(self, product_id: int, product_data: Dict):
+        """Update product information"""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE products 
+                SET name=?, barcode=?, category_id=?, description=?, cost_price=?,
+                    price=?, quantity=?, min_quantity=?, image_path=?, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+            ''', (
+                product_data['name'],
+                product_data.get('barcode') or None,
+                product_data.get('category_id'),
+                product_data.get('description', ''),
+                product_data.get('cost_price', 0),
+                product_data['price'],
+                product_data.get('quantity', 0),
+                product_data.get('min_quantity', 5),
+                product_data.get('image_path'),
+                product_id
+            ))
+        
+        self.refresh_cached_products([product_id])
+    
+    def deactivate_product(self, product_id: int):
+        """Deactivate product (soft delete)"""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE products SET is_active = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (product_id,)
+            )
+        
+        self.product_cache.invalidate(product_id)
+    
     def update_product_quantity(self, product_id: int, quantity_change: int):
         """Update product quantity"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE products 
+                SET quantity = quantity + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (quantity_change, product_id))
         
-        cursor.execute('''
-            UPDATE products 
-            SET quantity = quantity + ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (quantity_change, product_id))
+        self.refresh_cached_products([product_id])
+    
+    def enable_group_commit(self, max_delay: float = 0.005, max_batch: int = 64):
+        """Route create_sale() through a background group-commit writer
         
-        conn.commit()
-        conn.close()
+        Sales arriving within ``max_delay`` seconds of each other share one
+        transaction (and one fsync).
+        """
+        if self.sale_writer is None:
+            self.sale_writer = SaleWriter(self, max_delay=max_delay, max_batch=max_batch)
     
-    def create_sale(self, sale_data: Dict, sale_items: List[Dict]) -> int:
-        """Create a new sale with items"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def disable_group_commit(self):
+        """Flush queued sales and go back to one transaction per sale"""
+        if self.sale_writer is not None:
+            writer, self.sale_writer = self.sale_writer, None
+            writer.stop()
+    
+    def create_sale(self, sale_data: Dict, sale_items: List[Dict],
+                    activity: Tuple[str, str] = None) -> int:
+        """Create a new sale with items and return its id once committed"""
+        writer = self.sale_writer
+        if writer is not None and not writer.is_writer_thread():
+            return writer.submit(sale_data, sale_items, activity).result()
+        return self._write_sale(sale_data, sale_items, activity)
+    
+    def _write_sale(self, sale_data: Dict, sale_items: List[Dict],
+                    activity: Tuple[str, str] = None) -> int:
+        """Write a sale with its items
         
-        try:
+        Everything runs in one BEGIN IMMEDIATE transaction: the sale, its
+        items, a guarded stock decrement and (optionally) an
+        ``(action, details)`` activity log entry. Raises
+        InsufficientStockError and writes nothing if any line cannot be
+        covered by current stock.
+        """
+        # Combine lines for the same product so the guard sees the real total
+        requested = {}
+        for item in sale_items:
+            requested[item['product_id']] = requested.get(item['product_id'], 0) + item['quantity']
+        
+        with self.transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            
             # Insert sale
             cursor.execute('''
                 INSERT INTO sales (sale_number, user_id, customer_name, subtotal, 
@@ -424,123 +1216,324 @@ class DatabaseManager:
             
             sale_id = cursor.lastrowid
             
-            # Insert sale items and update inventory
-            for item in sale_items:
-                cursor.execute('''
-                    INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (sale_id, item['product_id'], item['quantity'], 
-                     item['unit_price'], item['total_price']))
+            # Insert sale items
+            cursor.executemany('''
+                INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(sale_id, item['product_id'], item['quantity'],
+                   item['unit_price'], item['total_price']) for item in sale_items])
+            
+            # Update inventory, only where enough stock is left. The nested
+            # transaction is a savepoint, so a failed guard undoes every line.
+            try:
+                with self.transaction():
+                    cursor.executemany('''
+                        UPDATE products
+                        SET quantity = quantity - ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ? AND quantity >= ?
+                    ''', [(quantity, product_id, quantity) for product_id, quantity in requested.items()])
+                    
+                    if cursor.rowcount != len(requested):
+                        raise InsufficientStockError([])
+            except InsufficientStockError:
+                raise InsufficientStockError(self._find_stock_shortfalls(conn, requested))
+            
+            if activity:
+                action, details = activity
+                self._insert_activity(conn, sale_data['user_id'], action, details)
+        
+        self.last_sale_at = time.monotonic()
+        self.refresh_cached_products(list(requested))
+        return sale_id
+    
+    def _find_stock_shortfalls(self, conn: sqlite3.Connection, requested: Dict[int, int]) -> List[Dict]:
+        """Work out which sale lines failed the stock guard"""
+        placeholders = ",".join("?" * len(requested))
+        rows = conn.execute(
+            f"SELECT id, name, quantity FROM products WHERE id IN ({placeholders})",
+            list(requested)
+        ).fetchall()
+        stock = {row['id']: row for row in rows}
+        
+        failures = []
+        for product_id, quantity in requested.items():
+            row = stock.get(product_id)
+            available = row['quantity'] if row else 0
+            if available < quantity:
+                failures.append({
+                    'product_id': product_id,
+                    'name': row['name'] if row else None,
+                    'requested': quantity,
+                    'available': available
+                })
+        return failures
+    
+    @staticmethod
+    def _date_range_bounds(start_date: str, end_date: str) -> Tuple[str, str]:
+        """Convert an inclusive YYYY-MM-DD date range into half-open timestamp bounds.
+        
+        ``created_at >= start AND created_at < end`` compares the raw column,
+        so SQLite can seek on the created_at index instead of scanning.
+        """
+        end_exclusive = datetime.strptime(end_date[:10], "%Y-%m-%d") + timedelta(days=1)
+        return start_date[:10], end_exclusive.strftime("%Y-%m-%d")
+    
+    @staticmethod
+    def _range_years(range_start: str, range_end: str) -> range:
+        """Return the years a half-open date range (see _date_range_bounds) touches"""
+        last_day = datetime.strptime(range_end, "%Y-%m-%d") - timedelta(days=1)
+        return range(int(range_start[:4]), last_day.year + 1)
+    
+    def _sales_source(self, conn: sqlite3.Connection, range_start: str, range_end: str) -> str:
+        """Return a FROM source for the sales table covering a date range.
+        
+        Archived years are only unioned in (and attached) when the range
+        reaches them; otherwise this is just the hot table. ArchiveError is
+        raised when a needed archive cannot be attached.
+        """
+        schemas = attach_archives(conn, self.db_path, self._range_years(range_start, range_end))
+        if not schemas:
+            return "sales"
+        
+        # After restoring a backup taken before archiving, archived sales are
+        # in the main table too (or mid-archive, briefly); count them once
+        parts = ["SELECT * FROM main.sales"] + [
+            f"SELECT * FROM {schema}.sales WHERE sale_number NOT IN (SELECT sale_number FROM main.sales)"
+            for schema in schemas
+        ]
+        return "(" + " UNION ALL ".join(parts) + ")"
+    
+    def enable_maintenance_scheduler(self, **options) -> MaintenanceScheduler:
+        """Run maintenance whenever the register goes idle (options as for MaintenanceScheduler)"""
+        if self.maintenance_scheduler is None:
+            self.maintenance_scheduler = MaintenanceScheduler(self, **options)
+            self.maintenance_scheduler.start()
+        return self.maintenance_scheduler
+    
+    def disable_maintenance_scheduler(self):
+        """Stop idle-time maintenance"""
+        if self.maintenance_scheduler is not None:
+            scheduler, self.maintenance_scheduler = self.maintenance_scheduler, None
+            scheduler.stop()
+    
+    def run_maintenance(self) -> Dict:
+        """Run ANALYZE, PRAGMA optimize, incremental VACUUM and a WAL checkpoint now"""
+        if self.maintenance_scheduler is not None:
+            return self.maintenance_scheduler.run_once(force=True)
+        
+        report = run_maintenance(self)
+        self.save_maintenance_report(report)
+        return report
+    
+    def save_maintenance_report(self, report: Dict):
+        """Keep the latest maintenance report for the settings screen"""
+        self.update_setting("maintenance_last_report", json.dumps(report, sort_keys=True))
+        self.log_system_activity(
+            "maintenance_completed",
+            f"{report['total_seconds']:.2f}s, reclaimed {report['reclaimed_bytes'] // 1024} KB"
+        )
+    
+    def get_maintenance_report(self) -> Dict:
+        """Return the latest maintenance report (empty if maintenance never ran)"""
+        try:
+            return json.loads(self.get_setting("maintenance_last_report") or "{}")
+        except ValueError:
+            return {}
+    
+    def archive_closed_years(self, keep_years: int = 1) -> Dict[int, Dict[str, int]]:
+        """Move sales history older than the last keep_years into yearly archive files"""
+        return archive_closed_years(self, keep_years)
+    
+    def _sales_report_query(self, conn: sqlite3.Connection, start_date: str, end_date: str,
+                            after_id: int = None, limit: int = None) -> Tuple[str, list]:
+        range_start, range_end = self._date_range_bounds(start_date, end_date)
+        sales_table = self._sales_source(conn, range_start, range_end)
+        
+        query = f'''
+            SELECT s.*, u.full_name as cashier_name
+            FROM {sales_table} s
+            JOIN users u ON s.user_id = u.id
+            WHERE s.created_at >= ? AND s.created_at < ?
+        '''
+        params = [range_start, range_end]
+        
+        if after_id is not None:
+            # Keyset pagination: continue strictly after the given row
+            query += f" AND (s.created_at, s.id) < (SELECT created_at, id FROM {sales_table} WHERE id = ?)"
+            params.append(after_id)
+        
+        query += " ORDER BY s.created_at DESC, s.id DESC"
+        
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+    
+    def get_sales_report(self, start_date: str, end_date: str, after_id: int = None,
+                         limit: int = None, count_only: bool = False, compact: bool = False):
+        """Get sales report for date range
+        
+        Results are newest first. Pass the id of the last row of a page as
+        ``after_id`` (with ``limit``) to fetch the next page. With
+        ``count_only=True`` only the number of matching sales is returned.
+        ``compact=True`` returns read-only Records instead of dicts.
+        """
+        try:
+            with self.snapshot() as conn:
+                if count_only:
+                    range_start, range_end = self._date_range_bounds(start_date, end_date)
+                    sales_table = self._sales_source(conn, range_start, range_end)
+                    return conn.execute(f'''
+                        SELECT COUNT(*) FROM {sales_table}
+                        WHERE created_at >= ? AND created_at < ?
+                    ''', (range_start, range_end)).fetchone()[0]
                 
-                # Update product quantity
-                cursor.execute('''
-                    UPDATE products SET quantity = quantity - ? WHERE id = ?
-                ''', (item['quantity'], item['product_id']))
-            
-            conn.commit()
-            return sale_id
-            
+                query, params = self._sales_report_query(conn, start_date, end_date, after_id, limit)
+                return self._fetch_rows(conn.execute(query, params), compact)
+        except ArchiveError:
+            # An empty report would look like a day without sales
+            raise
         except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            print(f"Error getting sales report: {e}")
+            return 0 if count_only else []
     
-    def get_sales_report(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get sales report for date range"""
+    def iter_sales_report(self, start_date: str, end_date: str) -> Iterator[Record]:
+        """Lazily yield every sale of a date range as Records, newest first.
+        
+        The whole range is read from one snapshot, so no paging is needed.
+        """
+        with self.snapshot() as conn:
+            query, params = self._sales_report_query(conn, start_date, end_date)
+            yield from self._iter_rows(conn.execute(query, params))
+    
+    def get_sales_summary(self, start_date: str, end_date: str) -> Dict:
+        """Get transaction count and totals for a date range without loading rows"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT s.*, u.full_name as cashier_name
-                FROM sales s
-                JOIN users u ON s.user_id = u.id
-                WHERE DATE(s.created_at) BETWEEN ? AND ?
-                ORDER BY s.created_at DESC
-            ''', (start_date, end_date))
-            
-            sales = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return sales
+            with self.snapshot() as conn:
+                range_start, range_end = self._date_range_bounds(start_date, end_date)
+                sales_table = self._sales_source(conn, range_start, range_end)
+                cursor = conn.execute(f'''
+                    SELECT COUNT(*) as transactions,
+                           COALESCE(SUM(subtotal), 0) as subtotal,
+                           COALESCE(SUM(tax_amount), 0) as tax_amount,
+                           COALESCE(SUM(total_amount), 0) as total_amount
+                    FROM {sales_table}
+                    WHERE created_at >= ? AND created_at < ?
+                ''', (range_start, range_end))
+                return dict(cursor.fetchone())
+        except ArchiveError:
+            raise
         except Exception as e:
-            print(f"Error getting sales report: {e}")
-            return []
+            print(f"Error getting sales summary: {e}")
+            return {'transactions': 0, 'subtotal': 0, 'tax_amount': 0, 'total_amount': 0}
     
-    def get_setting(self, key: str) -> Optional[str]:
-        """Get setting value by key"""
+    def load_settings_cache(self):
+        """(Re)load every setting into the in-process cache"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-            result = cursor.fetchone()
+            cursor.execute("SELECT key, value FROM settings")
+            self.settings_cache.load((row['key'], row['value']) for row in cursor.fetchall())
             
             conn.close()
-            return result['value'] if result else None
         except Exception as e:
-            print(f"Error getting setting: {e}")
-            return None
+            print(f"Error loading settings: {e}")
+    
+    def get_setting(self, key: str) -> Optional[str]:
+        """Get setting value by key"""
+        if not self.settings_cache.loaded:
+            self.load_settings_cache()
+        return self.settings_cache.get(key)
+    
+    def get_settings(self, keys: List[str] = None) -> Dict[str, Optional[str]]:
+        """Get several settings at once (all settings when keys is None)"""
+        if not self.settings_cache.loaded:
+            self.load_settings_cache()
+        if keys is None:
+            return self.settings_cache.all()
+        return self.settings_cache.get_many(keys)
     
     def update_setting(self, key: str, value: str):
         """Update setting value"""
+        self.update_settings({key: value})
+    
+    def update_settings(self, settings: Dict[str, str]):
+        """Update several settings in a single transaction"""
+        if not settings:
+            return
+        
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO settings (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (key, value))
-            
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                # Upsert keeps each setting's description intact
+                conn.executemany('''
+                    INSERT INTO settings (key, value, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(key) DO UPDATE SET
+                        value = excluded.value,
+                        updated_at = excluded.updated_at
+                ''', list(settings.items()))
+            
+            if self.settings_cache.loaded:
+                self.settings_cache.update(settings)
         except Exception as e:
-            print(f"Error updating setting: {e}")
+            print(f"Error updating settings: {e}")
+            # Make the next read go back to the database
+            self.settings_cache.clear()
+    
+    def get_company_info(self) -> Dict[str, str]:
+        """Get company details for receipts"""
+        settings = self.get_settings(["company_name", "company_address", "company_phone",
+                                      "company_email", "receipt_footer"])
+        return {
+            'name': settings["company_name"] or "LKS POS System",
+            'address': settings["company_address"] or "",
+            'phone': settings["company_phone"] or "",
+            'email': settings["company_email"] or "",
+            'receipt_footer': settings["receipt_footer"] or "Thank you for your business!"
+        }
     
     # User management methods
-    def get_all_users(self) -> List[Dict]:
-        """Get all users"""
+    USERS_QUERY = '''
+        SELECT id, username, full_name, email, role, is_active, created_at, last_login
+        FROM users ORDER BY created_at DESC
+    '''
+    
+    def get_all_users(self, compact: bool = False) -> List[Dict]:
+        """Get all users (``compact=True`` returns read-only Records)"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, username, full_name, email, role, is_active, created_at, last_login
-                FROM users ORDER BY created_at DESC
-            ''')
-            
-            users = [dict(row) for row in cursor.fetchall()]
+            users = self._fetch_rows(conn.execute(self.USERS_QUERY), compact)
             conn.close()
             return users
         except Exception as e:
             print(f"Error getting users: {e}")
             return []
     
+    def iter_users(self) -> Iterator[Record]:
+        """Lazily yield all users as Records from one snapshot"""
+        with self.snapshot() as conn:
+            yield from self._iter_rows(conn.execute(self.USERS_QUERY))
+    
     def create_user(self, user_data: Dict) -> int:
         """Create a new user"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
             password_hash = self.hash_password(user_data['password'])
             
-            cursor.execute('''
-                INSERT INTO users (username, password_hash, full_name, email, role, is_active)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                user_data['username'],
-                password_hash,
-                user_data['full_name'],
-                user_data.get('email', ''),
-                user_data['role'],
-                user_data.get('is_active', True)
-            ))
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO users (username, password_hash, full_name, email, role, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    user_data['username'],
+                    password_hash,
+                    user_data['full_name'],
+                    user_data.get('email', ''),
+                    user_data['role'],
+                    user_data.get('is_active', True)
+                ))
             
-            user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return user_id
+            return cursor.lastrowid
             
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -549,97 +1542,110 @@ class DatabaseManager:
     def update_user(self, user_id: int, user_data: Dict):
         """Update user information"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
+            password_hash = None
             if 'password' in user_data and user_data['password']:
                 password_hash = self.hash_password(user_data['password'])
-                cursor.execute('''
-                    UPDATE users 
-                    SET username=?, full_name=?, email=?, role=?, is_active=?, password_hash=?
-                    WHERE id=?
-                ''', (
-                    user_data['username'],
-                    user_data['full_name'],
-                    user_data.get('email', ''),
-                    user_data['role'],
-                    user_data.get('is_active', True),
-                    password_hash,
-                    user_id
-                ))
-            else:
-                cursor.execute('''
-                    UPDATE users 
-                    SET username=?, full_name=?, email=?, role=?, is_active=?
-                    WHERE id=?
-                ''', (
-                    user_data['username'],
-                    user_data['full_name'],
-                    user_data.get('email', ''),
-                    user_data['role'],
-                    user_data.get('is_active', True),
-                    user_id
-                ))
             
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                
+                if password_hash:
+                    cursor.execute('''
+                        UPDATE users 
+                        SET username=?, full_name=?, email=?, role=?, is_active=?, password_hash=?
+                        WHERE id=?
+                    ''', (
+                        user_data['username'],
+                        user_data['full_name'],
+                        user_data.get('email', ''),
+                        user_data['role'],
+                        user_data.get('is_active', True),
+                        password_hash,
+                        user_id
+                    ))
+                else:
+                    cursor.execute('''
+                        UPDATE users 
+                        SET username=?, full_name=?, email=?, role=?, is_active=?
+                        WHERE id=?
+                    ''', (
+                        user_data['username'],
+                        user_data['full_name'],
+                        user_data.get('email', ''),
+                        user_data['role'],
+                        user_data.get('is_active', True),
+                        user_id
+                    ))
             
         except Exception as e:
             print(f"Error updating user: {e}")
             raise
     
-    def delete_user(self, user_id: int):
-        """Deactivate user (soft delete)"""
+    def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
+        """Change a user's password; returns False if the current password is wrong"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
+            row = conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()
+            conn.close()
             
-            cursor.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
+            if not row or not self.verify_password(current_password, row['password_hash']):
+                return False
             
-            conn.commit()
-            conn.close()
+            password_hash = self.hash_password(new_password)
+            with self.transaction() as conn:
+                conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error changing password: {e}")
+            raise
+    
+    def delete_user(self, user_id: int):
+        """Deactivate user (soft delete)"""
+        try:
+            with self.transaction() as conn:
+                conn.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
             
         except Exception as e:
             print(f"Error deleting user: {e}")
             raise
 
     # Category management methods
-    def get_all_categories(self) -> List[Dict]:
-        """Get all categories"""
+    CATEGORIES_QUERY = '''
+        SELECT c.*, COUNT(p.id) as product_count
+        FROM categories c
+        LEFT JOIN products p ON c.id = p.category_id AND p.is_active = 1
+        GROUP BY c.id, c.name, c.description, c.created_at
+        ORDER BY c.name
+    '''
+    
+    def get_all_categories(self, compact: bool = False) -> List[Dict]:
+        """Get all categories (``compact=True`` returns read-only Records)"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT c.*, COUNT(p.id) as product_count
-                FROM categories c
-                LEFT JOIN products p ON c.id = p.category_id AND p.is_active = 1
-                GROUP BY c.id, c.name, c.description, c.created_at
-                ORDER BY c.name
-            ''')
-            
-            categories = [dict(row) for row in cursor.fetchall()]
+            categories = self._fetch_rows(conn.execute(self.CATEGORIES_QUERY), compact)
             conn.close()
             return categories
         except Exception as e:
             print(f"Error getting categories: {e}")
             return []
     
+    def iter_categories(self) -> Iterator[Record]:
+        """Lazily yield all categories as Records from one snapshot"""
+        with self.snapshot() as conn:
+            yield from self._iter_rows(conn.execute(self.CATEGORIES_QUERY))
+    
     def create_category(self, category_data: Dict) -> int:
         """Create a new category"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO categories (name, description)
-                VALUES (?, ?)
-            ''', (category_data['name'], category_data.get('description', '')))
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO categories (name, description)
+                    VALUES (?, ?)
+                ''', (category_data['name'], category_data.get('description', '')))
             
-            category_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return category_id
+            return cursor.lastrowid
             
         except Exception as e:
             print(f"Error creating category: {e}")
@@ -648,17 +1654,15 @@ class DatabaseManager:
     def update_category(self, category_id: int, category_data: Dict):
         """Update category information"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE categories 
-                SET name=?, description=?
-                WHERE id=?
-            ''', (category_data['name'], category_data.get('description', ''), category_id))
+            with self.transaction() as conn:
+                conn.execute('''
+                    UPDATE categories 
+                    SET name=?, description=?
+                    WHERE id=?
+                ''', (category_data['name'], category_data.get('description', ''), category_id))
             
-            conn.commit()
-            conn.close()
+            # Cached products carry the category name
+            self._reload_product_cache()
             
         except Exception as e:
             print(f"Error updating category: {e}")
@@ -667,17 +1671,14 @@ class DatabaseManager:
     def delete_category(self, category_id: int):
         """Delete category and handle products"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # First, set products in this category to have no category
-            cursor.execute('UPDATE products SET category_id = NULL WHERE category_id = ?', (category_id,))
-            
-            # Then delete the category
-            cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+            with self.transaction() as conn:
+                # First, set products in this category to have no category
+                conn.execute('UPDATE products SET category_id = NULL WHERE category_id = ?', (category_id,))
+                
+                # Then delete the category
+                conn.execute('DELETE FROM categories WHERE id = ?', (category_id,))
             
-            conn.commit()
-            conn.close()
+            self._reload_product_cache()
             
         except Exception as e:
             print(f"Error deleting category: {e}")
@@ -0,0 +1,165 @@
+"""
+Maintenance - ANALYZE, PRAGMA optimize, incremental VACUUM and WAL checkpoints
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+# Free pages released per incremental_vacuum step (idle is re-checked in between)
+VACUUM_STEP_PAGES = 1024
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def run_maintenance(db_manager, analyze: bool = True,
+                    is_idle: Callable[[], bool] = lambda: True) -> Dict:
+    """Run every maintenance task once and return a report.
+
+    A database that is not yet in auto_vacuum=INCREMENTAL mode is switched
+    over with one full VACUUM. Incremental vacuuming stops early as soon as
+    ``is_idle()`` turns false.
+    """
+    report = {
+        'started_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'tasks': {},
+        'reclaimed_bytes': 0,
+        'wal_pages_checkpointed': 0,
+    }
+    size_before = _file_size(db_manager.db_path)
+    conn = db_manager.get_connection()
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        report['tasks'][name] = round(time.perf_counter() - start, 3)
+        return result
+
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Only takes effect through a full VACUUM; done once
+            def switch_to_incremental():
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            timed("vacuum", switch_to_incremental)
+
+        if analyze:
+            timed("analyze", lambda: conn.execute("ANALYZE"))
+        timed("optimize", lambda: conn.execute("PRAGMA optimize"))
+
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+
+        def incremental_vacuum():
+            freed = 0
+            while is_idle():
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free_pages:
+                    break
+                conn.execute(f"PRAGMA incremental_vacuum({min(free_pages, VACUUM_STEP_PAGES)})").fetchall()
+                freed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return freed
+        report['freed_pages'] = timed("incremental_vacuum", incremental_vacuum)
+        report['reclaimed_bytes'] = report['freed_pages'] * page_size
+
+        busy, log_pages, checkpointed = timed(
+            "wal_checkpoint", lambda: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone())
+        report['wal_pages_checkpointed'] = max(checkpointed, 0)
+        report['wal_checkpoint_complete'] = not busy
+    finally:
+        conn.close()
+
+    # A one-time VACUUM shrinks the file directly
+    report['reclaimed_bytes'] = max(report['reclaimed_bytes'], size_before - _file_size(db_manager.db_path))
+    report['file_size'] = _file_size(db_manager.db_path)
+    report['total_seconds'] = round(sum(report['tasks'].values()), 3)
+    return report
+
+class MaintenanceScheduler:
+    """Background thread that runs maintenance once the register goes idle.
+
+    The database counts as idle when no sale has been written for
+    ``idle_minutes``. Maintenance runs once per idle period (and at least
+    every ``analyze_interval_hours`` for ANALYZE).
+    """
+
+    def __init__(self, db_manager, idle_minutes: float = 10.0, check_interval: float = 60.0,
+                 analyze_interval_hours: float = 24.0):
+        self.db_manager = db_manager
+        self.idle_seconds = idle_minutes * 60
+        self.check_interval = check_interval
+        self.analyze_interval = analyze_interval_hours * 3600
+        self._started_at = time.monotonic()
+        self._last_run_at = None
+        self._last_run_sale_at = None
+        self._last_analyze_at = None
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="MaintenanceScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_idle(self) -> bool:
+        last_activity = max(self.db_manager.last_sale_at, self._started_at)
+        return not self._stop.is_set() and time.monotonic() - last_activity >= self.idle_seconds
+
+    def is_due(self) -> bool:
+        """Idle, and there were sales since the last run (or it is a day old)"""
+        if not self.is_idle():
+            return False
+        if self._last_run_at is None:
+            return True
+        return (self.db_manager.last_sale_at != self._last_run_sale_at
+                or time.monotonic() - self._last_run_at >= self.analyze_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            if self.is_due():
+                self.run_once()
+        self.db_manager.release_connection()
+
+    def run_once(self, force: bool = False) -> Dict:
+        """Run maintenance now; ``force`` also runs ANALYZE and ignores idleness"""
+        with self._run_lock:
+            now = time.monotonic()
+            analyze = (force or self._last_analyze_at is None
+                       or now - self._last_analyze_at >= self.analyze_interval)
+            self._last_run_at = now
+            self._last_run_sale_at = self.db_manager.last_sale_at
+
+            try:
+                report = run_maintenance(self.db_manager, analyze=analyze,
+                                         is_idle=(lambda: True) if force else self.is_idle)
+            except Exception as e:
+                print(f"Database maintenance failed: {e}")
+                self.db_manager.log_system_activity("maintenance_failed", str(e))
+                return {}
+
+            if analyze:
+                self._last_analyze_at = now
+            self.db_manager.save_maintenance_report(report)
+            return report
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of a maintenance report"""
+    if not report:
+        return "Maintenance has not run yet."
+    tasks = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report['tasks'].items())
+    return (f"Last run: {report['started_at']} ({report['total_seconds']:.2f}s)\n"
+            f"Tasks: {tasks}\n"
+            f"Reclaimed: {report['reclaimed_bytes'] / 1024:.0f} KB, "
+            f"WAL pages checkpointed: {report['wal_pages_checkpointed']}\n"
+            f"Database size: {report['file_size'] / (1024 * 1024):.1f} MB")
@@ -0,0 +1,164 @@
+"""
+Schema Migrations - Ordered, versioned schema changes applied at startup
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+# A migration step is either a list of SQL statements or a callable that
+# receives the open connection (for changes that need Python logic).
+MigrationStep = Union[List[str], Callable[[sqlite3.Connection], None]]
+
+# Keep products_fts in sync; quantity/price updates at checkout do not touch it
+PRODUCT_SEARCH_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description, barcode, category_name)
+        VALUES (new.id, new.name, new.description, new.barcode,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description, barcode, category_id ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+        INSERT INTO products_fts (rowid, name, description, barcode, category_name)
+        VALUES (new.id, new.name, new.description, new.barcode,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS categories_fts_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE products_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM products WHERE category_id = new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS categories_fts_delete AFTER DELETE ON categories BEGIN
+        UPDATE products_fts SET category_name = NULL
+        WHERE rowid IN (SELECT id FROM products WHERE category_id = old.id);
+    END
+    ''',
+]
+
+def _create_product_search_index(conn: sqlite3.Connection):
+    """Create the FTS5 product search index, its sync triggers and backfill it"""
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, description, barcode, category_name,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 - search falls back to LIKE queries
+        print(f"Full-text search unavailable: {e}")
+        return
+
+    # executescript() would commit the migration transaction, so run one by one
+    for statement in PRODUCT_SEARCH_TRIGGERS:
+        conn.execute(statement)
+
+    conn.execute("DELETE FROM products_fts")
+    conn.execute('''
+        INSERT INTO products_fts (rowid, name, description, barcode, category_name)
+        SELECT p.id, p.name, p.description, p.barcode, c.name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+    ''')
+
+# (version, description, step) - append new migrations, never reorder or edit
+MIGRATIONS: List[Tuple[int, str, MigrationStep]] = [
+    (1, "Add hot-path secondary indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON sale_items (sale_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sale_items_product_id ON sale_items (product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_logs_created_at ON activity_logs (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_products_category_id ON products (category_id)",
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)",
+    ]),
+    (2, "Add FTS5 product search index", _create_product_search_index),
+    (3, "Add product import checkpoints", [
+        '''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            rows_done INTEGER NOT NULL,
+            imported INTEGER NOT NULL DEFAULT 0,
+            categories_created INTEGER NOT NULL DEFAULT 0,
+            error_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (4, "Add supplier import mapping profiles", [
+        '''
+        CREATE TABLE IF NOT EXISTS import_profiles (
+            name TEXT PRIMARY KEY,
+            mapping TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (5, "Track updated and unchanged rows in import checkpoints", [
+        "ALTER TABLE import_checkpoints ADD COLUMN updated INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE import_checkpoints ADD COLUMN unchanged INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def ensure_version_table(conn: sqlite3.Connection):
+    """Create the schema_version bookkeeping table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the highest applied migration version (0 if none)"""
+    ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations(db_manager) -> List[int]:
+    """Apply every pending migration in order, one transaction each.
+
+    Returns the list of versions that were applied.
+    """
+    with db_manager.transaction() as conn:
+        current = get_schema_version(conn)
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+
+        print(f"Applying migration {version}: {description}")
+        with db_manager.transaction(immediate=True) as conn:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= version:
+                continue
+
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+        applied.append(version)
+
+    return applied
@@ -0,0 +1,82 @@
+"""
+Product Cache - In-memory barcode index for the POS scan path
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+class ProductCache:
+    """Barcode -> product lookup table kept in sync by DatabaseManager writes.
+
+    Only active products are cached. A miss is never cached, so products
+    written outside DatabaseManager are still found (via the database).
+    """
+
+    def __init__(self):
+        self._by_barcode: Dict[str, Dict] = {}
+        self._barcode_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._by_barcode)
+
+    def get(self, barcode: str) -> Optional[Dict]:
+        """Return a copy of the cached product for a barcode"""
+        product = self._by_barcode.get(barcode)
+        return dict(product) if product is not None else None
+
+    def get_by_id(self, product_id: int) -> Optional[Dict]:
+        """Return a copy of the cached product for an id"""
+        barcode = self._barcode_by_id.get(product_id)
+        return self.get(barcode) if barcode is not None else None
+
+    def load(self, products: Iterable[Dict]):
+        """Replace the whole cache with the given products"""
+        by_barcode, barcode_by_id = {}, {}
+        for product in products:
+            if product.get('barcode'):
+                by_barcode[product['barcode']] = product
+                barcode_by_id[product['id']] = product['barcode']
+
+        with self._lock:
+            self._by_barcode = by_barcode
+            self._barcode_by_id = barcode_by_id
+            self.loaded = True
+
+    def put(self, product: Dict):
+        """Insert or refresh a single product"""
+        with self._lock:
+            self._remove(product['id'])
+            if product.get('barcode') and product.get('is_active', 1):
+                self._by_barcode[product['barcode']] = product
+                self._barcode_by_id[product['id']] = product['barcode']
+
+    def invalidate(self, product_id: int):
+        """Drop a single product from the cache"""
+        with self._lock:
+            self._remove(product_id)
+
+    def clear(self):
+        """Drop every cached product"""
+        with self._lock:
+            self._by_barcode = {}
+            self._barcode_by_id = {}
+            self.loaded = False
+
+    def _remove(self, product_id: int):
+        barcode = self._barcode_by_id.pop(product_id, None)
+        if barcode is not None:
+            self._by_barcode.pop(barcode, None)
+
+_caches: Dict[str, ProductCache] = {}
+_caches_lock = threading.Lock()
+
+def get_product_cache(db_path: str) -> ProductCache:
+    """Return the process-wide cache for a database file"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ProductCache()
+        return _caches[key]
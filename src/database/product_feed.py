@@ -0,0 +1,438 @@
+"""
+Product Feed - Streaming readers for supplier product files (CSV and XLSX)
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Accepted column names for each product field, in order of preference.
+# Headers are compared case-insensitively, with spaces and dashes read as "_".
+FIELD_ALIASES = {
+    'name': ['name', 'product_name', 'item_name', 'title'],
+    'price': ['price', 'selling_price', 'sale_price', 'unit_price'],
+    'cost_price': ['cost', 'cost_price', 'purchase_price'],
+    'quantity': ['quantity', 'stock', 'qty', 'inventory'],
+    'min_quantity': ['min_quantity', 'minimum', 'reorder_level'],
+    'barcode': ['barcode', 'sku', 'code', 'product_code'],
+    'category': ['category', 'category_name', 'type'],
+    'description': ['description', 'desc', 'details'],
+}
+
+# Value of a field whose column is missing, empty or unreadable
+FIELD_DEFAULTS = {
+    'name': '',
+    'price': None,
+    'cost_price': 0.0,
+    'quantity': 0,
+    'min_quantity': 5,
+    'barcode': None,
+    'category': None,
+    'description': '',
+}
+
+# Field values for an update-in-place import: None keeps the stored value
+KEEP_DEFAULTS = dict.fromkeys(FIELD_DEFAULTS)
+
+def _number(text: str) -> float:
+    return float(text.replace(',', '').replace('$', '').replace('DZD', '').strip())
+
+def _integer(text: str) -> int:
+    return int(_number(text))
+
+# Converters for non-text fields; they raise ValueError on bad input
+FIELD_CONVERTERS = {
+    'price': _number,
+    'cost_price': _number,
+    'quantity': _integer,
+    'min_quantity': _integer,
+}
+
+def normalize_header(name: str) -> str:
+    return re.sub(r"[\s\-]+", "_", (name or "").strip().lower())
+
+def resolve_columns(header: Sequence[str], profile: Dict[str, Optional[str]] = None) -> Dict[str, Tuple[int, ...]]:
+    """Map each product field to the column indexes it is read from.
+
+    A field can have several candidate columns (one per matching alias);
+    the first non-empty one wins on each row. A mapping ``profile`` of
+    {field: column header} overrides the aliases for the fields it lists
+    (a None/empty header means the field is not imported).
+    """
+    index = {}
+    for i, name in enumerate(header):
+        index.setdefault(normalize_header(name), i)
+
+    columns = {}
+    for field, aliases in FIELD_ALIASES.items():
+        if profile and field in profile:
+            column = profile[field]
+            i = index.get(normalize_header(column)) if column else None
+            columns[field] = (i,) if i is not None else ()
+            continue
+        candidates = []
+        for alias in aliases:
+            i = index.get(alias)
+            if i is not None and i not in candidates:
+                candidates.append(i)
+        columns[field] = tuple(candidates)
+    return columns
+
+class RowMapper:
+    """Compiled converter from a file row (a tuple of cells) to an import row.
+
+    The header is resolved once per file; each row then only touches the
+    columns that feed a product field. Blank, unreadable and unmapped
+    fields take their value from ``defaults`` (FIELD_DEFAULTS by default).
+    """
+
+    def __init__(self, header: Sequence[str], profile: Dict[str, Optional[str]] = None,
+                 defaults: Dict = None):
+        self.header = list(header)
+        self.defaults = FIELD_DEFAULTS if defaults is None else defaults
+        self.width = len(self.header)
+        self.columns = resolve_columns(self.header, profile)
+        self._plan = [(field, indexes, FIELD_CONVERTERS.get(field))
+                      for field, indexes in self.columns.items() if indexes]
+
+    def mapping(self) -> Dict[str, Optional[str]]:
+        """Return {field: header of the first column it is read from}"""
+        return {field: self.header[indexes[0]] if indexes else None
+                for field, indexes in self.columns.items()}
+
+    def __call__(self, values: Sequence[str]) -> Dict:
+        if len(values) < self.width:
+            values = list(values) + [''] * (self.width - len(values))
+
+        product = self.defaults.copy()
+        for field, indexes, convert in self._plan:
+            for i in indexes:
+                text = values[i].strip()
+                if text:
+                    if convert is None:
+                        product[field] = text
+                    else:
+                        try:
+                            product[field] = convert(text)
+                        except ValueError:
+                            pass
+                    break
+        return product
+
+# Delimiters the sniffer may pick (left open, it takes spaces in quoted text for one)
+CSV_DELIMITERS = ",;\t|"
+
+# Bytes of a CSV file parsed by one worker task in parallel mode
+PARALLEL_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Block size used when scanning for record boundaries
+SCAN_BLOCK_BYTES = 64 * 1024
+
+def _next_boundary(f: BinaryIO, start: int, target: int, size: int) -> int:
+    """Return the offset just past the first record end at or after ``target``.
+
+    ``start`` must be a record boundary. A newline ends a record when the
+    quotes seen since ``start`` are balanced; doubled (escaped) quotes keep
+    the count even, so quoted newlines are never taken for record ends.
+    """
+    f.seek(start)
+    quotes = f.read(target - start).count(b'"')
+    offset = target
+    while True:
+        block = f.read(SCAN_BLOCK_BYTES)
+        if not block:
+            return size
+        pos = 0
+        while True:
+            newline = block.find(b'\n', pos)
+            if newline < 0:
+                quotes += block.count(b'"', pos)
+                break
+            quotes += block.count(b'"', pos, newline)
+            if quotes % 2 == 0:
+                return offset + newline + 1
+            pos = newline + 1
+        offset += len(block)
+
+def split_records(path: str, start: int, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte ranges of whole records from ``start`` to the end of the file"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while start < size:
+            end = size if start + chunk_bytes >= size else _next_boundary(f, start, start + chunk_bytes, size)
+            yield start, end
+            start = end
+
+# Line appended to a range of text to check that the range ends on a record boundary
+_SENTINEL = "\uffff"
+
+def _whole_records(text: str, delimiter: str) -> Optional[List[List[str]]]:
+    """Parse text that should hold whole records.
+
+    Returns None if the text ends inside a quoted field, which happens when
+    a stray quote (e.g. 12" in an unquoted cell) misled _next_boundary.
+    """
+    records = list(csv.reader(io.StringIO(text + _SENTINEL, newline=''), delimiter=delimiter))
+    if not records or records[-1] != [_SENTINEL]:
+        return None
+    records.pop()
+    return records
+
+def _parse_range(path: str, start: int, end: int, last: bool, header: List[str],
+                 profile: Optional[Dict[str, Optional[str]]], defaults: Optional[Dict],
+                 delimiter: str, encoding: str) -> Optional[Tuple[int, List[Tuple[int, Dict]]]]:
+    """Worker task: map the records of one byte range.
+
+    Returns the number of records in the range and the (record number
+    within the range, import row) pairs of its non-empty records, or None
+    if the range (other than the ``last`` one) does not end on a record
+    boundary.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    if last:
+        records = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    else:
+        records = _whole_records(text, delimiter)
+        if records is None:
+            return None
+    mapper = RowMapper(header, profile, defaults)
+    return len(records), [(index, mapper(values)) for index, values in enumerate(records, start=1) if values]
+
+def file_fingerprint(path: str) -> str:
+    """Identify one version of a file (a changed file must not be resumed)"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+class CSVProductFeed:
+    """Reads products from a CSV file one row at a time.
+
+    Only the current row is held in memory. ``position()`` reports how far
+    into the file the reader is, in bytes. ``profile`` is an optional
+    column mapping (see resolve_columns).
+
+    With ``workers`` > 1, a file larger than ``chunk_bytes`` is split into
+    ranges of whole records that are parsed and converted in a process
+    pool. Rows still come out one at a time and in file order, so the
+    caller stays the single database writer; at most two ranges per worker
+    are held in memory. ``encoding`` must be ASCII compatible (e.g. UTF-8)
+    for the split to be safe.
+    """
+
+    def __init__(self, path: str, profile: Dict[str, Optional[str]] = None, encoding: str = 'utf-8',
+                 workers: int = 1, chunk_bytes: int = PARALLEL_CHUNK_BYTES):
+        self.path = path
+        self.source = os.path.abspath(path)
+        self.profile = profile
+        self.encoding = encoding
+        self.workers = workers or 1
+        self.chunk_bytes = chunk_bytes
+        self.size = os.path.getsize(path)
+        self._bytes_read = 0
+
+    def fingerprint(self) -> str:
+        return file_fingerprint(self.path)
+
+    def position(self) -> Tuple[int, int]:
+        return self._bytes_read, self.size
+
+    def _delimiter(self, csvfile) -> str:
+        # Try to detect delimiter
+        sample = csvfile.read(1024)
+        csvfile.seek(0)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+        except csv.Error:
+            return ','
+
+    def _reader(self, csvfile):
+        return csv.reader(csvfile, delimiter=self._delimiter(csvfile))
+
+    def header(self) -> list:
+        """Return the column headers of the file"""
+        with open(self.path, 'r', newline='', encoding=self.encoding) as csvfile:
+            return next(self._reader(csvfile), [])
+
+    def mapper(self) -> RowMapper:
+        return RowMapper(self.header(), self.profile)
+
+    def rows(self, start_after: int = 0, defaults: Dict = None) -> Iterator[Dict]:
+        """Yield import rows; rows numbered up to ``start_after`` are skipped.
+
+        ``defaults`` replaces FIELD_DEFAULTS for blank cells (see RowMapper).
+        """
+        if self.workers > 1 and self.size > self.chunk_bytes:
+            yield from self._parallel_rows(start_after, defaults)
+            return
+
+        with open(self.path, 'r', newline='', encoding=self.encoding) as csvfile:
+            reader = self._reader(csvfile)
+            mapper = RowMapper(next(reader, []), self.profile, defaults)
+            for row_num, values in enumerate(reader, start=2):
+                if row_num <= start_after or not values:
+                    continue
+                self._bytes_read = csvfile.buffer.tell()
+                product = mapper(values)
+                product['row'] = row_num
+                yield product
+
+        self._bytes_read = self.size
+
+    def _rows_from(self, offset: int, row_base: int, mapper: RowMapper, delimiter: str,
+                   start_after: int) -> Iterator[Dict]:
+        """Yield import rows read in order from ``offset``, the start of record ``row_base`` + 1"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            text = io.TextIOWrapper(f, encoding=self.encoding, newline='')
+            for index, values in enumerate(csv.reader(text, delimiter=delimiter), start=1):
+                row_num = row_base + index
+                if row_num <= start_after or not values:
+                    continue
+                self._bytes_read = f.tell()
+                product = mapper(values)
+                product['row'] = row_num
+                yield product
+
+    def _parallel_rows(self, start_after: int, defaults: Optional[Dict]) -> Iterator[Dict]:
+        with open(self.path, 'r', newline='', encoding=self.encoding) as csvfile:
+            delimiter = self._delimiter(csvfile)
+        with open(self.path, 'rb') as f:
+            first = _next_boundary(f, 0, 0, self.size)
+            f.seek(0)
+            header = _whole_records(f.read(first).decode(self.encoding), delimiter)
+        if header is None or len(header) != 1:
+            # The header holds a stray quote; no boundary can be trusted
+            mapper = RowMapper(self.header(), self.profile, defaults)
+            yield from self._rows_from(0, 0, mapper, delimiter, max(start_after, 1))
+            self._bytes_read = self.size
+            return
+        header = header[0]
+
+        ranges = split_records(self.path, first, self.chunk_bytes)
+        pending = deque()
+
+        # "spawn" keeps the workers clear of the threads (and Qt state) of this process
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        def submit_next():
+            bounds = next(ranges, None)
+            if bounds is not None:
+                start, end = bounds
+                pending.append((start, end, pool.submit(_parse_range, self.path, start, end, end == self.size,
+                                                        header, self.profile, defaults, delimiter,
+                                                        self.encoding)))
+
+        try:
+            for _ in range(self.workers * 2):
+                submit_next()
+            row_base = 1  # the header is row 1
+            while pending:
+                start, end, future = pending.popleft()
+                parsed = future.result()
+                if parsed is None:
+                    # A stray quote misplaced this split; every range before it was
+                    # whole, so the rest of the file is read in order from its start
+                    mapper = RowMapper(header, self.profile, defaults)
+                    yield from self._rows_from(start, row_base, mapper, delimiter, start_after)
+                    break
+                records, rows = parsed
+                submit_next()
+                self._bytes_read = end
+                for index, product in rows:
+                    row_num = row_base + index
+                    if row_num > start_after:
+                        product['row'] = row_num
+                        yield product
+                row_base += records
+        finally:
+            ranges.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        self._bytes_read = self.size
+
+def _cell_text(value) -> str:
+    """Render a spreadsheet cell the way it would appear in a CSV export"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Whole numbers (barcodes, quantities) typed into Excel come back as floats
+        return str(int(value))
+    return str(value)
+
+class XLSXProductFeed:
+    """Reads products from an Excel workbook one row at a time.
+
+    The sheet is streamed with openpyxl's read-only mode, so memory stays
+    flat however large the workbook is. Cells are turned into text and go
+    through the same RowMapper as CSV rows. ``sheet`` is a sheet name; the
+    active sheet is read by default. ``position()`` is estimated in bytes
+    from the row reached, so progress reads like a CSV import.
+    """
+
+    def __init__(self, path: str, profile: Dict[str, Optional[str]] = None, sheet: str = None):
+        self.path = path
+        self.source = os.path.abspath(path)
+        self.profile = profile
+        self.sheet = sheet
+        self.size = os.path.getsize(path)
+        self._bytes_read = 0
+
+    def fingerprint(self) -> str:
+        return file_fingerprint(self.path)
+
+    def position(self) -> Tuple[int, int]:
+        return self._bytes_read, self.size
+
+    def _open(self):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        return workbook, workbook[self.sheet] if self.sheet else workbook.active
+
+    def _values(self, worksheet) -> Iterator[List[str]]:
+        for values in worksheet.iter_rows(values_only=True):
+            yield [_cell_text(value) for value in values]
+
+    def header(self) -> list:
+        """Return the column headers of the sheet"""
+        workbook, worksheet = self._open()
+        try:
+            return next(self._values(worksheet), [])
+        finally:
+            workbook.close()
+
+    def mapper(self) -> RowMapper:
+        return RowMapper(self.header(), self.profile)
+
+    def rows(self, start_after: int = 0, defaults: Dict = None) -> Iterator[Dict]:
+        """Yield import rows; rows numbered up to ``start_after`` are skipped (see CSVProductFeed.rows)"""
+        workbook, worksheet = self._open()
+        try:
+            # The dimension record may be missing (then only the end is reported)
+            total_rows = worksheet.max_row or 0
+            values = self._values(worksheet)
+            mapper = RowMapper(next(values, []), self.profile, defaults)
+            for row_num, cells in enumerate(values, start=2):
+                if row_num <= start_after or not any(cells):
+                    continue
+                if total_rows:
+                    self._bytes_read = min(self.size * row_num // total_rows, self.size)
+                product = mapper(cells)
+                product['row'] = row_num
+                yield product
+        finally:
+            workbook.close()
+
+        self._bytes_read = self.size
+
+def open_product_feed(path: str, profile: Dict[str, Optional[str]] = None, workers: int = 1):
+    """Return the feed for a product file, chosen by its extension"""
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        return XLSXProductFeed(path, profile)
+    return CSVProductFeed(path, profile, workers=workers)
@@ -0,0 +1,307 @@
+"""
+Product Import - Bulk product import in chunked transactions
+"""
+
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .product_feed import FIELD_DEFAULTS, KEEP_DEFAULTS
+
+# Product rows written per transaction
+IMPORT_CHUNK_SIZE = 1000
+
+# Errors kept in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+INSERT_PRODUCT = '''
+    INSERT INTO products (name, barcode, category_id, price, cost_price,
+                          quantity, min_quantity, description)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Product columns an upsert may update (all but barcode, the conflict key)
+UPSERT_COLUMNS = ['name', 'category_id', 'price', 'cost_price', 'quantity', 'min_quantity', 'description']
+
+# Insert or update by barcode. A NULL value (blank or unmapped cell) keeps
+# the stored column, and a product is only written (and its updated_at
+# bumped) when a non-NULL value differs from what it has.
+UPSERT_PRODUCT = INSERT_PRODUCT + "ON CONFLICT(barcode) DO UPDATE SET {}, updated_at = CURRENT_TIMESTAMP WHERE {}".format(
+    ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in UPSERT_COLUMNS),
+    " OR ".join(f"(excluded.{column} IS NOT NULL AND excluded.{column} IS NOT {column})"
+                for column in UPSERT_COLUMNS))
+
+# INSERT_PRODUCT values of a new product for fields left blank in an upsert
+INSERT_DEFAULTS = (None, None, None, None, FIELD_DEFAULTS['cost_price'], FIELD_DEFAULTS['quantity'],
+                   FIELD_DEFAULTS['min_quantity'], FIELD_DEFAULTS['description'])
+
+class ProductImporter:
+    """Write parsed product rows to the database in bulk.
+
+    Rows are dicts as produced by CSVHandler (name, price, cost_price,
+    quantity, min_quantity, barcode, category, description), optionally
+    with ``row``, the source line number used in the error report.
+
+    Category names are resolved through a name -> id map that is loaded
+    once; missing categories are created together for each chunk. Each
+    chunk is one transaction written with executemany. A chunk that hits a
+    constraint (e.g. a duplicate barcode) is retried row by row, so only
+    the offending rows end up in the error report.
+
+    With a ``source``, every chunk also records a checkpoint in the same
+    transaction, so an interrupted import can continue after the last
+    committed row.
+
+    With ``upsert=True`` a row whose barcode already exists updates that
+    product (keeping its id and sales history) instead of failing. Missing
+    or None fields keep the product's current values (see UPSERT_PRODUCT)
+    and get the usual defaults on new products. ``imported`` counts new
+    products, ``updated`` and ``unchanged`` the matched ones.
+    """
+
+    def __init__(self, db_manager, chunk_size: int = IMPORT_CHUNK_SIZE,
+                 source: str = None, fingerprint: str = None,
+                 upsert: bool = False):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.source = source
+        self.fingerprint = fingerprint
+        self.upsert = upsert
+        self.categories: Optional[Dict[str, int]] = None
+        self.result = {'imported': 0, 'updated': 0, 'unchanged': 0, 'categories_created': 0,
+                       'error_count': 0, 'errors': [], 'cancelled': False}
+
+    def run(self, rows: Iterable[Dict], cancel: threading.Event = None,
+            on_chunk: Callable[[], None] = None) -> Dict:
+        """Import every row and return the result report.
+
+        ``cancel`` is checked after each committed chunk; ``on_chunk`` is
+        called after each one.
+        """
+        chunk = []
+        for number, row in enumerate(rows, start=1):
+            if 'row' not in row:
+                row = dict(row, row=number)
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.write_chunk(chunk)
+                chunk = []
+                if on_chunk is not None:
+                    on_chunk()
+                if cancel is not None and cancel.is_set():
+                    self.result['cancelled'] = True
+                    return self.result
+        if chunk:
+            self.write_chunk(chunk)
+            if on_chunk is not None:
+                on_chunk()
+        return self.result
+
+    def write_chunk(self, rows: List[Dict]):
+        """Validate and insert one chunk of rows in a single transaction"""
+        valid = []
+        for row in rows:
+            error = self._validate(row)
+            if error:
+                self._error(row, error)
+            else:
+                valid.append(row)
+        if not valid and self.source is None:
+            return
+
+        try:
+            with self.db_manager.transaction(immediate=True) as conn:
+                if valid:
+                    self._insert(conn, valid)
+                if self.source is not None:
+                    self._save_checkpoint(conn, rows[-1]['row'])
+        except Exception:
+            # Categories created in the rolled-back transaction are gone again
+            self.categories = None
+            raise
+
+    def _insert(self, conn: sqlite3.Connection, rows: List[Dict]):
+        self._resolve_categories(conn, {row['category'] for row in rows if row.get('category')})
+        params = [self._params(row) for row in rows]
+        try:
+            with self.db_manager.transaction():
+                counts = self._write(conn, params)
+            self._count(counts)
+        except sqlite3.IntegrityError:
+            self._insert_one_by_one(conn, rows, params)
+
+    def _write(self, conn: sqlite3.Connection, params: List[tuple]) -> Tuple[int, int, int]:
+        """Write rows and return their (inserted, updated, unchanged) counts"""
+        if not self.upsert:
+            conn.executemany(INSERT_PRODUCT, params)
+            return len(params), 0, 0
+
+        # A barcode seen earlier in the chunk is matched by the later rows too
+        seen = self._existing_barcodes(conn, [values[1] for values in params if values[1]])
+        matched = 0
+        rows = []
+        for values in params:
+            barcode = values[1]
+            if barcode in seen:
+                matched += 1
+            else:
+                if barcode:
+                    seen.add(barcode)
+                values = tuple(default if value is None else value
+                               for value, default in zip(values, INSERT_DEFAULTS))
+            rows.append(values)
+
+        # rowcount leaves out trigger writes and conflicts that changed nothing
+        written = conn.executemany(UPSERT_PRODUCT, rows).rowcount
+        inserted = len(params) - matched
+        return inserted, written - inserted, matched - (written - inserted)
+
+    @staticmethod
+    def _existing_barcodes(conn: sqlite3.Connection, barcodes: List[str]) -> Set[str]:
+        if not barcodes:
+            return set()
+        placeholders = ",".join("?" * len(barcodes))
+        return {row[0] for row in conn.execute(
+            f"SELECT barcode FROM products WHERE barcode IN ({placeholders})", barcodes)}
+
+    def _count(self, counts: Tuple[int, int, int]):
+        inserted, updated, unchanged = counts
+        self.result['imported'] += inserted
+        self.result['updated'] += updated
+        self.result['unchanged'] += unchanged
+
+    def _save_checkpoint(self, conn: sqlite3.Connection, rows_done: int):
+        conn.execute('''
+            INSERT INTO import_checkpoints
+                (source, fingerprint, rows_done, imported, updated, unchanged,
+                 categories_created, error_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(source) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                rows_done = excluded.rows_done,
+                imported = excluded.imported,
+                updated = excluded.updated,
+                unchanged = excluded.unchanged,
+                categories_created = excluded.categories_created,
+                error_count = excluded.error_count,
+                updated_at = excluded.updated_at
+        ''', (self.source, self.fingerprint, rows_done, self.result['imported'],
+              self.result['updated'], self.result['unchanged'],
+              self.result['categories_created'], self.result['error_count']))
+
+    def _insert_one_by_one(self, conn: sqlite3.Connection, rows: List[Dict], params: List[tuple]):
+        for row, values in zip(rows, params):
+            try:
+                with self.db_manager.transaction():
+                    counts = self._write(conn, [values])
+                self._count(counts)
+            except sqlite3.IntegrityError as e:
+                self._error(row, str(e))
+
+    def _resolve_categories(self, conn: sqlite3.Connection, names):
+        """Make sure every category name has an id, creating the missing ones"""
+        if self.categories is None:
+            self.categories = {row[1]: row[0] for row in conn.execute("SELECT id, name FROM categories")}
+
+        missing = sorted(name for name in names if name not in self.categories)
+        if not missing:
+            return
+
+        conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)",
+                         [(name,) for name in missing])
+        placeholders = ",".join("?" * len(missing))
+        for category_id, name in conn.execute(
+                f"SELECT id, name FROM categories WHERE name IN ({placeholders})", missing):
+            self.categories[name] = category_id
+        self.result['categories_created'] += len(missing)
+
+    def _params(self, row: Dict) -> tuple:
+        category = row.get('category')
+        if self.upsert:
+            # None is "keep the current value"; _write fills in defaults for new products
+            return (row['name'], row.get('barcode') or None, self.categories[category] if category else None,
+                    row['price'], row.get('cost_price'), row.get('quantity'), row.get('min_quantity'),
+                    row.get('description'))
+        return (
+            row['name'],
+            row.get('barcode') or None,
+            self.categories[category] if category else None,
+            row['price'],
+            row.get('cost_price', 0),
+            row.get('quantity', 0),
+            row.get('min_quantity', 5),
+            row.get('description', '')
+        )
+
+    def _validate(self, row: Dict) -> Optional[str]:
+        if not row.get('name'):
+            return "Missing product name"
+        price = row.get('price')
+        if not isinstance(price, (int, float)) or price <= 0:
+            return "Missing or invalid price"
+        for field in ('quantity', 'min_quantity'):
+            value = row.get(field, 0)
+            if not isinstance(value, int) and not (self.upsert and value is None):
+                return f"Invalid {field}"
+        return None
+
+    def _error(self, row: Dict, message: str):
+        self.result['error_count'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'row': row.get('row'), 'name': row.get('name'), 'error': message})
+
+def load_checkpoint(db_manager, source: str) -> Optional[Dict]:
+    """Return the saved checkpoint of an import source, if any"""
+    conn = db_manager.get_connection()
+    row = conn.execute("SELECT * FROM import_checkpoints WHERE source = ?", (source,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def clear_checkpoint(db_manager, source: str):
+    with db_manager.transaction() as conn:
+        conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+
+def import_feed(db_manager, feed, chunk_size: int = IMPORT_CHUNK_SIZE,
+                progress: Callable[[int, int], None] = None,
+                cancel: threading.Event = None, resume: bool = True,
+                upsert: bool = False) -> Dict:
+    """Stream a product feed (e.g. CSVProductFeed) into the database.
+
+    Rows are parsed, validated and written one chunk at a time, so memory
+    stays flat however large the file is. ``progress(done_kb, total_kb)``
+    is called after every chunk. A cancelled or failed import keeps its
+    checkpoint; with ``resume=True`` the next import of the same unchanged
+    file continues after the last committed row. Counts in the result
+    include the rows imported before the resume. With ``upsert=True``
+    existing barcodes are updated from the non-blank cells of each row
+    (see ProductImporter).
+    """
+    fingerprint = feed.fingerprint()
+    checkpoint = load_checkpoint(db_manager, feed.source)
+    if checkpoint and (not resume or checkpoint['fingerprint'] != fingerprint):
+        clear_checkpoint(db_manager, feed.source)
+        checkpoint = None
+
+    importer = ProductImporter(db_manager, chunk_size, source=feed.source, fingerprint=fingerprint,
+                               upsert=upsert)
+    start_after = 0
+    if checkpoint:
+        start_after = checkpoint['rows_done']
+        for key in ('imported', 'updated', 'unchanged', 'categories_created', 'error_count'):
+            importer.result[key] = checkpoint[key]
+    importer.result['resumed_after'] = start_after
+
+    def report_progress():
+        if progress is not None:
+            done, total = feed.position()
+            progress(done // 1024, max(total // 1024, 1))
+
+    # An update leaves blank cells alone instead of writing the field defaults
+    rows = feed.rows(start_after, defaults=KEEP_DEFAULTS if upsert else None)
+    try:
+        result = importer.run(rows, cancel=cancel, on_chunk=report_progress)
+    finally:
+        rows.close()
+    if not result['cancelled']:
+        clear_checkpoint(db_manager, feed.source)
+    return result
@@ -0,0 +1,184 @@
+"""
+Query Profiler - Opt-in statement timing and slow-query log
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List
+
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+# Code objects of wrappers that _call_site() looks past (see pass_through)
+_PASS_THROUGH = set()
+
+def pass_through(func):
+    """Mark a wrapper around cursor execution so call sites skip over it"""
+    _PASS_THROUGH.add(func.__code__)
+    return func
+
+class QueryProfiler:
+    """Collects per-statement timings and logs statements over a threshold.
+
+    Only a ``sample_rate`` fraction of statements is timed. Slow statements
+    are written with their call site and EXPLAIN QUERY PLAN to a rotating
+    log file. Parameters are never logged (they may hold password hashes).
+    """
+
+    def __init__(self, log_path: str = "slow_queries.log", threshold_ms: float = 100.0,
+                 sample_rate: float = 1.0, max_bytes: int = 1024 * 1024, backup_count: int = 3):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.enabled = True
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        self.logger = logging.getLogger(f"pos.slow_queries.{id(self)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._handler = None
+        if log_path:
+            self._handler = RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                backupCount=backup_count, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(self._handler)
+
+    def should_sample(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed: float,
+               rows: int, call_site: str):
+        """Add one timed statement to the statistics"""
+        elapsed_ms = elapsed * 1000.0
+        key = " ".join(sql.split())
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    'sql': key, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'rows': 0, 'call_sites': set()
+                }
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += max(rows, 0)
+            stats['call_sites'].add(call_site)
+
+        if elapsed_ms >= self.threshold_ms:
+            plan = self.explain(conn, sql, params)
+            self.logger.info("%.1f ms rows=%d at %s\n    %s\n    plan: %s",
+                             elapsed_ms, rows, call_site, key, plan)
+
+    def explain(self, conn: sqlite3.Connection, sql: str, params) -> str:
+        """Return the query plan as one line (empty if it cannot be explained)"""
+        try:
+            cursor = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params or ())
+            return " | ".join(row[3] for row in cursor.fetchall())
+        except sqlite3.Error:
+            return ""
+
+    def stats(self) -> List[Dict]:
+        """Return collected statistics, slowest total time first"""
+        with self._lock:
+            result = [dict(s, call_sites=sorted(s['call_sites'])) for s in self._stats.values()]
+        result.sort(key=lambda s: s['total_ms'], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def close(self):
+        self.enabled = False
+        if self._handler is not None:
+            self.logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+def _call_site() -> str:
+    """Return 'function (file:line)' of the first caller outside this module"""
+    frame = sys._getframe(2)
+    while frame is not None and (frame.f_code in _PASS_THROUGH
+                                 or os.path.normcase(frame.f_code.co_filename) == _THIS_FILE):
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports sampled statements to the connection's profiler.
+
+    SELECT timings include the first fetch call, since SQLite does most of
+    the work while rows are stepped.
+    """
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        profiler = self.connection.profiler
+        if profiler is None or not profiler.should_sample():
+            return super().execute(sql, parameters)
+
+        call_site = _call_site()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = time.perf_counter() - start
+
+        if self.description is not None:
+            self._pending = [profiler, sql, parameters, elapsed, 0, call_site]
+        else:
+            profiler.record(self.connection, sql, parameters, elapsed, self.rowcount, call_site)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        profiler = self.connection.profiler
+        if profiler is None or not profiler.should_sample():
+            return super().executemany(sql, seq_of_parameters)
+
+        seq_of_parameters = list(seq_of_parameters)
+        call_site = _call_site()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        elapsed = time.perf_counter() - start
+
+        first = seq_of_parameters[0] if seq_of_parameters else ()
+        profiler.record(self.connection, sql, first, elapsed, self.rowcount, call_site)
+        return self
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone, lambda row: row is not None)
+
+    def fetchmany(self, size=None):
+        fetch = super().fetchmany
+        return self._timed_fetch(lambda: fetch(size) if size is not None else fetch(), len)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall, len)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _timed_fetch(self, fetch, count):
+        if self._pending is None:
+            return fetch()
+
+        start = time.perf_counter()
+        result = fetch()
+        self._pending[3] += time.perf_counter() - start
+        self._pending[4] += count(result)
+        self._finish()
+        return result
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            profiler, sql, parameters, elapsed, rows, call_site = pending
+            profiler.record(self.connection, sql, parameters, elapsed, rows, call_site)
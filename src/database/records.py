@@ -0,0 +1,76 @@
+"""
+Records - Compact, read-only result rows
+"""
+
+import sqlite3
+from collections import namedtuple
+from typing import Dict, Tuple
+
+class Record(tuple):
+    """Base class of the compact row classes built by RecordFactory.
+
+    A record is a named tuple (attribute access, about a quarter of the
+    memory of a dict) that also reads like the dicts the query methods
+    return: ``row['name']``, ``row.get('barcode', '')``, ``'id' in row``,
+    ``keys()``/``items()`` and ``dict(row)`` all work. Records are
+    immutable; use ``dict(row)`` for a copy that can be changed.
+    """
+
+    __slots__ = ()
+    _keys: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._keys, self)
+
+_record_classes: Dict[Tuple[str, ...], type] = {}
+
+def record_class(columns: Tuple[str, ...]) -> type:
+    """Return the (shared) record class for a list of column names"""
+    cls = _record_classes.get(columns)
+    if cls is None:
+        # rename=True copes with duplicate or non-identifier column names;
+        # item access still uses the original names (last one wins, like dict(row))
+        base = namedtuple("Row", columns, rename=True)
+        cls = type("Record", (Record, base), {
+            '__slots__': (),
+            '_keys': columns,
+            '_index': {name: i for i, name in enumerate(columns)},
+        })
+        _record_classes[columns] = cls
+    return cls
+
+class RecordFactory:
+    """sqlite3 row_factory that builds Record instances.
+
+    The record class is looked up once per statement, not once per row.
+    """
+
+    def __init__(self):
+        self._description = None
+        self._make = None
+
+    def __call__(self, cursor: sqlite3.Cursor, row: tuple):
+        description = cursor.description
+        if description is not self._description:
+            self._description = description
+            self._make = record_class(tuple(column[0] for column in description))._make
+        return self._make(row)
@@ -0,0 +1,113 @@
+"""
+Sale Writer - Group-commit ingestion of sales from several lanes
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+class SaleWriter:
+    """Background writer that commits queued sales in shared transactions.
+
+    Each sale runs in its own savepoint, so one failed sale (for example
+    InsufficientStockError) does not affect the others in the batch. A
+    caller's future only resolves after the batch has been committed with
+    ``synchronous=FULL``, so the returned sale id is durable before a
+    receipt is printed.
+    """
+
+    def __init__(self, db_manager, max_delay: float = 0.005, max_batch: int = 64):
+        self.db_manager = db_manager
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stopping = False
+        # Most sales committed in one transaction so far
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="SaleWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, sale_data: Dict, sale_items: List[Dict],
+               activity: Tuple[str, str] = None) -> Future:
+        """Queue a sale; the future resolves to its sale id once committed"""
+        if self._stopping:
+            raise RuntimeError("Sale writer is stopped")
+
+        future = Future()
+        self._queue.put((sale_data, sale_items, activity, future))
+        return future
+
+    def is_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def stop(self):
+        """Flush every queued sale and stop the writer thread"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        # WAL with synchronous=NORMAL (the pool default) may lose the last
+        # commits on power loss; one fsync per batch is what grouping buys
+        self.db_manager.get_connection().execute("PRAGMA synchronous = FULL")
+
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            stop_after_batch = False
+            deadline = time.monotonic() + self.max_delay
+
+            # Gather whatever else arrives within the commit window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop_after_batch = True
+                    break
+                batch.append(request)
+
+            self._write_batch(batch)
+
+            if stop_after_batch:
+                break
+
+        self.db_manager.release_connection()
+
+    def _write_batch(self, batch):
+        self.largest_batch = max(self.largest_batch, len(batch))
+        results = []
+        try:
+            with self.db_manager.transaction(immediate=True):
+                for sale_data, sale_items, activity, future in batch:
+                    try:
+                        # Nested transaction = savepoint per sale
+                        sale_id = self.db_manager._write_sale(sale_data, sale_items, activity)
+                        results.append((future, sale_id, None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            # The commit itself failed - nothing in the batch was written
+            self.db_manager.refresh_cached_products(
+                [item['product_id'] for _, sale_items, _, _ in batch for item in sale_items]
+            )
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for future, sale_id, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(sale_id)
@@ -0,0 +1,55 @@
+"""
+Settings Cache - In-process copy of the settings table
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+class SettingsCache:
+    """Key -> value map loaded once and updated by DatabaseManager writes"""
+
+    def __init__(self):
+        self._values: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def get(self, key: str) -> Optional[str]:
+        return self._values.get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        values = self._values
+        return {key: values.get(key) for key in keys}
+
+    def all(self) -> Dict[str, Optional[str]]:
+        return dict(self._values)
+
+    def load(self, items: Iterable[Tuple[str, Optional[str]]]):
+        """Replace the whole cache with the given key/value pairs"""
+        values = dict(items)
+        with self._lock:
+            self._values = values
+            self.loaded = True
+
+    def update(self, mapping: Dict[str, Optional[str]]):
+        """Apply committed changes"""
+        with self._lock:
+            values = dict(self._values)
+            values.update(mapping)
+            self._values = values
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+            self.loaded = False
+
+_caches: Dict[str, SettingsCache] = {}
+_caches_lock = threading.Lock()
+
+def get_settings_cache(db_path: str) -> SettingsCache:
+    """Return the process-wide settings cache for a database file"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = SettingsCache()
+        return _caches[key]
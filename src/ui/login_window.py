@@ -11,6 +11,7 @@ from PySide6.QtGui import QPixmap, QFont, QIcon
 from src.database.database_manager import DatabaseManager
 from src.ui.main_window import MainWindow
 from src.utils.language_manager import LanguageManager
+from src.utils.background_task import run_in_background
 
 class LoginWindow(QWidget):
     login_successful = Signal(dict)
@@ -313,9 +314,15 @@ class LoginWindow(QWidget):
         self.login_button.setEnabled(False)
         self.login_button.setText("Signing in...")
         
-        # Authenticate user
-        user = self.db_manager.authenticate_user(username, password)
+        # Authenticate user off the UI thread
+        run_in_background(
+            self.db_manager.authenticate_user, username, password,
+            on_result=self.on_authenticated,
+            on_error=lambda e: self.on_authenticated(None)
+        )
         
+    def on_authenticated(self, user):
+        """Handle the authentication result"""
         if user:
             self.show_success("Login successful!")
             
@@ -5,7 +5,7 @@ Main Application - Single window with login and main interface - UPDATED
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QStackedWidget, QLabel, QPushButton, QFrame,
                               QLineEdit, QComboBox, QCheckBox, QMessageBox,
-                              QSpacerItem, QSizePolicy, QScrollArea, QApplication)
+                              QSpacerItem, QSizePolicy, QScrollArea)
 from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QFont, QPixmap
 
@@ -16,6 +16,7 @@ from src.ui.modules.reports_module import ReportsModule
 from src.ui.modules.users_module import UsersModule
 from src.ui.modules.settings_module import SettingsModule
 from src.utils.theme_manager import ThemeManager
+from src.utils.background_task import run_in_background
 
 class LoginPage(QWidget):
     """Login page widget - UPDATED"""
@@ -293,7 +294,7 @@ class LoginPage(QWidget):
         username = self.username_input.text().strip()
         password = self.password_input.text()
         
-        print(f"Username: '{username}', Password: '{password}'")
+        print(f"Username: '{username}'")
         
         if not username or not password:
             self.show_error("Please enter both username and password")
@@ -305,29 +306,33 @@ class LoginPage(QWidget):
         self.status_label.setText("Authenticating...")
         self.status_label.setStyleSheet("color: #3498db;")
         
-        # Force GUI update
-        QApplication.processEvents()
-        
-        try:
-            # Authenticate user
-            print("Attempting authentication...")
-            user = self.db_manager.authenticate_user(username, password)
-            print(f"Authentication result: {user}")
-            
-            if user:
-                self.show_success("Login successful!")
-                print("Emitting login_successful signal...")
-                # Emit signal with user data
-                QTimer.singleShot(500, lambda: self.login_successful.emit(user))
-            else:
-                self.show_error("Invalid username or password")
-                self.reset_login_button()
-                
-        except Exception as e:
-            print(f"Login error: {e}")
-            self.show_error(f"Login error: {str(e)}")
+        # bcrypt is slow on purpose - verify off the UI thread
+        print("Attempting authentication...")
+        run_in_background(
+            self.db_manager.authenticate_user, username, password,
+            on_result=self.on_authenticated,
+            on_error=self.on_authentication_error
+        )
+        
+    def on_authenticated(self, user):
+        """Handle the authentication result"""
+        print(f"Authentication result: {user is not None}")
+        
+        if user:
+            self.show_success("Login successful!")
+            print("Emitting login_successful signal...")
+            # Emit signal with user data
+            QTimer.singleShot(500, lambda: self.login_successful.emit(user))
+        else:
+            self.show_error("Invalid username or password")
             self.reset_login_button()
             
+    def on_authentication_error(self, error):
+        """Handle an exception raised during authentication"""
+        print(f"Login error: {error}")
+        self.show_error(f"Login error: {str(error)}")
+        self.reset_login_button()
+            
     def reset_login_button(self):
         """Reset login button state"""
         self.login_button.setEnabled(True)
@@ -398,6 +403,7 @@ class MainDashboard(QWidget):
     """Main dashboard with sidebar and content area"""
     
     logout_requested = Signal()  # NEW SIGNAL
+    database_restored = Signal()
     
     def __init__(self, user, db_manager):
         super().__init__()
@@ -614,6 +620,7 @@ class MainDashboard(QWidget):
             self.modules['settings'] = SettingsModule(self.user, self.db_manager)
             # Connect settings changed signal to apply changes
             self.modules['settings'].settings_changed.connect(self.apply_settings_changes)
+            self.modules['settings'].database_restored.connect(self.database_restored)
             self.content_area.addWidget(self.modules['settings'])
         except Exception as e:
             print(f"Error loading Settings module: {e}")
@@ -667,12 +674,14 @@ class MainDashboard(QWidget):
         """Apply settings changes immediately"""
         print("Applying settings changes...")
         
+        settings = self.db_manager.get_settings(["theme", "language"])
+        
         # Apply theme changes
-        theme = self.db_manager.get_setting("theme") or "light"
+        theme = settings["theme"] or "light"
         self.theme_manager.apply_theme(theme)
         
         # Apply language changes (if needed)
-        language = self.db_manager.get_setting("language") or "en"
+        language = settings["language"] or "en"
         # Language changes would require app restart for full effect
         
         print(f"Applied theme: {theme}, language: {language}")
@@ -683,9 +692,52 @@ class MainApplication(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
+        self.db_manager.enable_async_logging()
         self.current_user = None
+        
+        # Multi-lane stores can batch checkout commits
+        if self.db_manager.get_setting("group_commit") == "1":
+            self.db_manager.enable_group_commit()
+        
+        self.db_manager.configure_backup_scheduler()
+        
+        # ANALYZE / incremental VACUUM / WAL checkpoints while the register is idle
+        try:
+            idle_minutes = float(self.db_manager.get_setting("maintenance_idle_minutes") or 10)
+        except ValueError as e:
+            print(f"Invalid maintenance_idle_minutes setting: {e}")
+            idle_minutes = 10
+        if idle_minutes > 0:
+            self.db_manager.enable_maintenance_scheduler(idle_minutes=idle_minutes)
+        
+        # Move closed years of sales history out of the hot database
+        try:
+            keep_years = int(self.db_manager.get_setting("archive_keep_years") or 0)
+        except ValueError as e:
+            print(f"Invalid archive_keep_years setting: {e}")
+            keep_years = 0
+        if keep_years > 0:
+            archiving = self.db_manager.submit("archive_closed_years", keep_years)
+            archiving.add_done_callback(self.report_archive_failure)
+        
+        # Opt-in production profiling, e.g. query_profile_sample_rate = 0.05
+        try:
+            sample_rate = min(max(float(self.db_manager.get_setting("query_profile_sample_rate") or 0), 0.0), 1.0)
+            threshold_ms = float(self.db_manager.get_setting("slow_query_threshold_ms") or 100)
+        except ValueError as e:
+            print(f"Invalid query profiler settings: {e}")
+            sample_rate = 0
+        if sample_rate > 0:
+            self.db_manager.enable_query_profiler(threshold_ms=threshold_ms, sample_rate=sample_rate)
+            
         self.setup_ui()
         
+    @staticmethod
+    def report_archive_failure(future):
+        """Print why the background sales archive run failed, if it did"""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error archiving closed years: {future.exception()}")
+        
     def setup_ui(self):
         """Setup main application interface"""
         self.setWindowTitle("LKS POS System")  # CHANGED NAME
@@ -712,12 +764,16 @@ class MainApplication(QMainWindow):
         
         self.current_user = user
         
+        # Warm the barcode cache so the first scans never hit the database
+        self.db_manager.preload_product_cache()
+        
         try:
             # Create and show main dashboard
             print("Creating dashboard...")
             self.dashboard = MainDashboard(user, self.db_manager)
             # Connect logout signal - FIXED
             self.dashboard.logout_requested.connect(self.show_login)
+            self.dashboard.database_restored.connect(self.on_database_restored)
             self.central_widget.addWidget(self.dashboard)
             self.central_widget.setCurrentWidget(self.dashboard)
             
@@ -730,6 +786,19 @@ class MainApplication(QMainWindow):
             print(f"Error creating dashboard: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load dashboard: {str(e)}")
         
+    def on_database_restored(self):
+        """Rebuild the dashboard so every module shows the restored data"""
+        user = next((u for u in self.db_manager.get_all_users()
+                     if u['id'] == self.current_user['id'] and u['is_active']), None)
+        
+        self.show_login()
+        if user is None:
+            QMessageBox.information(self, "Restore Complete",
+                                    "Your account does not exist in the restored data. Please sign in again.")
+            return
+        
+        self.on_login_success(user)
+        
     def show_login(self):
         """Show login page (for logout) - FIXED"""
         print("Showing login page...")
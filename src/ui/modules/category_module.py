@@ -10,6 +10,8 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont, QAction
 
+from src.utils.background_task import deliver
+
 class CategoryDialog(QDialog):
     """Dialog for adding/editing categories"""
     
@@ -186,36 +188,22 @@ class CategoryDialog(QDialog):
             conn = self.db_manager.get_connection()
             cursor = conn.cursor()
             
+            # Check if name already exists (excluding current category)
             if self.is_edit_mode:
-                # Check if name already exists (excluding current category)
                 cursor.execute('SELECT id FROM categories WHERE name = ? AND id != ?', (name, self.category['id']))
-                if cursor.fetchone():
-                    QMessageBox.warning(self, "Validation Error", "A category with this name already exists.")
-                    conn.close()
-                    return
-                
-                # Update existing category
-                cursor.execute('''
-                    UPDATE categories 
-                    SET name=?, description=?
-                    WHERE id=?
-                ''', (name, description, self.category['id']))
             else:
-                # Check if name already exists
                 cursor.execute('SELECT id FROM categories WHERE name = ?', (name,))
-                if cursor.fetchone():
-                    QMessageBox.warning(self, "Validation Error", "A category with this name already exists.")
-                    conn.close()
-                    return
-                
-                # Insert new category
-                cursor.execute('''
-                    INSERT INTO categories (name, description)
-                    VALUES (?, ?)
-                ''', (name, description))
+            if cursor.fetchone():
+                QMessageBox.warning(self, "Validation Error", "A category with this name already exists.")
+                return
             
-            conn.commit()
-            conn.close()
+            if self.is_edit_mode:
+                # Update existing category
+                self.db_manager.update_category(self.category['id'],
+                                                {'name': name, 'description': description})
+            else:
+                # Insert new category
+                self.db_manager.create_category({'name': name, 'description': description})
             
             self.accept()
             
@@ -427,24 +415,14 @@ class CategoryModule(QWidget):
         self.search_input.textChanged.connect(self.filter_categories)
         
     def load_categories(self):
-        """Load categories into table"""
+        """Load categories (with product counts) without blocking the UI"""
+        future = self.db_manager.submit("get_all_categories", compact=True, key="categories.list")
+        deliver(future, self.populate_categories,
+                lambda e: QMessageBox.critical(self, "Error", f"Failed to load categories: {str(e)}"))
+        
+    def populate_categories(self, categories):
+        """Fill the categories table"""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            # Get categories with product count
-            cursor.execute('''
-                SELECT c.id, c.name, c.description, c.created_at,
-                       COUNT(p.id) as product_count
-                FROM categories c
-                LEFT JOIN products p ON c.id = p.category_id AND p.is_active = 1
-                GROUP BY c.id, c.name, c.description, c.created_at
-                ORDER BY c.name
-            ''')
-            
-            categories = cursor.fetchall()
-            conn.close()
-            
             self.categories_table.setRowCount(len(categories))
             
             total_products = 0
@@ -503,7 +481,7 @@ class CategoryModule(QWidget):
                         background-color: #0056b3;
                     }
                 """)
-                edit_button.clicked.connect(lambda checked, c=dict(category): self.edit_category(c))
+                edit_button.clicked.connect(lambda checked, c=category: self.edit_category(c))
                 
                 delete_button = QPushButton("🗑️ Delete")
                 delete_button.setToolTip("Delete Category")
@@ -521,7 +499,7 @@ class CategoryModule(QWidget):
                         background-color: #c82333;
                     }
                 """)
-                delete_button.clicked.connect(lambda checked, c=dict(category): self.delete_category(c))
+                delete_button.clicked.connect(lambda checked, c=category: self.delete_category(c))
                 
                 actions_layout.addWidget(edit_button)
                 actions_layout.addWidget(delete_button)
@@ -626,17 +604,8 @@ class CategoryModule(QWidget):
         
         if reply == QMessageBox.Yes:
             try:
-                conn = self.db_manager.get_connection()
-                cursor = conn.cursor()
-                
-                # Remove category assignment from products
-                cursor.execute('UPDATE products SET category_id = NULL WHERE category_id = ?', (category['id'],))
-                
-                # Delete category
-                cursor.execute('DELETE FROM categories WHERE id = ?', (category['id'],))
-                
-                conn.commit()
-                conn.close()
+                # Removes the category assignment from products, then deletes it
+                self.db_manager.delete_category(category['id'])
                 
                 self.load_categories()
                 QMessageBox.information(self, "Success", "Category deleted successfully!")
@@ -7,10 +7,14 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QFrame, QComboBox, QSpinBox, QDoubleSpinBox,
                               QMessageBox, QDialog, QDialogButtonBox, QTextEdit,
                               QGridLayout, QGroupBox, QFileDialog, QTabWidget,
-                              QHeaderView, QAbstractItemView)
+                              QHeaderView, QAbstractItemView, QProgressDialog, QCheckBox)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont, QPixmap
 import os
+import threading
+
+from src.database.product_feed import RowMapper, open_product_feed
+from src.utils.background_task import deliver, run_in_background
 
 class CategoryDialog(QDialog):
     """Dialog for adding/editing categories"""
@@ -83,25 +87,13 @@ class CategoryDialog(QDialog):
         description = self.description_input.toPlainText().strip()
         
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            
             if self.is_edit_mode:
                 # Update existing category
-                cursor.execute('''
-                    UPDATE categories 
-                    SET name=?, description=?
-                    WHERE id=?
-                ''', (name, description, self.category['id']))
+                self.db_manager.update_category(self.category['id'],
+                                                {'name': name, 'description': description})
             else:
                 # Insert new category
-                cursor.execute('''
-                    INSERT INTO categories (name, description)
-                    VALUES (?, ?)
-                ''', (name, description))
-            
-            conn.commit()
-            conn.close()
+                self.db_manager.create_category({'name': name, 'description': description})
             
             self.accept()
             
@@ -323,33 +315,126 @@ class ProductDialog(QDialog):
         }
         
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            
+            # DatabaseManager keeps the barcode cache in sync
             if self.is_edit_mode:
                 # Update existing product
-                cursor.execute('''
-                    UPDATE products 
-                    SET name=?, barcode=?, category_id=?, description=?, cost_price=?,
-                        price=?, quantity=?, min_quantity=?, image_path=?, updated_at=CURRENT_TIMESTAMP
-                    WHERE id=?
-                ''', (*product_data.values(), self.product['id']))
+                self.db_manager.update_product(self.product['id'], product_data)
             else:
                 # Insert new product
-                cursor.execute('''
-                    INSERT INTO products (name, barcode, category_id, description, cost_price,
-                                        price, quantity, min_quantity, image_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', tuple(product_data.values()))
-            
-            conn.commit()
-            conn.close()
+                self.db_manager.create_product(product_data)
             
             self.accept()
             
         except Exception as e:
             QMessageBox.critical(self, "Database Error", f"Failed to save product: {str(e)}")
 
+class ColumnMappingDialog(QDialog):
+    """Dialog for choosing which file column feeds each product field"""
+    
+    FIELD_LABELS = [
+        ('name', "Name"), ('price', "Price"), ('cost_price', "Cost Price"),
+        ('quantity', "Quantity"), ('min_quantity', "Min Stock"), ('barcode', "Barcode"),
+        ('category', "Category"), ('description', "Description"),
+    ]
+    
+    def __init__(self, db_manager, header, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.header = header
+        self.profiles = db_manager.get_import_profiles()
+        self.field_combos = {}
+        self.setup_ui()
+        self.apply_mapping(RowMapper(header).mapping())
+        
+    def setup_ui(self):
+        """Setup mapping dialog UI"""
+        self.setWindowTitle("Import Column Mapping")
+        self.setMinimumWidth(450)
+        
+        layout = QVBoxLayout()
+        
+        # Saved supplier profiles
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Supplier Profile:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("Automatic (match column names)", None)
+        for name in self.profiles:
+            self.profile_combo.addItem(name, name)
+        self.profile_combo.currentIndexChanged.connect(self.on_profile_changed)
+        profile_layout.addWidget(self.profile_combo)
+        
+        # One column picker per product field
+        mapping_group = QGroupBox("Columns")
+        mapping_layout = QGridLayout()
+        for row, (field, label) in enumerate(self.FIELD_LABELS):
+            mapping_layout.addWidget(QLabel(f"{label}:"), row, 0)
+            combo = QComboBox()
+            combo.addItem("(not imported)", None)
+            for column in self.header:
+                combo.addItem(column, column)
+            mapping_layout.addWidget(combo, row, 1)
+            self.field_combos[field] = combo
+        mapping_group.setLayout(mapping_layout)
+        
+        # Save as profile
+        save_layout = QHBoxLayout()
+        save_layout.addWidget(QLabel("Save as profile:"))
+        self.profile_name_input = QLineEdit()
+        self.profile_name_input.setPlaceholderText("Supplier name (optional)")
+        save_layout.addWidget(self.profile_name_input)
+        
+        # Incremental catalog updates (price and stock refreshes)
+        self.update_existing_checkbox = QCheckBox("Update existing products with the same barcode")
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.save_mapping)
+        button_box.rejected.connect(self.reject)
+        
+        layout.addLayout(profile_layout)
+        layout.addWidget(mapping_group)
+        layout.addLayout(save_layout)
+        layout.addWidget(self.update_existing_checkbox)
+        layout.addWidget(button_box)
+        
+        self.setLayout(layout)
+        
+    def on_profile_changed(self):
+        """Show the selected profile's mapping"""
+        name = self.profile_combo.currentData()
+        self.apply_mapping(RowMapper(self.header, self.profiles.get(name)).mapping())
+        if name:
+            self.profile_name_input.setText(name)
+        
+    def apply_mapping(self, mapping):
+        for field, combo in self.field_combos.items():
+            index = combo.findData(mapping.get(field))
+            combo.setCurrentIndex(max(index, 0))
+        
+    def mapping(self):
+        """Return the chosen {field: column header} mapping"""
+        return {field: combo.currentData() for field, combo in self.field_combos.items()}
+        
+    def update_existing(self):
+        """Return True to update products whose barcode already exists"""
+        return self.update_existing_checkbox.isChecked()
+        
+    def save_mapping(self):
+        """Validate and optionally store the mapping as a supplier profile"""
+        mapping = self.mapping()
+        if not mapping['name'] or not mapping['price']:
+            QMessageBox.warning(self, "Validation Error", "Choose the columns for name and price.")
+            return
+        
+        profile_name = self.profile_name_input.text().strip()
+        if profile_name:
+            try:
+                self.db_manager.save_import_profile(profile_name, mapping)
+            except Exception as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to save profile: {str(e)}")
+                return
+        
+        self.accept()
+
 class InventoryModule(QWidget):
     """Inventory management module"""
 
@@ -538,9 +623,17 @@ class InventoryModule(QWidget):
             self.category_filter.addItem(category['name'], category['id'])
             
     def load_products(self):
-        """Load products into table"""
-        products = self.db_manager.get_products()
+        """Load products into table without blocking the UI"""
+        self.total_products_label.setText("Loading products...")
+        future = self.db_manager.submit("get_products", compact=True, key="inventory.products")
+        deliver(future, self.populate_products, self.on_load_error)
         
+    def on_load_error(self, error):
+        """Show a failed background load"""
+        QMessageBox.critical(self, "Database Error", f"Failed to load products: {str(error)}")
+        
+    def populate_products(self, products):
+        """Fill the products table"""
         self.products_table.setRowCount(len(products))
         
         total_value = 0
@@ -637,9 +730,26 @@ class InventoryModule(QWidget):
         self.total_value_label.setText(f"Total Value: {total_value:.2f} DZD")
         self.low_stock_label.setText(f"Low Stock Items: {low_stock_count}")
         
+        # Re-apply any active filter to the new rows
+        self.filter_products()
+        
     def filter_products(self):
         """Filter products based on search criteria"""
-        search_term = self.search_input.text().lower()
+        search_term = self.search_input.text().strip()
+        
+        if not search_term:
+            self.db_manager.cancel_request("inventory.search")
+            self.apply_product_filter(None)
+            return
+        
+        # Resolve the search against the full-text index; each keystroke
+        # supersedes the previous search
+        future = self.db_manager.submit("search_products", search_term, limit=None,
+                                        key="inventory.search")
+        deliver(future, lambda products: self.apply_product_filter({str(p['id']) for p in products}))
+        
+    def apply_product_filter(self, matching_ids):
+        """Show only rows matching the search results and filters"""
         category_id = self.category_filter.currentData()
         stock_status = self.stock_filter.currentText()
         
@@ -647,10 +757,8 @@ class InventoryModule(QWidget):
             show_row = True
             
             # Search filter
-            if search_term:
-                name = self.products_table.item(row, 1).text().lower()
-                barcode = self.products_table.item(row, 2).text().lower()
-                if search_term not in name and search_term not in barcode:
+            if matching_ids is not None:
+                if self.products_table.item(row, 0).text() not in matching_ids:
                     show_row = False
             
             # Category filter
@@ -702,11 +810,7 @@ class InventoryModule(QWidget):
         
         if reply == QMessageBox.Yes:
             try:
-                conn = self.db_manager.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("UPDATE products SET is_active = 0 WHERE id = ?", (product['id'],))
-                conn.commit()
-                conn.close()
+                self.db_manager.deactivate_product(product['id'])
                 
                 self.load_products()
                 QMessageBox.information(self, "Success", "Product deleted successfully!")
@@ -715,7 +819,7 @@ class InventoryModule(QWidget):
                 QMessageBox.critical(self, "Error", f"Failed to delete product: {str(e)}")
                 
     def import_products(self):
-        """Import products from CSV"""
+        """Import products from CSV or Excel, streamed on a worker thread"""
         try:
             from src.utils.csv_handler import CSVHandler
             
@@ -723,79 +827,96 @@ class InventoryModule(QWidget):
             file_path = csv_handler.get_import_file()
             
             if file_path:
-                # Import products
-                products = csv_handler.import_products(file_path)
-                
-                if not products:
-                    QMessageBox.warning(self, "Import Warning", "No valid products found in the file.")
+                # Large files (full catalog refreshes) are parsed on every core
+                feed = open_product_feed(file_path, workers=os.cpu_count())
+                mapping_dialog = ColumnMappingDialog(self.db_manager, feed.header(), parent=self)
+                if mapping_dialog.exec() != QDialog.Accepted:
                     return
+                feed.profile = mapping_dialog.mapping()
+                upsert = mapping_dialog.update_existing()
+                resume = False
                 
-                # Confirm import
-                reply = QMessageBox.question(self, "Confirm Import",
-                                           f"Found {len(products)} products to import.\n"
-                                           "Do you want to continue?",
-                                           QMessageBox.Yes | QMessageBox.No)
+                checkpoint = self.db_manager.get_import_checkpoint(feed)
+                if checkpoint:
+                    reply = QMessageBox.question(self, "Resume Import",
+                                               f"A previous import of this file stopped after row "
+                                               f"{checkpoint['rows_done']} ({checkpoint['imported']} "
+                                               "products imported).\nResume where it stopped?",
+                                               QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+                    if reply == QMessageBox.Cancel:
+                        return
+                    resume = reply == QMessageBox.Yes
+                else:
+                    # Confirm import
+                    size_mb = feed.size / (1024 * 1024)
+                    reply = QMessageBox.question(self, "Confirm Import",
+                                               f"Import products from {os.path.basename(file_path)} "
+                                               f"({size_mb:.1f} MB)?",
+                                               QMessageBox.Yes | QMessageBox.No)
+                    if reply != QMessageBox.Yes:
+                        return
                 
-                if reply == QMessageBox.Yes:
-                    imported_count = 0
-                    errors = []
-                    
-                    for product in products:
-                        try:
-                            # Check if category exists, create if not
-                            category_id = None
-                            if product.get('category'):
-                                conn = self.db_manager.get_connection()
-                                cursor = conn.cursor()
-                                cursor.execute('SELECT id FROM categories WHERE name = ?', (product['category'],))
-                                category = cursor.fetchone()
-                                
-                                if not category:
-                                    cursor.execute('INSERT INTO categories (name) VALUES (?)', (product['category'],))
-                                    category_id = cursor.lastrowid
-                                else:
-                                    category_id = category['id']
-                                
-                                conn.commit()
-                                conn.close()
-                            
-                            # Insert product
-                            conn = self.db_manager.get_connection()
-                            cursor = conn.cursor()
-                            cursor.execute('''
-                                INSERT INTO products (name, barcode, category_id, price, cost_price, 
-                                                    quantity, min_quantity, description)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                product['name'],
-                                product.get('barcode') or None,
-                                category_id,
-                                product['price'],
-                                product.get('cost_price', 0),
-                                product['quantity'],
-                                product.get('min_quantity', 5),
-                                product.get('description', '')
-                            ))
-                            conn.commit()
-                            conn.close()
-                            imported_count += 1
-                            
-                        except Exception as e:
-                            errors.append(f"Error importing '{product['name']}': {str(e)}")
-                    
-                    # Show results
-                    message = f"Successfully imported {imported_count} products."
-                    if errors:
-                        message += f"\n\nErrors ({len(errors)}):\n" + "\n".join(errors[:5])
-                        if len(errors) > 5:
-                            message += f"\n... and {len(errors) - 5} more errors."
-                    
-                    QMessageBox.information(self, "Import Complete", message)
-                    self.load_products()
+                self.import_cancel = threading.Event()
+                self.import_progress = QProgressDialog("Importing products...", "Cancel", 0, 100, self)
+                self.import_progress.setWindowTitle("Import")
+                self.import_progress.setMinimumDuration(500)
+                self.import_progress.canceled.connect(self.import_cancel.set)
+                self.import_button.setEnabled(False)
+                
+                run_in_background(
+                    self.db_manager.import_product_feed, feed,
+                    cancel=self.import_cancel, resume=resume, upsert=upsert,
+                    on_progress=self.on_import_progress,
+                    on_result=self.on_import_finished,
+                    on_error=self.on_import_error
+                )
                     
         except Exception as e:
             QMessageBox.critical(self, "Import Error", f"Failed to import products: {str(e)}")
         
+    def on_import_progress(self, done, total):
+        """Update the import progress dialog"""
+        if not self.import_cancel.is_set():
+            self.import_progress.setMaximum(total)
+            self.import_progress.setValue(done)
+        
+    def on_import_finished(self, result):
+        """Show the import report and reload the table"""
+        self.import_progress.close()
+        self.import_button.setEnabled(True)
+        errors = result['errors']
+        self.db_manager.log_activity(self.user['id'], "products_imported",
+                                     f"{result['imported']} imported, {result['updated']} updated, "
+                                     f"{result['error_count']} errors"
+                                     + (" (cancelled)" if result['cancelled'] else ""))
+        
+        message = f"Successfully imported {result['imported']} products."
+        if result['updated'] or result['unchanged']:
+            message += (f"\nUpdated {result['updated']} existing products "
+                        f"({result['unchanged']} unchanged).")
+        if result['cancelled']:
+            message = (f"Import cancelled after {result['imported']} new and "
+                       f"{result['updated']} updated products.\n"
+                       "Import the same file again to resume where it stopped.")
+        if result['categories_created']:
+            message += f"\nCreated {result['categories_created']} new categories."
+        if result['error_count']:
+            lines = [f"Row {e['row']} ('{e['name']}'): {e['error']}" for e in errors[:5]]
+            message += f"\n\nErrors ({result['error_count']}):\n" + "\n".join(lines)
+            if result['error_count'] > 5:
+                message += f"\n... and {result['error_count'] - 5} more errors."
+        
+        QMessageBox.information(self, "Import Complete", message)
+        self.load_products()
+        
+    def on_import_error(self, error):
+        """Show a failed import; committed chunks stay and the file can be resumed"""
+        self.import_progress.close()
+        self.import_button.setEnabled(True)
+        QMessageBox.critical(self, "Import Error", f"Failed to import products: {str(error)}\n"
+                             "Import the same file again to resume where it stopped.")
+        self.load_products()
+        
     def export_products(self):
         """Export products to CSV"""
         try:
@@ -805,11 +926,12 @@ class InventoryModule(QWidget):
             file_path = csv_handler.get_export_file("products_export.csv")
             
             if file_path:
-                products = self.db_manager.get_products()
-                csv_handler.export_products(products, file_path)
+                # Streamed from one snapshot, never held in memory as a whole
+                products = self.db_manager.iter_products()
+                count = csv_handler.export_products(products, file_path)
                 
                 QMessageBox.information(self, "Export Complete", 
-                                      f"Successfully exported {len(products)} products to:\n{file_path}")
+                                      f"Successfully exported {count} products to:\n{file_path}")
                 
         except Exception as e:
             QMessageBox.critical(self, "Export Error", f"Failed to export products: {str(e)}")
@@ -6,12 +6,16 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
                               QFrame, QSpinBox, QDoubleSpinBox, QComboBox,
                               QMessageBox, QDialog, QDialogButtonBox, QTextEdit,
-                              QGridLayout, QGroupBox, QScrollArea)
+                              QGridLayout, QGroupBox, QScrollArea, QListWidget,
+                              QListWidgetItem)
 from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QFont, QPixmap
 from datetime import datetime
 import uuid
 
+from src.database.database_manager import InsufficientStockError
+from src.utils.background_task import deliver
+
 class PaymentDialog(QDialog):
     """Payment processing dialog - CASH ONLY"""
     
@@ -164,6 +168,29 @@ class POSModule(QWidget):
         search_layout.addWidget(self.barcode_input, 1)
         search_layout.addWidget(self.search_button)
         
+        # Name search - results are listed for the cashier to pick from
+        self.name_search_input = QLineEdit()
+        self.name_search_input.setPlaceholderText("Search products by name")
+        self.name_search_input.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #ced4da;
+                border-radius: 4px;
+                font-size: 14px;
+            }
+        """)
+        
+        self.search_results_list = QListWidget()
+        self.search_results_list.setMaximumHeight(150)
+        self.search_results_list.setStyleSheet("""
+            QListWidget {
+                border: 1px solid #dee2e6;
+                border-radius: 5px;
+                background-color: white;
+            }
+        """)
+        self.search_results_list.hide()
+        
         # Product display
         self.product_info_frame = QFrame()
         self.product_info_frame.setStyleSheet("""
@@ -246,6 +273,8 @@ class POSModule(QWidget):
         
         layout.addWidget(header)
         layout.addWidget(search_frame)
+        layout.addWidget(self.name_search_input)
+        layout.addWidget(self.search_results_list)
         layout.addWidget(self.product_info_frame)
         layout.addWidget(quick_access_label)
         layout.addWidget(scroll_area)
@@ -363,6 +392,9 @@ class POSModule(QWidget):
         """Setup signal connections"""
         self.barcode_input.returnPressed.connect(self.search_product)
         self.search_button.clicked.connect(self.search_product)
+        self.name_search_input.textChanged.connect(self.search_by_name)
+        self.search_results_list.itemActivated.connect(self.select_search_result)
+        self.search_results_list.itemClicked.connect(self.select_search_result)
         self.add_to_cart_button.clicked.connect(self.add_to_cart)
         self.checkout_button.clicked.connect(self.process_checkout)
         self.clear_cart_button.clicked.connect(self.clear_cart)
@@ -426,6 +458,37 @@ class POSModule(QWidget):
                               f"No product found with barcode: {barcode}")
             self.clear_product_display()
             
+    def search_by_name(self):
+        """List full-text matches for the name search box"""
+        search_term = self.name_search_input.text().strip()
+        
+        if not search_term:
+            self.db_manager.cancel_request("pos.search")
+            self.populate_search_results([])
+            return
+        
+        # Each keystroke supersedes the previous search
+        future = self.db_manager.submit("search_products", search_term, limit=20,
+                                        key="pos.search")
+        deliver(future, self.populate_search_results)
+        
+    def populate_search_results(self, products):
+        """Show name search results for the cashier to pick from"""
+        self.search_results_list.clear()
+        
+        for product in products:
+            item = QListWidgetItem(f"{product['name']} - {product['price']:.2f} DZD "
+                                   f"({product['quantity']} in stock)")
+            item.setData(Qt.UserRole, product)
+            self.search_results_list.addItem(item)
+        
+        self.search_results_list.setVisible(bool(products))
+        
+    def select_search_result(self, item):
+        """Display the product the cashier picked from the search results"""
+        self.quick_select_product(item.data(Qt.UserRole))
+        self.name_search_input.clear()
+            
     def quick_select_product(self, product):
         """Quick select product from buttons"""
         self.display_product(product)
@@ -597,12 +660,11 @@ class POSModule(QWidget):
                 })
             
             try:
-                # Save sale to database
-                sale_id = self.db_manager.create_sale(sale_data, sale_items)
-                
-                # Log activity
-                self.db_manager.log_activity(self.user['id'], "sale_completed", 
-                                           f"Sale {sale_number} completed for {total:.2f} DZD")
+                # Save sale and its activity log entry in one transaction
+                sale_id = self.db_manager.create_sale(
+                    sale_data, sale_items,
+                    activity=("sale_completed", f"Sale {sale_number} completed for {total:.2f} DZD")
+                )
                 
                 # Show success message
                 QMessageBox.information(self, "Sale Completed", 
@@ -618,5 +680,13 @@ class POSModule(QWidget):
                 # Reload quick products to update stock
                 self.load_quick_products()
                 
+            except InsufficientStockError as e:
+                lines = "\n".join(
+                    f"• {f['name'] or f['product_id']}: {f['requested']} requested, {f['available']} in stock"
+                    for f in e.failures
+                )
+                QMessageBox.warning(self, "Insufficient Stock",
+                                    f"The sale was not recorded. Not enough stock for:\n{lines}")
+                
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to process sale: {str(e)}")
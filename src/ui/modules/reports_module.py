@@ -11,6 +11,11 @@ from PySide6.QtGui import QFont
 from datetime import datetime, timedelta
 import csv
 
+from src.utils.background_task import deliver
+
+# Number of sales rows fetched per page in the sales report table
+SALES_PAGE_SIZE = 200
+
 class ReportsModule(QWidget):
     """Reports and analytics module"""
     
@@ -18,6 +23,8 @@ class ReportsModule(QWidget):
         super().__init__()
         self.user = user
         self.db_manager = db_manager
+        self.last_sale_id = None
+        self.report_generation = 0
         self.setup_ui()
         self.setup_connections()
         self.load_default_report()
@@ -166,9 +173,26 @@ class ReportsModule(QWidget):
             }
         """)
         
+        self.load_more_button = QPushButton("Load More")
+        self.load_more_button.setVisible(False)
+        self.load_more_button.setStyleSheet("""
+            QPushButton {
+                background-color: #6c757d;
+                color: white;
+                border: none;
+                padding: 8px 15px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #5a6268;
+            }
+        """)
+        
         layout.addWidget(date_frame)
         layout.addWidget(summary_frame)
         layout.addWidget(self.sales_table, 1)
+        layout.addWidget(self.load_more_button)
         
         return tab
         
@@ -335,6 +359,7 @@ class ReportsModule(QWidget):
         """Setup signal connections"""
         self.generate_report_button.clicked.connect(self.generate_sales_report)
         self.export_report_button.clicked.connect(self.export_sales_report)
+        self.load_more_button.clicked.connect(self.load_more_sales)
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
         
     def load_default_report(self):
@@ -348,16 +373,50 @@ class ReportsModule(QWidget):
         start_date = self.start_date.date().toString("yyyy-MM-dd")
         end_date = self.end_date.date().toString("yyyy-MM-dd")
         
-        # Get sales data
-        sales = self.db_manager.get_sales_report(start_date, end_date)
+        # Totals are aggregated in SQL; the table only holds the first page
+        future = self.db_manager.submit("get_sales_summary", start_date, end_date,
+                                        key="reports.summary")
+        deliver(future, self.show_sales_summary, self.on_report_error)
+        
+        self.sales_table.setRowCount(0)
+        self.last_sale_id = None
+        self.report_generation += 1
+        self.load_more_sales()
+        
+    def show_sales_summary(self, summary):
+        """Update the summary cards"""
+        total_sales = summary['total_amount']
+        total_transactions = summary['transactions']
+        
+        avg_sale = total_sales / total_transactions if total_transactions > 0 else 0
+        
+        self.total_sales_value_label.setText(f"${total_sales:.2f}")
+        self.transactions_value_label.setText(str(total_transactions))
+        self.avg_sale_value_label.setText(f"${avg_sale:.2f}")
+        self.profit_value_label.setText("$0.00")  # Would need cost calculation
+        
+    def load_more_sales(self):
+        """Append the next page of sales to the report table"""
+        start_date = self.start_date.date().toString("yyyy-MM-dd")
+        end_date = self.end_date.date().toString("yyyy-MM-dd")
+        
+        self.load_more_button.setEnabled(False)
+        future = self.db_manager.submit("get_sales_report", start_date, end_date,
+                                        after_id=self.last_sale_id, limit=SALES_PAGE_SIZE,
+                                        compact=True, key="reports.sales_page")
+        generation = self.report_generation
+        deliver(future, lambda sales: self.append_sales(sales, generation), self.on_report_error)
         
-        # Update table
-        self.sales_table.setRowCount(len(sales))
+    def append_sales(self, sales, generation):
+        """Append a page of sales rows to the report table"""
+        # Drop a page that finished after the report was regenerated
+        if generation != self.report_generation:
+            return
         
-        total_sales = 0
-        total_transactions = len(sales)
+        first_row = self.sales_table.rowCount()
+        self.sales_table.setRowCount(first_row + len(sales))
         
-        for row, sale in enumerate(sales):
+        for row, sale in enumerate(sales, start=first_row):
             self.sales_table.setItem(row, 0, QTableWidgetItem(sale['sale_number']))
             self.sales_table.setItem(row, 1, QTableWidgetItem(sale['created_at'][:10]))
             self.sales_table.setItem(row, 2, QTableWidgetItem(sale['cashier_name']))
@@ -365,20 +424,21 @@ class ReportsModule(QWidget):
             self.sales_table.setItem(row, 4, QTableWidgetItem(f"${sale['subtotal']:.2f}"))
             self.sales_table.setItem(row, 5, QTableWidgetItem(f"${sale['tax_amount']:.2f}"))
             self.sales_table.setItem(row, 6, QTableWidgetItem(f"${sale['total_amount']:.2f}"))
-            
-            total_sales += sale['total_amount']
         
-        # Update summary cards
-        avg_sale = total_sales / total_transactions if total_transactions > 0 else 0
+        if sales:
+            self.last_sale_id = sales[-1]['id']
+        self.load_more_button.setEnabled(True)
+        self.load_more_button.setVisible(len(sales) == SALES_PAGE_SIZE)
         
-        self.total_sales_value_label.setText(f"${total_sales:.2f}")
-        self.transactions_value_label.setText(str(total_transactions))
-        self.avg_sale_value_label.setText(f"${avg_sale:.2f}")
-        self.profit_value_label.setText("$0.00")  # Would need cost calculation
+    def on_report_error(self, error):
+        """Show a failed background report query"""
+        self.load_more_button.setEnabled(True)
+        QMessageBox.critical(self, "Report Error", f"Failed to load report: {str(error)}")
         
     def load_inventory_report(self):
         """Load inventory report data"""
-        products = self.db_manager.get_products()
+        with self.db_manager.snapshot():
+            products = self.db_manager.get_products(compact=True)
         
         self.inventory_table.setRowCount(len(products))
         
@@ -430,29 +490,32 @@ class ReportsModule(QWidget):
         week_start = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
         month_start = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         
+        # One snapshot, so the three periods agree with each other
+        with self.db_manager.snapshot():
+            today_summary = self.db_manager.get_sales_summary(today, today)
+            week_summary = self.db_manager.get_sales_summary(week_start, today)
+            month_summary = self.db_manager.get_sales_summary(month_start, today)
+        
         # Today's data
-        today_sales = self.db_manager.get_sales_report(today, today)
-        today_total = sum(sale['total_amount'] for sale in today_sales)
+        today_total = today_summary['total_amount']
         
         self.today_sales_label.setText(f"Sales: ${today_total:.2f}")
-        self.today_transactions_label.setText(f"Transactions: {len(today_sales)}")
+        self.today_transactions_label.setText(f"Transactions: {today_summary['transactions']}")
         self.today_items_label.setText("Items Sold: N/A")  # Would need separate calculation
         
         # Week's data
-        week_sales = self.db_manager.get_sales_report(week_start, today)
-        week_total = sum(sale['total_amount'] for sale in week_sales)
+        week_total = week_summary['total_amount']
         week_avg = week_total / 7
         
         self.week_sales_label.setText(f"Sales: ${week_total:.2f}")
-        self.week_transactions_label.setText(f"Transactions: {len(week_sales)}")
+        self.week_transactions_label.setText(f"Transactions: {week_summary['transactions']}")
         self.week_avg_label.setText(f"Daily Average: ${week_avg:.2f}")
         
         # Month's data
-        month_sales = self.db_manager.get_sales_report(month_start, today)
-        month_total = sum(sale['total_amount'] for sale in month_sales)
+        month_total = month_summary['total_amount']
         
         self.month_sales_label.setText(f"Sales: ${month_total:.2f}")
-        self.month_transactions_label.setText(f"Transactions: {len(month_sales)}")
+        self.month_transactions_label.setText(f"Transactions: {month_summary['transactions']}")
         self.month_growth_label.setText("Growth: N/A")  # Would need previous month comparison
         
         # Recent activity
@@ -460,19 +523,14 @@ class ReportsModule(QWidget):
         
     def load_recent_activity(self):
         """Load recent activity log"""
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT al.*, u.full_name
-            FROM activity_logs al
-            JOIN users u ON al.user_id = u.id
-            ORDER BY al.created_at DESC
-            LIMIT 10
-        ''')
-        
-        activities = cursor.fetchall()
-        conn.close()
+        with self.db_manager.snapshot() as conn:
+            activities = conn.execute('''
+                SELECT al.*, u.full_name
+                FROM activity_logs al
+                JOIN users u ON al.user_id = u.id
+                ORDER BY al.created_at DESC
+                LIMIT 10
+            ''').fetchall()
         
         activity_text = ""
         for activity in activities:
@@ -498,13 +556,12 @@ class ReportsModule(QWidget):
             if file_path:
                 start_date = self.start_date.date().toString("yyyy-MM-dd")
                 end_date = self.end_date.date().toString("yyyy-MM-dd")
-                sales = self.db_manager.get_sales_report(start_date, end_date)
-                
                 with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
                     writer = csv.writer(csvfile)
                     writer.writerow(['Sale Number', 'Date', 'Cashier', 'Subtotal', 'Tax', 'Total'])
                     
-                    for sale in sales:
+                    # Streamed from one snapshot so large ranges are never fully in memory
+                    for sale in self.db_manager.iter_sales_report(start_date, end_date):
                         writer.writerow([
                             sale['sale_number'],
                             sale['created_at'][:10],
@@ -6,14 +6,19 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QLineEdit, QPushButton, QFrame, QComboBox,
                               QSpinBox, QDoubleSpinBox, QGroupBox, QGridLayout,
                               QCheckBox, QTextEdit, QMessageBox, QTabWidget,
-                              QFileDialog)
+                              QFileDialog, QProgressDialog)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont
 
+from src.utils.background_task import run_in_background
+from src.database.backup_scheduler import parse_backup_settings
+from src.database.maintenance import format_report
+
 class SettingsModule(QWidget):
     """System settings module"""
     
     settings_changed = Signal()
+    database_restored = Signal()
     
     def __init__(self, user, db_manager):
         super().__init__()
@@ -378,6 +383,47 @@ class SettingsModule(QWidget):
         backup_layout.addWidget(restore_frame)
         backup_group.setLayout(backup_layout)
         
+        # Automatic Backups
+        auto_group = QGroupBox("Automatic Backups")
+        auto_layout = QGridLayout()
+        
+        auto_layout.addWidget(QLabel("Interval (hours, 0 = off):"), 0, 0)
+        self.auto_backup_interval_spin = QSpinBox()
+        self.auto_backup_interval_spin.setRange(0, 168)
+        auto_layout.addWidget(self.auto_backup_interval_spin, 0, 1)
+        
+        auto_layout.addWidget(QLabel("Backup folder:"), 1, 0)
+        self.auto_backup_dir_input = QLineEdit()
+        auto_layout.addWidget(self.auto_backup_dir_input, 1, 1)
+        
+        self.auto_backup_compress_checkbox = QCheckBox("Compress backups (gzip)")
+        auto_layout.addWidget(self.auto_backup_compress_checkbox, 2, 0, 1, 2)
+        
+        auto_layout.addWidget(QLabel("Keep hourly / daily / weekly:"), 3, 0)
+        keep_layout = QHBoxLayout()
+        self.keep_hourly_spin = QSpinBox()
+        self.keep_daily_spin = QSpinBox()
+        self.keep_weekly_spin = QSpinBox()
+        for spin in (self.keep_hourly_spin, self.keep_daily_spin, self.keep_weekly_spin):
+            spin.setRange(0, 365)
+            keep_layout.addWidget(spin)
+        auto_layout.addLayout(keep_layout, 3, 1)
+        
+        auto_group.setLayout(auto_layout)
+        
+        # Database Maintenance
+        maintenance_group = QGroupBox("Database Maintenance")
+        maintenance_layout = QVBoxLayout()
+        
+        self.maintenance_report_label = QLabel()
+        self.maintenance_report_label.setWordWrap(True)
+        maintenance_layout.addWidget(self.maintenance_report_label)
+        
+        self.run_maintenance_button = QPushButton("🧹 Run Maintenance Now")
+        maintenance_layout.addWidget(self.run_maintenance_button, 0, Qt.AlignLeft)
+        
+        maintenance_group.setLayout(maintenance_layout)
+        
         # Backup History
         history_group = QGroupBox("Backup History")
         history_layout = QVBoxLayout()
@@ -391,6 +437,8 @@ class SettingsModule(QWidget):
         history_group.setLayout(history_layout)
         
         layout.addWidget(backup_group)
+        layout.addWidget(auto_group)
+        layout.addWidget(maintenance_group)
         layout.addWidget(history_group)
         layout.addStretch()
         
@@ -404,65 +452,91 @@ class SettingsModule(QWidget):
         self.remove_logo_button.clicked.connect(self.remove_logo)
         self.backup_now_button.clicked.connect(self.backup_now)
         self.restore_button.clicked.connect(self.restore_backup)
+        self.run_maintenance_button.clicked.connect(self.run_maintenance)
         self.change_password_button.clicked.connect(self.change_password)
         
     def load_settings(self):
         """Load current settings from database"""
+        settings = self.db_manager.get_settings()
+        
         # Load language
-        language = self.db_manager.get_setting("language") or "en"
+        language = settings.get("language") or "en"
         if language == "ar":
             self.language_combo.setCurrentText("العربية")
         else:
             self.language_combo.setCurrentText("English")
             
         # Load theme
-        theme = self.db_manager.get_setting("theme") or "light"
+        theme = settings.get("theme") or "light"
         self.theme_combo.setCurrentText(theme.title())
         
         # Load currency
-        currency = self.db_manager.get_setting("currency") or "DZD"
+        currency = settings.get("currency") or "DZD"
         self.currency_combo.setCurrentText(currency)
         
         # Load company information
-        self.company_name_input.setText(self.db_manager.get_setting("company_name") or "LKS POS System")
-        self.company_address_input.setPlainText(self.db_manager.get_setting("company_address") or "")
-        self.company_phone_input.setText(self.db_manager.get_setting("company_phone") or "")
-        self.company_email_input.setText(self.db_manager.get_setting("company_email") or "")
-        self.company_website_input.setText(self.db_manager.get_setting("company_website") or "")
-        self.company_tax_id_input.setText(self.db_manager.get_setting("company_tax_id") or "")
+        self.company_name_input.setText(settings.get("company_name") or "LKS POS System")
+        self.company_address_input.setPlainText(settings.get("company_address") or "")
+        self.company_phone_input.setText(settings.get("company_phone") or "")
+        self.company_email_input.setText(settings.get("company_email") or "")
+        self.company_website_input.setText(settings.get("company_website") or "")
+        self.company_tax_id_input.setText(settings.get("company_tax_id") or "")
         
         # Load receipt settings
-        self.receipt_footer_input.setPlainText(self.db_manager.get_setting("receipt_footer") or "Thank you for your business!")
+        self.receipt_footer_input.setPlainText(settings.get("receipt_footer") or "Thank you for your business!")
+        
+        # Last maintenance run
+        self.maintenance_report_label.setText(format_report(self.db_manager.get_maintenance_report()))
+        
+        # Load automatic backup settings (defaults if the stored ones are bad)
+        try:
+            backup = parse_backup_settings(settings)
+        except ValueError as e:
+            print(f"Invalid automatic backup settings: {e}")
+            backup = parse_backup_settings({})
+        self.auto_backup_interval_spin.setValue(int(backup['interval_hours']))
+        self.auto_backup_dir_input.setText(backup['backup_dir'])
+        self.auto_backup_compress_checkbox.setChecked(backup['compress'])
+        self.keep_hourly_spin.setValue(backup['keep_hourly'])
+        self.keep_daily_spin.setValue(backup['keep_daily'])
+        self.keep_weekly_spin.setValue(backup['keep_weekly'])
         
     def save_settings(self):
         """Save settings to database - FIXED"""
         try:
             print("Saving settings...")  # Debug print
             
-            # Save language
             language = "ar" if self.language_combo.currentText() == "العربية" else "en"
-            self.db_manager.update_setting("language", language)
-            print(f"Saved language: {language}")
-            
-            # Save theme
             theme = self.theme_combo.currentText().lower()
-            self.db_manager.update_setting("theme", theme)
-            print(f"Saved theme: {theme}")
             
-            # Save currency
-            self.db_manager.update_setting("currency", self.currency_combo.currentText())
-            print(f"Saved currency: {self.currency_combo.currentText()}")
-            
-            # Save company information
-            self.db_manager.update_setting("company_name", self.company_name_input.text())
-            self.db_manager.update_setting("company_address", self.company_address_input.toPlainText())
-            self.db_manager.update_setting("company_phone", self.company_phone_input.text())
-            self.db_manager.update_setting("company_email", self.company_email_input.text())
-            self.db_manager.update_setting("company_website", self.company_website_input.text())
-            self.db_manager.update_setting("company_tax_id", self.company_tax_id_input.text())
-            
-            # Save receipt settings
-            self.db_manager.update_setting("receipt_footer", self.receipt_footer_input.toPlainText())
+            # Save everything in a single transaction
+            self.db_manager.update_settings({
+                "language": language,
+                "theme": theme,
+                "currency": self.currency_combo.currentText(),
+                
+                # Company information
+                "company_name": self.company_name_input.text(),
+                "company_address": self.company_address_input.toPlainText(),
+                "company_phone": self.company_phone_input.text(),
+                "company_email": self.company_email_input.text(),
+                "company_website": self.company_website_input.text(),
+                "company_tax_id": self.company_tax_id_input.text(),
+                
+                # Receipt settings
+                "receipt_footer": self.receipt_footer_input.toPlainText(),
+                
+                # Automatic backups
+                "auto_backup_interval_hours": str(self.auto_backup_interval_spin.value()),
+                "auto_backup_dir": self.auto_backup_dir_input.text().strip() or "backups",
+                "auto_backup_compress": "1" if self.auto_backup_compress_checkbox.isChecked() else "0",
+                "auto_backup_keep": ",".join(str(spin.value()) for spin in
+                                             (self.keep_hourly_spin, self.keep_daily_spin, self.keep_weekly_spin)),
+            })
+            print(f"Saved language: {language}, theme: {theme}")
+            
+            # Restart automatic backups with the new interval, folder and retention
+            self.db_manager.configure_backup_scheduler()
             
             # Update user account if changed
             new_username = self.new_username_input.text().strip()
@@ -490,11 +564,8 @@ class SettingsModule(QWidget):
     def update_username(self, new_username):
         """Update username"""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, self.user['id']))
-            conn.commit()
-            conn.close()
+            with self.db_manager.transaction() as conn:
+                conn.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, self.user['id']))
             
             self.user['username'] = new_username
             self.current_username_label.setText(new_username)
@@ -506,11 +577,8 @@ class SettingsModule(QWidget):
     def update_full_name(self, full_name):
         """Update full name"""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET full_name = ? WHERE id = ?", (full_name, self.user['id']))
-            conn.commit()
-            conn.close()
+            with self.db_manager.transaction() as conn:
+                conn.execute("UPDATE users SET full_name = ? WHERE id = ?", (full_name, self.user['id']))
             
             self.user['full_name'] = full_name
             
@@ -535,29 +603,33 @@ class SettingsModule(QWidget):
             QMessageBox.warning(self, "Validation Error", "Password must be at least 6 characters long.")
             return
             
-        # Verify current password
-        if not self.db_manager.verify_password(current_password, self.user['password_hash']):
+        # Verify and hash off the UI thread
+        self.change_password_button.setEnabled(False)
+        run_in_background(
+            self.db_manager.change_password, self.user['id'], current_password, new_password,
+            on_result=self.on_password_changed,
+            on_error=self.on_password_change_error
+        )
+        
+    def on_password_changed(self, changed):
+        """Handle the password change result"""
+        self.change_password_button.setEnabled(True)
+        
+        if not changed:
             QMessageBox.warning(self, "Validation Error", "Current password is incorrect.")
             return
-            
-        try:
-            # Update password
-            new_password_hash = self.db_manager.hash_password(new_password)
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_password_hash, self.user['id']))
-            conn.commit()
-            conn.close()
-            
-            # Clear password fields
-            self.current_password_input.clear()
-            self.new_password_input.clear()
-            self.confirm_password_input.clear()
-            
-            QMessageBox.information(self, "Success", "Password changed successfully!")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to change password: {str(e)}")
+        
+        # Clear password fields
+        self.current_password_input.clear()
+        self.new_password_input.clear()
+        self.confirm_password_input.clear()
+        
+        QMessageBox.information(self, "Success", "Password changed successfully!")
+        
+    def on_password_change_error(self, error):
+        """Show a failed password change"""
+        self.change_password_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Failed to change password: {str(error)}")
             
     def reset_settings(self):
         """Reset settings to defaults"""
@@ -607,18 +679,67 @@ class SettingsModule(QWidget):
             )
             
             if file_path:
-                import shutil
-                shutil.copy2(self.db_manager.db_path, file_path)
-                
-                # Log backup
-                self.db_manager.log_activity(self.user['id'], "backup_created", f"Manual backup created: {file_path}")
+                # Online backup in page steps - sales keep running meanwhile
+                self.backup_progress = QProgressDialog("Creating backup...", None, 0, 100, self)
+                self.backup_progress.setWindowTitle("Backup")
+                self.backup_progress.setMinimumDuration(500)
+                self.backup_now_button.setEnabled(False)
                 
-                QMessageBox.information(self, "Backup Complete", 
-                                      f"Backup created successfully:\n{file_path}")
+                run_in_background(
+                    self.db_manager.create_backup, file_path,
+                    on_progress=self.on_backup_progress,
+                    on_result=self.on_backup_finished,
+                    on_error=self.on_backup_error
+                )
                 
         except Exception as e:
             QMessageBox.critical(self, "Backup Error", f"Failed to create backup: {str(e)}")
             
+    def on_backup_progress(self, copied, total):
+        """Update the backup progress dialog"""
+        self.backup_progress.setMaximum(total)
+        self.backup_progress.setValue(copied)
+        
+    def on_backup_finished(self, result):
+        """Handle a completed backup"""
+        self.backup_progress.close()
+        self.backup_now_button.setEnabled(True)
+        
+        # Log backup
+        self.db_manager.log_activity(self.user['id'], "backup_created", f"Manual backup created: {result['path']}")
+        
+        size_mb = result['size'] / (1024 * 1024)
+        QMessageBox.information(self, "Backup Complete", 
+                              f"Backup created successfully:\n{result['path']}\n"
+                              f"{size_mb:.1f} MB, integrity check: {result['integrity']}")
+        
+    def on_backup_error(self, error):
+        """Handle a failed backup"""
+        self.backup_progress.close()
+        self.backup_now_button.setEnabled(True)
+        QMessageBox.critical(self, "Backup Error", f"Failed to create backup: {str(error)}")
+            
+    def run_maintenance(self):
+        """Run database maintenance on a worker thread"""
+        self.run_maintenance_button.setEnabled(False)
+        self.maintenance_report_label.setText("Running maintenance...")
+        run_in_background(
+            self.db_manager.run_maintenance,
+            on_result=self.on_maintenance_finished,
+            on_error=self.on_maintenance_error
+        )
+        
+    def on_maintenance_finished(self, report):
+        """Show the maintenance report"""
+        self.run_maintenance_button.setEnabled(True)
+        self.maintenance_report_label.setText(format_report(report))
+        
+    def on_maintenance_error(self, error):
+        """Handle failed maintenance"""
+        self.run_maintenance_button.setEnabled(True)
+        self.maintenance_report_label.setText(format_report(self.db_manager.get_maintenance_report()))
+        QMessageBox.critical(self, "Maintenance Error", f"Database maintenance failed: {str(error)}")
+        
     def restore_backup(self):
         """Restore from backup"""
         reply = QMessageBox.warning(self, "Restore Backup",
@@ -629,17 +750,48 @@ class SettingsModule(QWidget):
         if reply == QMessageBox.Yes:
             file_path, _ = QFileDialog.getOpenFileName(
                 self, "Select Backup File", "",
-                "Database Files (*.db)"
+                "Database Files (*.db *.db.gz)"
             )
             
             if file_path:
-                try:
-                    import shutil
-                    shutil.copy2(file_path, self.db_manager.db_path)
-                    
-                    QMessageBox.information(self, "Restore Complete", 
-                                          "Backup restored successfully!\n"
-                                          "Please restart the application.")
-                    
-                except Exception as e:
-                    QMessageBox.critical(self, "Restore Error", f"Failed to restore backup: {str(e)}")
+                # Validated, then copied into the live database - no restart
+                self.restore_progress = QProgressDialog("Restoring backup...", None, 0, 100, self)
+                self.restore_progress.setWindowTitle("Restore")
+                self.restore_progress.setMinimumDuration(0)
+                self.restore_button.setEnabled(False)
+                
+                run_in_background(
+                    self.db_manager.restore_backup, file_path,
+                    on_progress=self.on_restore_progress,
+                    on_result=self.on_restore_finished,
+                    on_error=self.on_restore_error
+                )
+                
+    def on_restore_progress(self, copied, total):
+        """Update the restore progress dialog"""
+        self.restore_progress.setMaximum(total)
+        self.restore_progress.setValue(copied)
+        
+    def on_restore_finished(self, result):
+        """Handle a completed restore"""
+        self.restore_progress.close()
+        self.restore_button.setEnabled(True)
+        
+        self.db_manager.log_activity(self.user['id'], "backup_restored",
+                                     f"Backup restored; previous data saved to {result['safety_backup']}")
+        
+        counts = result['row_counts']
+        QMessageBox.information(self, "Restore Complete", 
+                              f"Backup restored successfully!\n"
+                              f"{counts['products']} products, {counts['sales']} sales, "
+                              f"{counts['users']} users.\n\n"
+                              f"Previous data saved to:\n{result['safety_backup']}")
+        
+        # Reload every open module from the restored data
+        self.database_restored.emit()
+        
+    def on_restore_error(self, error):
+        """Handle a failed restore (the current data is untouched)"""
+        self.restore_progress.close()
+        self.restore_button.setEnabled(True)
+        QMessageBox.critical(self, "Restore Error", f"Failed to restore backup: {str(error)}")
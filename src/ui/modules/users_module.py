@@ -11,6 +11,8 @@ from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont, QAction
 from datetime import datetime
 
+from src.utils.background_task import deliver, run_in_background
+
 class UserDialog(QDialog):
     """Dialog for adding/editing users"""
     
@@ -220,16 +222,19 @@ class UserDialog(QDialog):
         if password:
             user_data['password'] = password
         
-        try:
-            if self.is_edit_mode:
-                self.db_manager.update_user(self.user['id'], user_data)
-            else:
-                self.db_manager.create_user(user_data)
-            
-            self.accept()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to save user: {str(e)}")
+        # Password hashing is slow - save off the UI thread
+        self.setEnabled(False)
+        if self.is_edit_mode:
+            run_in_background(self.db_manager.update_user, self.user['id'], user_data,
+                              on_result=lambda _: self.accept(), on_error=self.on_save_error)
+        else:
+            run_in_background(self.db_manager.create_user, user_data,
+                              on_result=lambda _: self.accept(), on_error=self.on_save_error)
+    
+    def on_save_error(self, error):
+        """Show a failed save"""
+        self.setEnabled(True)
+        QMessageBox.critical(self, "Database Error", f"Failed to save user: {str(error)}")
 
 class UsersModule(QWidget):
     """Users management module"""
@@ -471,10 +476,14 @@ class UsersModule(QWidget):
         self.status_filter.currentTextChanged.connect(self.filter_users)
         
     def load_users(self):
-        """Load users into table"""
+        """Load users without blocking the UI"""
+        future = self.db_manager.submit("get_all_users", compact=True, key="users.list")
+        deliver(future, self.populate_users,
+                lambda e: QMessageBox.critical(self, "Error", f"Failed to load users: {str(e)}"))
+        
+    def populate_users(self, users):
+        """Fill the users table"""
         try:
-            users = self.db_manager.get_all_users()
-            
             self.users_table.setRowCount(len(users))
             
             active_count = 0
@@ -549,7 +558,7 @@ class UsersModule(QWidget):
                         background-color: #0056b3;
                     }
                 """)
-                edit_button.clicked.connect(lambda checked, u=dict(user): self.edit_user(u))
+                edit_button.clicked.connect(lambda checked, u=user: self.edit_user(u))
                 
                 delete_button = QPushButton("🗑️ Delete")
                 delete_button.setToolTip("Delete User")
@@ -567,7 +576,7 @@ class UsersModule(QWidget):
                         background-color: #c82333;
                     }
                 """)
-                delete_button.clicked.connect(lambda checked, u=dict(user): self.delete_user(u))
+                delete_button.clicked.connect(lambda checked, u=user: self.delete_user(u))
                 
                 # Disable delete for current user
                 if user['id'] == self.user['id']:
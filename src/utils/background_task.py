@@ -0,0 +1,94 @@
+"""
+Background Task - Run blocking calls on the Qt thread pool
+"""
+
+from concurrent.futures import CancelledError
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from src.database.async_database import RequestCancelled
+
+class TaskSignals(QObject):
+    """Signals delivered on the thread that created the task (the UI thread)"""
+
+    finished = Signal(object)
+    failed = Signal(object)
+    progress = Signal(int, int)
+
+class BackgroundTask(QRunnable):
+    """Runs a function on a pool thread and reports the outcome via signals"""
+
+    # Tasks stay referenced here until their result has been delivered
+    _running = set()
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.signals.finished.connect(self._release)
+        self.signals.failed.connect(self._release)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+    def _release(self, _):
+        BackgroundTask._running.discard(self)
+
+def run_in_background(fn, *args, on_result=None, on_error=None, on_progress=None,
+                      **kwargs) -> BackgroundTask:
+    """Start fn(*args, **kwargs) on the global thread pool.
+
+    With on_progress, fn receives a ``progress(done, total)`` callback
+    whose calls are delivered to on_progress on the UI thread.
+    """
+    task = BackgroundTask(fn, *args, **kwargs)
+    if on_progress is not None:
+        task.kwargs['progress'] = task.signals.progress.emit
+        task.signals.progress.connect(on_progress)
+    if on_result is not None:
+        task.signals.finished.connect(on_result)
+    if on_error is not None:
+        task.signals.failed.connect(on_error)
+
+    task.setAutoDelete(False)
+    BackgroundTask._running.add(task)
+    QThreadPool.globalInstance().start(task)
+    return task
+
+def deliver(future, on_result, on_error=None) -> TaskSignals:
+    """Call on_result/on_error on the UI thread when a Future completes.
+
+    Cancelled and superseded requests are dropped silently.
+    """
+    signals = TaskSignals()
+    signals.finished.connect(on_result)
+    if on_error is not None:
+        signals.failed.connect(on_error)
+
+    _pending_deliveries.add(signals)
+
+    def done(f):
+        try:
+            result = f.result()
+        except (CancelledError, RequestCancelled):
+            _pending_deliveries.discard(signals)
+            return
+        except Exception as e:
+            signals.failed.emit(e)
+        else:
+            signals.finished.emit(result)
+
+    signals.finished.connect(lambda _: _pending_deliveries.discard(signals))
+    signals.failed.connect(lambda _: _pending_deliveries.discard(signals))
+    future.add_done_callback(done)
+    return signals
+
+# Signal objects stay referenced here until their future has been delivered
+_pending_deliveries = set()
@@ -4,7 +4,7 @@ CSV Handler - Import/Export functionality for products and data
 
 import csv
 import os
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from PySide6.QtWidgets import QFileDialog, QMessageBox
 
 class CSVHandler:
@@ -17,7 +17,7 @@ class CSVHandler:
         """Get file path for import"""
         file_path, _ = QFileDialog.getOpenFileName(
             self.parent,
-            "Select CSV file to import",
+            "Select CSV or Excel file to import",
             "",
             "CSV Files (*.csv);;Excel Files (*.xlsx);;All Files (*)"
         )
@@ -33,105 +33,9 @@ class CSVHandler:
         )
         return file_path if file_path else None
         
-    def import_products(self, file_path: str) -> List[Dict]:
-        """Import products from CSV file"""
-        products = []
-        
-        try:
-            with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-                # Try to detect delimiter
-                sample = csvfile.read(1024)
-                csvfile.seek(0)
-                sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
-                
-                reader = csv.DictReader(csvfile, delimiter=delimiter)
-                
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Clean and validate data
-                        product = self._clean_product_data(row)
-                        if product:
-                            products.append(product)
-                    except Exception as e:
-                        print(f"Error processing row {row_num}: {e}")
-                        continue
-                        
-        except Exception as e:
-            raise Exception(f"Failed to read CSV file: {str(e)}")
-            
-        return products
-        
-    def _clean_product_data(self, row: Dict) -> Optional[Dict]:
-        """Clean and validate product data from CSV row"""
-        # Map common column names
-        name_fields = ['name', 'product_name', 'item_name', 'title']
-        price_fields = ['price', 'selling_price', 'sale_price', 'unit_price']
-        cost_fields = ['cost', 'cost_price', 'purchase_price']
-        quantity_fields = ['quantity', 'stock', 'qty', 'inventory']
-        barcode_fields = ['barcode', 'sku', 'code', 'product_code']
-        category_fields = ['category', 'category_name', 'type']
-        description_fields = ['description', 'desc', 'details']
-        
-        # Find values using flexible field matching
-        name = self._find_field_value(row, name_fields)
-        if not name:
-            return None  # Name is required
-            
-        price = self._find_numeric_field(row, price_fields)
-        if price is None or price <= 0:
-            return None  # Valid price is required
-            
-        cost_price = self._find_numeric_field(row, cost_fields, default=0)
-        quantity = self._find_numeric_field(row, quantity_fields, default=0, is_int=True)
-        min_quantity = self._find_numeric_field(row, ['min_quantity', 'minimum', 'reorder_level'], default=5, is_int=True)
-        
-        barcode = self._find_field_value(row, barcode_fields)
-        category = self._find_field_value(row, category_fields)
-        description = self._find_field_value(row, description_fields, default="")
-        
-        return {
-            'name': name.strip(),
-            'price': float(price),
-            'cost_price': float(cost_price),
-            'quantity': int(quantity),
-            'min_quantity': int(min_quantity),
-            'barcode': barcode.strip() if barcode else None,
-            'category': category.strip() if category else None,
-            'description': description.strip()
-        }
-        
-    def _find_field_value(self, row: Dict, field_names: List[str], default: str = None) -> Optional[str]:
-        """Find field value using flexible field name matching"""
-        for field in field_names:
-            # Try exact match
-            if field in row and row[field]:
-                return str(row[field]).strip()
-            
-            # Try case-insensitive match
-            for key in row.keys():
-                if key.lower() == field.lower() and row[key]:
-                    return str(row[key]).strip()
-                    
-        return default
-        
-    def _find_numeric_field(self, row: Dict, field_names: List[str], default: float = None, is_int: bool = False) -> Optional[float]:
-        """Find numeric field value using flexible field name matching"""
-        value_str = self._find_field_value(row, field_names)
-        
-        if value_str is None:
-            return default
-            
-        try:
-            # Clean numeric string
-            cleaned = value_str.replace(',', '').replace('$', '').replace('DZD', '').strip()
-            value = float(cleaned)
-            return int(value) if is_int else value
-        except (ValueError, TypeError):
-            return default
-            
-    def export_products(self, products: List[Dict], file_path: str):
-        """Export products to CSV file"""
+    def export_products(self, products: Iterable[Dict], file_path: str) -> int:
+        """Export products (any iterable of rows) to CSV file; returns the row count"""
+        count = 0
         try:
             with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
                 fieldnames = [
@@ -156,9 +60,11 @@ class CSVHandler:
                         'description': product.get('description', '')
                     }
                     writer.writerow(row)
+                    count += 1
                     
         except Exception as e:
             raise Exception(f"Failed to write CSV file: {str(e)}")
+        return count
             
     def export_sales_report(self, sales: List[Dict], file_path: str):
         """Export sales report to CSV file"""
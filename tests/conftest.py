@@ -26,7 +26,8 @@ def db_manager(temp_db):
     db = DatabaseManager(temp_db)
     db.create_tables()
     db.create_default_admin()
-    return db
+    yield db
+    db.close()
 
 @pytest.fixture
 def sample_user():
@@ -64,3 +64,42 @@ class TestAuthentication:
         # Try to authenticate
         result = db_manager.authenticate_user('inactive_user', 'test123')
         assert result is None
+    
+    def test_weak_hash_upgraded_on_login(self, db_manager):
+        """Test that hashes below the configured cost are re-hashed after login"""
+        db_manager.update_setting('password_hash_rounds', '4')
+        user_id = db_manager.create_user({
+            'username': 'rehash_user',
+            'password': 'rehash123',
+            'full_name': 'Rehash User',
+            'role': 'cashier'
+        })
+        
+        conn = db_manager.get_connection()
+        old_hash = conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+        assert old_hash.startswith('$2b$04$')
+        
+        # Raise the cost factor; the next successful login upgrades the hash
+        db_manager.update_setting('password_hash_rounds', '5')
+        assert db_manager.password_needs_rehash(old_hash)
+        assert db_manager.authenticate_user('rehash_user', 'rehash123') is not None
+        db_manager.close()  # waits for the background re-hash
+        
+        conn = db_manager.get_connection()
+        new_hash = conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+        assert new_hash.startswith('$2b$05$')
+        assert db_manager.authenticate_user('rehash_user', 'rehash123') is not None
+    
+    def test_change_password(self, db_manager):
+        """Test that changing a password checks the current one"""
+        user_id = db_manager.create_user({
+            'username': 'change_pw',
+            'password': 'before123',
+            'full_name': 'Change Password',
+            'role': 'cashier'
+        })
+        
+        assert not db_manager.change_password(user_id, 'wrong', 'after123')
+        assert db_manager.change_password(user_id, 'before123', 'after123')
+        assert db_manager.authenticate_user('change_pw', 'after123') is not None
+        assert db_manager.authenticate_user('change_pw', 'before123') is None
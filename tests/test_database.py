@@ -28,6 +28,98 @@ class TestDatabaseManager:
         for table in expected_tables:
             assert table in tables
     
+    def test_schema_migrations(self, db_manager):
+        """Test that migrations create indexes and are only applied once"""
+        from database.migrations import LATEST_VERSION
+        
+        assert db_manager.get_schema_version() == LATEST_VERSION
+        assert db_manager.migrate() == []  # Nothing left to apply
+        
+        conn = db_manager.get_connection()
+        indexes = {row['name'] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for index in ('idx_sale_items_sale_id', 'idx_sale_items_product_id',
+                      'idx_sales_created_at', 'idx_activity_logs_created_at',
+                      'idx_products_category_id', 'idx_products_name'):
+            assert index in indexes
+        
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM sale_items WHERE sale_id = 1").fetchall()
+        assert any('idx_sale_items_sale_id' in row['detail'] for row in plan)
+    
+    def test_connection_pooling(self, db_manager):
+        """Test that connections are reused and tuned"""
+        conn = db_manager.get_connection()
+        conn.close()  # Returns the connection to the pool
+        
+        assert db_manager.get_connection() is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+    
+    def test_worker_thread_connections_released(self, db_manager):
+        """Test connections of finished worker threads are closed, not kept until shutdown"""
+        import _thread
+        import threading
+        import time
+        
+        main = db_manager.get_connection()
+        
+        for _ in range(10):
+            worker = threading.Thread(target=db_manager.get_all_users)
+            worker.start()
+            worker.join()
+        assert db_manager._connections == [main]
+        
+        # Threads Python did not start (like QThreadPool workers) report
+        # is_alive() forever; their connections must still be closed
+        opened = []
+        done = threading.Event()
+        
+        def foreign_worker():
+            db_manager.get_all_users()
+            opened.append(db_manager.get_connection())
+            done.set()
+        
+        _thread.start_new_thread(foreign_worker, ())
+        assert done.wait(5)
+        deadline = time.monotonic() + 5
+        while len(db_manager._connections) > 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert db_manager._connections == [main]
+        
+        # ... and the handle is really closed
+        with pytest.raises(Exception):
+            opened[0].execute("SELECT 1")
+        
+        # release_connection() closes the calling thread's connection right away
+        db_manager.release_connection()
+        assert db_manager._connections == []
+        with pytest.raises(Exception):
+            main.execute("SELECT 1")
+        assert db_manager.get_connection() is not main
+    
+    def test_transaction_rollback(self, db_manager):
+        """Test that a failed transaction leaves no partial writes"""
+        with pytest.raises(RuntimeError):
+            with db_manager.transaction() as conn:
+                conn.execute("INSERT INTO categories (name) VALUES ('Rolled Back')")
+                raise RuntimeError("abort")
+        
+        with db_manager.transaction() as conn:
+            conn.execute("INSERT INTO categories (name) VALUES ('Outer')")
+            try:
+                with db_manager.transaction() as inner:
+                    inner.execute("INSERT INTO categories (name) VALUES ('Inner')")
+                    raise RuntimeError("abort inner")
+            except RuntimeError:
+                pass
+        
+        names = [c['name'] for c in db_manager.get_all_categories()]
+        assert 'Rolled Back' not in names
+        assert 'Inner' not in names
+        assert 'Outer' in names
+    
     def test_password_hashing(self, db_manager):
         """Test password hashing and verification"""
         password = "test123"
@@ -119,6 +211,34 @@ class TestDatabaseManager:
         assert product is not None
         assert product['name'] == 'Test Product'
     
+    def test_full_text_product_search(self, db_manager):
+        """Test FTS5 product search stays in sync with products and categories"""
+        with db_manager.transaction() as conn:
+            conn.execute('''
+                INSERT INTO products (name, barcode, price, quantity, description, category_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', ('Apple Juice', '1111111111111', 3.50, 20, 'Fresh pressed', 3))
+            conn.execute('''
+                INSERT INTO products (name, barcode, price, quantity, description, category_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', ('Pineapple Slices', '2222222222222', 2.25, 10, 'Canned apple alternative', None))
+        
+        # Prefix match, name hits ranked above description hits
+        results = db_manager.search_products("app")
+        assert [p['name'] for p in results] == ['Apple Juice', 'Pineapple Slices']
+        
+        # Barcode and category name are searchable
+        assert db_manager.search_products("2222")[0]['name'] == 'Pineapple Slices'
+        assert db_manager.search_products("beverages")[0]['name'] == 'Apple Juice'
+        
+        # Renames propagate through the triggers
+        db_manager.update_category(3, {'name': 'Drinks'})
+        assert db_manager.search_products("drinks")[0]['name'] == 'Apple Juice'
+        with db_manager.transaction() as conn:
+            conn.execute("UPDATE products SET name = 'Orange Juice' WHERE name = 'Apple Juice'")
+        assert [p['name'] for p in db_manager.search_products("orange")] == ['Orange Juice']
+        assert db_manager.search_products('"') == []
+    
     def test_settings_operations(self, db_manager):
         """Test settings operations"""
         # Update a setting
@@ -132,6 +252,25 @@ class TestDatabaseManager:
         value = db_manager.get_setting("non_existent")
         assert value is None
     
+    def test_bulk_settings_cache(self, db_manager):
+        """Test bulk settings reads/writes and that descriptions survive updates"""
+        db_manager.update_settings({"company_name": "Corner Shop", "tax_rate": "19.0"})
+        
+        settings = db_manager.get_settings(["company_name", "tax_rate", "missing"])
+        assert settings == {"company_name": "Corner Shop", "tax_rate": "19.0", "missing": None}
+        assert db_manager.get_company_info()['name'] == "Corner Shop"
+        
+        # The cache is served without touching the database
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE settings SET value = 'changed behind cache' WHERE key = 'tax_rate'")
+        conn.commit()
+        assert db_manager.get_setting("tax_rate") == "19.0"
+        db_manager.load_settings_cache()
+        assert db_manager.get_setting("tax_rate") == "changed behind cache"
+        
+        row = conn.execute("SELECT description FROM settings WHERE key = 'company_name'").fetchone()
+        assert row['description'] == "Company name for receipts"
+    
     def test_activity_logging(self, db_manager):
         """Test activity logging"""
         # Create a test user first
@@ -155,3 +294,357 @@ class TestDatabaseManager:
         
         assert log is not None
         assert log['details'] == "Test details"
+    
+    def test_async_activity_logging(self, db_manager):
+        """Test that write-behind activity logging is flushed to the database"""
+        db_manager.enable_async_logging(flush_interval=0.05)
+        
+        for i in range(25):
+            db_manager.log_activity(1, "async_test", f"Entry {i}")
+        db_manager.flush_activity_log()
+        
+        conn = db_manager.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM activity_logs WHERE action = 'async_test'").fetchone()[0]
+        assert count == 25
+        
+        # Entries still queued at shutdown are written, not dropped
+        db_manager.log_activity(1, "async_shutdown", "Last entry")
+        db_manager.disable_async_logging()
+        count = conn.execute("SELECT COUNT(*) FROM activity_logs WHERE action = 'async_shutdown'").fetchone()[0]
+        assert count == 1
+    
+    def test_async_requests(self, db_manager):
+        """Test that submit() runs queries off-thread and drops stale requests"""
+        import threading
+        from database.async_database import RequestCancelled
+        
+        assert any(u['username'] == 'admin' for u in db_manager.submit("get_all_users").result(timeout=5))
+        
+        # A running request that is superseded fails with RequestCancelled
+        release = threading.Event()
+        started = threading.Event()
+        def slow_query():
+            started.set()
+            release.wait(5)
+            return "stale"
+        db_manager.slow_query = slow_query
+        
+        stale = db_manager.submit("slow_query", key="users.list")
+        assert started.wait(5)
+        fresh = db_manager.submit("get_all_users", key="users.list")
+        release.set()
+        
+        with pytest.raises(RequestCancelled):
+            stale.result(timeout=5)
+        assert isinstance(fresh.result(timeout=5), list)
+        
+        # Errors raised by the query are delivered through the future
+        with pytest.raises(KeyError):
+            db_manager.submit("update_user", 1, {}).result(timeout=5)
+    
+    def test_query_profiler(self, db_manager, tmp_path):
+        """Test that profiled statements are timed and slow ones are logged"""
+        import sqlite3
+        
+        log_path = tmp_path / "slow.log"
+        profiler = db_manager.enable_query_profiler(str(log_path), threshold_ms=0)
+        
+        db_manager.get_all_users()
+        db_manager.update_setting('tax_rate', '19')
+        list(db_manager.iter_products())
+        db_manager.get_sales_summary('2000-01-01', '2100-01-01')
+        
+        stats = {s['sql']: s for s in profiler.stats()}
+        users_query = next(s for sql, s in stats.items() if sql.startswith("SELECT id, username"))
+        assert users_query['calls'] == 1
+        assert users_query['rows'] >= 1
+        assert any('get_all_users' in site for site in users_query['call_sites'])
+        
+        # Report queries on snapshot connections are profiled too
+        sites = [site for s in stats.values() for site in s['call_sites']]
+        assert any('iter_products' in site for site in sites)
+        assert any('get_sales_summary' in site for site in sites)
+        
+        # threshold_ms=0 logs everything, with the query plan
+        conn = db_manager.get_connection()
+        pool_size = len(db_manager._connections)
+        db_manager.disable_query_profiler()
+        log = log_path.read_text()
+        assert "get_all_users" in log
+        assert "plan: SCAN users" in log
+        
+        # Connections go back to unprofiled once disabled, without opening new ones
+        assert db_manager.get_connection() is conn
+        assert conn.profiler is None
+        assert type(conn.cursor()) is sqlite3.Cursor
+        assert len(db_manager._connections) == pool_size
+    
+    def test_online_backup(self, db_manager, sample_product, tmp_path):
+        """Test that an online backup is a consistent, checked copy"""
+        import sqlite3
+        
+        db_manager.create_product(sample_product)
+        
+        steps = []
+        backup_path = str(tmp_path / "backup.db")
+        # Hold an open write transaction on the live database during the backup
+        with db_manager.transaction() as conn:
+            conn.execute("UPDATE settings SET value = 'uncommitted' WHERE key = 'company_name'")
+            result = db_manager.create_backup(backup_path, progress=lambda done, total: steps.append((done, total)))
+        
+        assert result['integrity'] == 'ok'
+        assert steps and steps[-1][0] == steps[-1][1]
+        assert not (tmp_path / "backup.db.part").exists()
+        
+        backup = sqlite3.connect(backup_path)
+        assert backup.execute("SELECT COUNT(*) FROM products WHERE barcode = ?",
+                              (sample_product['barcode'],)).fetchone()[0] == 1
+        # Only committed data is captured
+        assert backup.execute("SELECT value FROM settings WHERE key = 'company_name'").fetchone()[0] != 'uncommitted'
+        backup.close()
+    
+    def test_scheduled_backup_rotation(self, db_manager, tmp_path):
+        """Test compressed automatic backups and hourly/daily/weekly pruning"""
+        import gzip
+        import os
+        from datetime import datetime, timedelta
+        from database.backup_scheduler import BackupScheduler
+        
+        backup_dir = tmp_path / "backups"
+        scheduler = BackupScheduler(db_manager, backup_dir=str(backup_dir),
+                                    keep_hourly=2, keep_daily=2, keep_weekly=2)
+        
+        # Older backups: three an hour apart today, one per day before
+        now = datetime(2024, 6, 12, 15, 0, 0)
+        backup_dir.mkdir()
+        for hours_ago in (1, 2, 3, 24, 48, 72, 24 * 14):
+            taken = now - timedelta(hours=hours_ago)
+            (backup_dir / f"pos_backup_{taken.strftime('%Y%m%d_%H%M%S')}.db.gz").write_bytes(b"")
+        # A sales archive copied with a backup goes when the backup does
+        (backup_dir / "pos_backup_20240529_150000_archive_2022.db.gz").write_bytes(b"")
+        
+        path = scheduler.run_once(now=now)
+        assert path.endswith("pos_backup_20240612_150000.db.gz")
+        with gzip.open(path) as f:
+            assert f.read(16) == b"SQLite format 3\x00"
+        
+        kept = sorted(p.name for p in backup_dir.iterdir())
+        assert kept == [
+            "pos_backup_20240609_150000.db.gz",  # previous ISO week (Sunday)
+            "pos_backup_20240611_150000.db.gz",  # yesterday
+            "pos_backup_20240612_140000.db.gz",  # previous hour
+            "pos_backup_20240612_150000.db.gz",  # new backup
+        ]
+        
+        conn = db_manager.get_connection()
+        log = conn.execute("SELECT details FROM activity_logs WHERE action = 'auto_backup_created'").fetchone()
+        assert log is not None and "pos_backup_20240612_150000.db.gz" in log['details']
+        
+        # With every limit at zero only the newest backup is kept
+        scheduler.keep_hourly = scheduler.keep_daily = scheduler.keep_weekly = 0
+        later = now + timedelta(hours=1)
+        path = scheduler.run_once(now=later)
+        assert path is not None and os.path.exists(path)
+        assert [p.name for p in backup_dir.iterdir()] == ["pos_backup_20240612_160000.db.gz"]
+    
+    def test_backup_scheduler_settings(self, db_manager, tmp_path):
+        """Test that saved backup settings restart the running scheduler"""
+        db_manager.update_settings({"auto_backup_interval_hours": "6",
+                                    "auto_backup_dir": str(tmp_path / "nightly"),
+                                    "auto_backup_compress": "0",
+                                    "auto_backup_keep": "12,7,4"})
+        first = db_manager.configure_backup_scheduler()
+        assert first.interval == 6 * 3600 and not first.compress and first.keep_hourly == 12
+        
+        db_manager.update_setting("auto_backup_interval_hours", "2")
+        second = db_manager.configure_backup_scheduler()
+        assert second is not first and db_manager.backup_scheduler is second
+        assert second.interval == 2 * 3600
+        
+        # A bad value keeps the running schedule; 0 turns backups off
+        db_manager.update_setting("auto_backup_keep", "lots")
+        assert db_manager.configure_backup_scheduler() is second
+        db_manager.update_settings({"auto_backup_keep": "24,7,4", "auto_backup_interval_hours": "0"})
+        assert db_manager.configure_backup_scheduler() is None
+        assert db_manager.backup_scheduler is None
+    
+    def test_parse_backup_settings(self):
+        """Test that stored backup settings are validated the same way everywhere"""
+        from database.backup_scheduler import parse_backup_settings
+        
+        # Missing settings take the defaults
+        assert parse_backup_settings({}) == {
+            'interval_hours': 1.0, 'backup_dir': "backups", 'compress': True,
+            'keep_hourly': 24, 'keep_daily': 7, 'keep_weekly': 4,
+        }
+        assert parse_backup_settings({"auto_backup_interval_hours": "2.5",
+                                      "auto_backup_keep": "1,0,0"})['keep_hourly'] == 1
+        
+        for bad in ({"auto_backup_interval_hours": "hourly"},
+                    {"auto_backup_interval_hours": "inf"},
+                    {"auto_backup_interval_hours": "-1"},
+                    {"auto_backup_keep": "24,7"},
+                    {"auto_backup_keep": "24,7,x"}):
+            with pytest.raises(ValueError):
+                parse_backup_settings(bad)
+    
+    def test_hot_restore(self, db_manager, sample_product, tmp_path):
+        """Test validating and restoring a backup into the live database"""
+        import gzip
+        import shutil
+        from database.backup import BackupError
+        
+        db_manager.create_product(sample_product)
+        backup_path = str(tmp_path / "backup.db")
+        db_manager.create_backup(backup_path)
+        
+        # Changes made after the backup
+        db_manager.preload_product_cache()
+        db_manager.update_setting('company_name', 'After Backup')
+        db_manager.create_category({'name': 'After Backup', 'description': ''})
+        assert db_manager.get_product_by_barcode(sample_product['barcode']) is not None
+        
+        compressed = backup_path + ".gz"
+        with open(backup_path, "rb") as src, gzip.open(compressed, "wb") as out:
+            shutil.copyfileobj(src, out)
+        
+        # The same pooled connection is still valid after the restore
+        conn = db_manager.get_connection()
+        result = db_manager.restore_backup(compressed)
+        assert result['row_counts']['products'] >= 1
+        
+        assert db_manager.get_setting('company_name') != 'After Backup'
+        assert 'After Backup' not in [c['name'] for c in db_manager.get_all_categories()]
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert db_manager.get_product_by_barcode(sample_product['barcode']) is not None
+        assert db_manager.get_schema_version() >= 2
+        
+        # Garbage is rejected before the live database is touched
+        bad_path = tmp_path / "bad.db"
+        bad_path.write_bytes(b"not a database" * 100)
+        with pytest.raises(BackupError):
+            db_manager.restore_backup(str(bad_path))
+        assert db_manager.get_product_by_barcode(sample_product['barcode']) is not None
+    
+    def test_database_maintenance(self, db_manager, tmp_path):
+        """Test maintenance reclaims free pages and switches old files to incremental vacuum"""
+        import sqlite3
+        from database.database_manager import DatabaseManager
+        
+        conn = db_manager.get_connection()
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL on new files
+        
+        with db_manager.transaction() as conn:
+            conn.executemany("INSERT INTO activity_logs (user_id, action, details) VALUES (1, 'bulk', ?)",
+                             [("x" * 500,) for _ in range(2000)])
+        with db_manager.transaction() as conn:
+            conn.execute("DELETE FROM activity_logs WHERE action = 'bulk'")
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+        
+        report = db_manager.run_maintenance()
+        assert report['reclaimed_bytes'] > 0
+        assert {'analyze', 'optimize', 'incremental_vacuum', 'wal_checkpoint'} <= set(report['tasks'])
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert db_manager.get_maintenance_report()['reclaimed_bytes'] == report['reclaimed_bytes']
+        
+        # A file created before incremental auto_vacuum is converted once
+        legacy_path = str(tmp_path / "legacy.db")
+        legacy = sqlite3.connect(legacy_path)
+        legacy.execute("PRAGMA journal_mode = WAL")
+        legacy.execute("CREATE TABLE t (x)")
+        legacy.close()
+        
+        legacy_manager = DatabaseManager(legacy_path)
+        try:
+            legacy_manager.create_tables()
+            legacy_manager.create_default_admin()
+            report = legacy_manager.run_maintenance()
+            assert 'vacuum' in report['tasks']
+            assert legacy_manager.get_connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        finally:
+            legacy_manager.close()
+    
+    def test_snapshot_reads(self, db_manager, sample_product):
+        """Test that report snapshots are read-only, consistent and never block sales"""
+        import sqlite3
+        from datetime import datetime
+        
+        product_id = db_manager.create_product(sample_product)
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        
+        def ring_up(number):
+            return db_manager.create_sale({
+                'sale_number': f"SALE-SNAPSHOT-{number}",
+                'user_id': 1,
+                'subtotal': 10.00,
+                'tax_amount': 0.00,
+                'discount_amount': 0.00,
+                'total_amount': 10.00,
+                'payment_method': 'cash'
+            }, [{'product_id': product_id, 'quantity': 1, 'unit_price': 10.00, 'total_price': 10.00}])
+        
+        ring_up(1)
+        with db_manager.snapshot() as conn:
+            assert db_manager.get_sales_summary(today, today)['transactions'] == 1
+            
+            # A sale commits while the snapshot is open...
+            ring_up(2)
+            
+            # ...but the snapshot keeps its point in time, including nested reads
+            assert db_manager.get_sales_summary(today, today)['transactions'] == 1
+            assert len(db_manager.get_sales_report(today, today)) == 1
+            assert db_manager.get_products()[0]['quantity'] == sample_product['quantity'] - 1
+            
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM sales")
+        
+        assert db_manager.get_sales_summary(today, today)['transactions'] == 2
+        assert db_manager.get_products()[0]['quantity'] == sample_product['quantity'] - 2
+    
+    def test_compact_rows(self, db_manager, sample_user):
+        """Test compact Record results and the lazy iter_* variants"""
+        import tracemalloc
+        
+        with db_manager.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO products (name, barcode, price, quantity, category_id) VALUES (?, ?, ?, ?, 1)",
+                [(f"Bulk Product {i:05d}", f"BULK{i:09d}", 1.5, i) for i in range(5000)])
+        db_manager.create_user(sample_user)
+        
+        products = db_manager.get_products()
+        compact = db_manager.get_products(compact=True)
+        assert [dict(p) for p in compact] == products
+        
+        record = compact[0]
+        assert record['name'] == record.name == products[0]['name']
+        assert record.get('category_name') == products[0]['category_name']
+        assert record.get('missing', 'default') == 'default'
+        assert 'barcode' in record and 'missing' not in record
+        assert list(record.keys()) == list(products[0].keys())
+        with pytest.raises(TypeError):
+            record['name'] = 'changed'
+        
+        # Lazy variants yield the same rows
+        assert [dict(p) for p in db_manager.iter_products()] == products
+        assert [dict(u) for u in db_manager.iter_users()] == db_manager.get_all_users()
+        assert [dict(c) for c in db_manager.iter_categories()] == db_manager.get_all_categories()
+        assert [u['username'] for u in db_manager.get_all_users(compact=True)] == [
+            u['username'] for u in db_manager.get_all_users()]
+        
+        # Stopping early ends the iterator's snapshot
+        iterator = db_manager.iter_products()
+        next(iterator)
+        iterator.close()
+        assert not db_manager.get_read_connection().in_transaction
+        
+        def allocated(load):
+            tracemalloc.start()
+            rows = load()
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del rows
+            return size
+        
+        # Column values cost the same either way; the per-row dict goes
+        assert allocated(lambda: db_manager.get_products(compact=True)) < \
+            allocated(lambda: db_manager.get_products()) * 0.75
@@ -0,0 +1,294 @@
+"""
+Tests for bulk product import
+"""
+
+def make_row(i, **overrides):
+    row = {
+        'name': f"Imported Product {i}",
+        'price': 2.50,
+        'cost_price': 1.00,
+        'quantity': 10,
+        'min_quantity': 5,
+        'barcode': f"IMP{i:08d}",
+        'category': f"Supplier Category {i % 3}",
+        'description': "",
+        'row': i + 2,
+    }
+    row.update(overrides)
+    return row
+
+class TestProductImport:
+    """Test cases for the bulk product import engine"""
+
+    def test_bulk_import(self, db_manager):
+        """Test chunked import with category resolution and a per-row error report"""
+        existing = db_manager.create_product({'name': 'Existing', 'price': 1.0, 'barcode': 'IMP00000007'})
+
+        rows = [make_row(i) for i in range(25)]
+        rows[3] = make_row(3, price=0)
+        rows[12] = make_row(12, barcode=rows[11]['barcode'])
+        rows.append(make_row(25, category='Books'))
+
+        result = db_manager.import_products(rows, chunk_size=10)
+
+        assert result['imported'] == 23
+        assert result['categories_created'] == 3
+        errors = {e['row']: e for e in result['errors']}
+        assert set(errors) == {5, 9, 14}
+        assert errors[5]['error'] == "Missing or invalid price"
+        assert 'UNIQUE' in errors[9]['error'] and errors[9]['name'] == 'Imported Product 7'
+        assert 'UNIQUE' in errors[14]['error']
+
+        products = {p['barcode']: p for p in db_manager.get_products()}
+        assert products['IMP00000007']['id'] == existing
+        assert products['IMP00000000']['category_name'] == 'Supplier Category 0'
+        assert products['IMP00000025']['category_name'] == 'Books'
+
+        # Categories are shared, not duplicated per row
+        names = [c['name'] for c in db_manager.get_all_categories()]
+        assert names.count('Supplier Category 1') == 1
+        assert names.count('Books') == 1
+
+    def test_streaming_import_cancel_and_resume(self, db_manager, tmp_path):
+        """Test streaming a CSV feed with progress, cancellation and resume from the checkpoint"""
+        import threading
+        from database.product_feed import CSVProductFeed
+
+        csv_path = tmp_path / "supplier.csv"
+        lines = ["Name,Unit_Price,Qty,SKU,Category"]
+        lines += [f"Feed Product {i},{i % 50 + 1}.25,{i},FEED{i:07d},Feed Category {i % 4}" for i in range(2500)]
+        lines.append("No Price Product,,3,FEEDNOPRICE,Feed Category 0")
+        csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        cancel = threading.Event()
+        progress = []
+
+        def on_progress(done, total):
+            progress.append((done, total))
+            if len(progress) == 2:
+                cancel.set()
+
+        feed = CSVProductFeed(str(csv_path))
+        result = db_manager.import_product_feed(feed, progress=on_progress, cancel=cancel, chunk_size=500)
+        assert result['cancelled']
+        assert result['imported'] == 1000
+        checkpoint = db_manager.get_import_checkpoint(feed)
+        assert checkpoint['rows_done'] == 1001  # header is line 1
+        assert checkpoint['imported'] == 1000
+
+        result = db_manager.import_product_feed(CSVProductFeed(str(csv_path)), progress=on_progress,
+                                                chunk_size=500)
+        assert not result['cancelled']
+        assert result['resumed_after'] == 1001
+        assert result['imported'] == 2500
+        assert result['error_count'] == 1
+        assert result['errors'][0]['row'] == 2502
+        assert result['errors'][0]['name'] == 'No Price Product'
+        assert db_manager.get_import_checkpoint(feed) is None
+
+        done = [d for d, _ in progress]
+        assert done == sorted(done) and progress[-1][0] == progress[-1][1]
+        assert len(db_manager.get_products(search_term="Feed Product")) == 2500
+
+        # A changed file is never resumed from a stale checkpoint
+        cancel.clear()
+        progress.clear()
+        result = db_manager.import_product_feed(CSVProductFeed(str(csv_path)), cancel=cancel,
+                                                progress=on_progress, chunk_size=500)
+        assert result['cancelled'] and result['imported'] == 0
+        csv_path.write_text("\n".join(lines[:11]) + "\n", encoding="utf-8")
+        assert db_manager.get_import_checkpoint(CSVProductFeed(str(csv_path))) is None
+
+    def test_column_mapping_profiles(self, db_manager, tmp_path):
+        """Test compiled header mapping and saved supplier profiles"""
+        from database.product_feed import CSVProductFeed, RowMapper
+
+        mapper = RowMapper(["Ref", "Product Name", "PRICE", "Qty", "Alt Desc", "Description"])
+        assert mapper.mapping()['name'] == "Product Name"
+        assert mapper.mapping()['price'] == "PRICE"
+        assert mapper.mapping()['barcode'] is None
+
+        row = mapper(["R1", "  Widget ", "1,250.50 DZD", "7.0", "", "Blue widget"])
+        assert row['name'] == "Widget"
+        assert row['price'] == 1250.50
+        assert row['quantity'] == 7
+        assert row['min_quantity'] == 5
+        assert row['description'] == "Blue widget"
+        assert mapper(["R2", "Short row"])['price'] is None
+        assert mapper(["R3", "Bad", "n/a", "x"])['quantity'] == 0
+
+        # A supplier profile overrides the automatic matches
+        profile = {'barcode': "Ref", 'description': "Alt Desc", 'quantity': None}
+        db_manager.save_import_profile("Acme", profile)
+        assert db_manager.get_import_profiles() == {"Acme": profile}
+
+        csv_path = tmp_path / "acme.csv"
+        csv_path.write_text("Ref;Product Name;PRICE;Qty;Alt Desc;Description\n"
+                            "ACME-1;Anvil;99.00;4;Heavy;ignored\n", encoding="utf-8")
+        feed = CSVProductFeed(str(csv_path), profile=db_manager.get_import_profiles()["Acme"])
+        rows = list(feed.rows())
+        assert rows == [{'name': 'Anvil', 'price': 99.0, 'cost_price': 0.0, 'quantity': 0,
+                         'min_quantity': 5, 'barcode': 'ACME-1', 'category': None,
+                         'description': 'Heavy', 'row': 2}]
+
+        db_manager.delete_import_profile("Acme")
+        assert db_manager.get_import_profiles() == {}
+
+    def test_parallel_feed(self, db_manager, tmp_path):
+        """Test parallel parsing splits on record boundaries and keeps file order"""
+        from database.product_feed import CSVProductFeed, split_records
+
+        csv_path = tmp_path / "catalog.csv"
+        lines = ["Name,Price,Qty,SKU,Description"]
+        for i in range(3000):
+            description = f'"Line one\nline ""two"" of {i}"' if i % 7 == 0 else f"Plain {i}"
+            lines.append(f"Catalog Product {i},{i % 90 + 1}.50,{i},CAT{i:07d},{description}")
+            if i % 500 == 0:
+                lines.append("")
+        csv_path.write_text("\r\n".join(lines) + "\r\n", encoding="utf-8")
+
+        ranges = list(split_records(str(csv_path), 0, 4096))
+        assert len(ranges) > 10
+        assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+        serial = list(CSVProductFeed(str(csv_path)).rows())
+        parallel = CSVProductFeed(str(csv_path), workers=2, chunk_bytes=4096)
+        assert list(parallel.rows()) == serial
+        assert parallel.position() == (parallel.size, parallel.size)
+        assert serial[7]['description'] == 'Line one\nline "two" of 7'
+        assert list(parallel.rows(start_after=serial[-10]['row'] - 1)) == serial[-10:]
+
+        result = db_manager.import_product_feed(parallel, chunk_size=1000)
+        assert result['imported'] == 3000 and result['error_count'] == 0
+        assert len(db_manager.get_products(search_term="Catalog Product")) == 3000
+
+    def test_parallel_feed_stray_quotes(self, tmp_path):
+        """Test parallel parsing matches a serial parse when unquoted cells contain quotes"""
+        from database.product_feed import CSVProductFeed
+
+        for header in ("Name,Price,Qty,SKU,Description", 'Name,Price,Qty,SKU,Description,Size"'):
+            csv_path = tmp_path / "stray.csv"
+            lines = [header]
+            for i in range(3000):
+                if i % 7 == 0:
+                    description = f'"Line one\nline ""two"" of {i}"'
+                elif i % 45 == 0:
+                    description = f'Screen 12" wide {i}'  # a lone quote, kept literally
+                else:
+                    description = f"Plain {i}"
+                lines.append(f"Stray Product {i},{i % 90 + 1}.50,{i},STR{i:07d},{description}")
+            csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+            serial = list(CSVProductFeed(str(csv_path)).rows())
+            assert len(serial) == 3000 and serial[45]['description'] == 'Screen 12" wide 45'
+            parallel = CSVProductFeed(str(csv_path), workers=2, chunk_bytes=4096)
+            assert list(parallel.rows()) == serial
+            assert list(parallel.rows(start_after=serial[2000]['row'])) == serial[2001:]
+
+    def test_xlsx_feed(self, db_manager, tmp_path):
+        """Test streaming an Excel workbook through the import pipeline"""
+        from openpyxl import Workbook
+        from database.product_feed import XLSXProductFeed, open_product_feed
+
+        xlsx_path = tmp_path / "supplier.xlsx"
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Products")
+        sheet.append(["Product Name", "Price", "Qty", "Barcode", "Category"])
+        for i in range(1200):
+            sheet.append([f"Sheet Product {i}", i % 20 + 0.75, float(i), 4000000000000 + i, "Books"])
+        sheet.append([None, None, None, None, None])
+        sheet.append(["No Price", None, 1, "XLNOPRICE", None])
+        workbook.save(xlsx_path)
+
+        feed = open_product_feed(str(xlsx_path))
+        assert isinstance(feed, XLSXProductFeed)
+        assert feed.header() == ["Product Name", "Price", "Qty", "Barcode", "Category"]
+        first = next(feed.rows())
+        assert first == {'name': 'Sheet Product 0', 'price': 0.75, 'cost_price': 0.0, 'quantity': 0,
+                         'min_quantity': 5, 'barcode': '4000000000000', 'category': 'Books',
+                         'description': '', 'row': 2}
+
+        result = db_manager.import_product_feed(feed, chunk_size=500)
+        assert result['imported'] == 1200
+        assert result['error_count'] == 1 and result['errors'][0]['row'] == 1203
+        assert feed.position() == (feed.size, feed.size)
+
+        product = db_manager.get_product_by_barcode('4000000001199')
+        assert product['name'] == 'Sheet Product 1199' and product['quantity'] == 1199
+
+    def test_upsert_by_barcode(self, db_manager, sample_product, tmp_path):
+        """Test re-importing a price file updates products in place"""
+        from database.product_feed import CSVProductFeed
+
+        db_manager.create_product(sample_product)
+        db_manager.import_products([make_row(i) for i in range(5)])
+        before = {p['barcode']: p for p in db_manager.get_products()}
+        db_manager.preload_product_cache()
+
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE products SET updated_at = '2000-01-01 00:00:00'")
+        conn.commit()
+        conn.close()
+
+        csv_path = tmp_path / "prices.csv"
+        csv_path.write_text("Name,Price,Qty,SKU\n"
+                            "Imported Product 0,2.50,10,IMP00000000\n"   # unchanged
+                            "Imported Product 1,3.75,10,IMP00000001\n"   # new price
+                            "Imported Product 2,2.50,42,IMP00000002\n"   # new stock
+                            "Test Product,12.00,100,1234567890123\n"     # existing product
+                            "Brand New,5.00,1,NEW00000001\n"
+                            "Brand New Again,6.00,2,NEW00000001\n",      # repeated barcode
+                            encoding="utf-8")
+
+        result = db_manager.import_product_feed(CSVProductFeed(str(csv_path)), upsert=True, chunk_size=4)
+        assert result['imported'] == 1
+        assert result['updated'] == 4
+        assert result['unchanged'] == 1
+        assert result['error_count'] == 0
+
+        after = {p['barcode']: p for p in db_manager.get_products()}
+        assert after['IMP00000001']['id'] == before['IMP00000001']['id']
+        assert after['IMP00000001']['price'] == 3.75
+        assert after['IMP00000002']['quantity'] == 42
+        assert after['NEW00000001']['name'] == "Brand New Again"
+        # Columns the file does not map are left alone
+        assert after['IMP00000001']['category_name'] == 'Supplier Category 1'
+        assert after['1234567890123']['description'] == sample_product['description']
+
+        assert after['IMP00000000']['updated_at'] == '2000-01-01 00:00:00'
+        assert after['IMP00000001']['updated_at'] != '2000-01-01 00:00:00'
+        assert db_manager.product_cache.get('IMP00000002')['quantity'] == 42
+
+    def test_upsert_keeps_blank_fields(self, db_manager, tmp_path):
+        """Test blank cells in an update import keep the stored values"""
+        from database.product_feed import CSVProductFeed
+
+        product_id = db_manager.create_product({
+            'name': 'Widget', 'barcode': 'W1', 'price': 5.00, 'cost_price': 3.00,
+            'quantity': 40, 'min_quantity': 8, 'category_id': 1, 'description': 'keep me'
+        })
+
+        csv_path = tmp_path / "prices.csv"
+        csv_path.write_text("Name,Price,Cost,Qty,SKU,Category,Description\n"
+                            "Widget,6.00,,,W1,,\n"
+                            "Gadget,2.00,,,G1,,\n",
+                            encoding="utf-8")
+
+        result = db_manager.import_product_feed(CSVProductFeed(str(csv_path)), upsert=True)
+        assert result['updated'] == 1 and result['imported'] == 1
+
+        widget = db_manager.get_product_by_id(product_id)
+        assert widget['price'] == 6.00
+        assert widget['cost_price'] == 3.00
+        assert widget['quantity'] == 40
+        assert widget['min_quantity'] == 8
+        assert widget['category_id'] == 1
+        assert widget['description'] == 'keep me'
+
+        # New products still get the usual defaults
+        gadget = db_manager.get_product_by_barcode('G1')
+        assert (gadget['cost_price'], gadget['quantity'], gadget['min_quantity'], gadget['description']) == (0, 0, 5, '')
+
+        # Re-importing the same file changes nothing
+        result = db_manager.import_product_feed(CSVProductFeed(str(csv_path)), upsert=True)
+        assert result['unchanged'] == 2 and result['updated'] == 0 and result['imported'] == 0
@@ -109,3 +109,250 @@ class TestPOSFunctionality:
         assert test_sale is not None
         assert test_sale['total_amount'] == 15.00
         assert test_sale['cashier_name'] == 'Report Test User'
+    
+    def test_sales_report_pagination(self, db_manager):
+        """Test keyset pagination and count-only sales reports"""
+        for i in range(5):
+            db_manager.create_sale({
+                'sale_number': f"SALE-PAGE-{i}",
+                'user_id': 1,
+                'subtotal': 10.00,
+                'tax_amount': 0.00,
+                'discount_amount': 0.00,
+                'total_amount': 10.00,
+                'payment_method': 'cash'
+            }, [])
+        
+        # Sale timestamps are stored by SQLite in UTC
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        assert db_manager.get_sales_report(today, today, count_only=True) == 5
+        
+        first_page = db_manager.get_sales_report(today, today, limit=3)
+        second_page = db_manager.get_sales_report(today, today, after_id=first_page[-1]['id'], limit=3)
+        assert len(first_page) == 3
+        assert len(second_page) == 2
+        
+        ids = [s['id'] for s in first_page + second_page]
+        assert ids == sorted(ids, reverse=True)
+        
+        summary = db_manager.get_sales_summary(today, today)
+        assert summary['transactions'] == 5
+        assert summary['total_amount'] == 50.00
+        
+        # Date ranges that exclude today return nothing
+        assert db_manager.get_sales_report('2000-01-01', '2000-12-31', count_only=True) == 0
+    
+    def test_barcode_cache_write_through(self, db_manager):
+        """Test that the barcode cache follows product and stock changes"""
+        product_id = db_manager.create_product({
+            'name': 'Cached Product',
+            'barcode': '5555555555555',
+            'price': 4.00,
+            'quantity': 10
+        })
+        db_manager.preload_product_cache()
+        assert db_manager.product_cache.get('5555555555555')['quantity'] == 10
+        
+        # Stock changes from sales and manual adjustments are reflected
+        db_manager.create_sale({
+            'sale_number': f"SALE-CACHE-{str(uuid.uuid4())[:8].upper()}",
+            'user_id': 1,
+            'subtotal': 12.00,
+            'tax_amount': 0.00,
+            'discount_amount': 0.00,
+            'total_amount': 12.00,
+            'payment_method': 'cash'
+        }, [{'product_id': product_id, 'quantity': 3, 'unit_price': 4.00, 'total_price': 12.00}])
+        assert db_manager.get_product_by_barcode('5555555555555')['quantity'] == 7
+        
+        db_manager.update_product_quantity(product_id, 5)
+        assert db_manager.get_product_by_barcode('5555555555555')['quantity'] == 12
+        
+        # Barcode edits move the cache entry
+        product = db_manager.get_product_by_id(product_id)
+        product['barcode'] = '6666666666666'
+        db_manager.update_product(product_id, product)
+        assert db_manager.get_product_by_barcode('5555555555555') is None
+        assert db_manager.product_cache.get('6666666666666')['name'] == 'Cached Product'
+        
+        # Deactivated products can no longer be scanned
+        db_manager.deactivate_product(product_id)
+        assert db_manager.product_cache.get('6666666666666') is None
+        assert db_manager.get_product_by_barcode('6666666666666') is None
+    
+    def test_sale_stock_guard(self, db_manager):
+        """Test that a sale never drives stock negative and is all-or-nothing"""
+        from database.database_manager import InsufficientStockError
+        
+        plenty_id = db_manager.create_product({'name': 'Plenty', 'price': 1.00, 'quantity': 50})
+        scarce_id = db_manager.create_product({'name': 'Scarce', 'price': 1.00, 'quantity': 3})
+        
+        sale_number = f"SALE-GUARD-{str(uuid.uuid4())[:8].upper()}"
+        sale_data = {
+            'sale_number': sale_number,
+            'user_id': 1,
+            'subtotal': 9.00,
+            'tax_amount': 0.00,
+            'discount_amount': 0.00,
+            'total_amount': 9.00,
+            'payment_method': 'cash'
+        }
+        # Two lines of the same product add up to more than is in stock
+        sale_items = [
+            {'product_id': plenty_id, 'quantity': 5, 'unit_price': 1.00, 'total_price': 5.00},
+            {'product_id': scarce_id, 'quantity': 2, 'unit_price': 1.00, 'total_price': 2.00},
+            {'product_id': scarce_id, 'quantity': 2, 'unit_price': 1.00, 'total_price': 2.00},
+        ]
+        
+        with pytest.raises(InsufficientStockError) as exc_info:
+            db_manager.create_sale(sale_data, sale_items, activity=("sale_completed", sale_number))
+        
+        assert exc_info.value.failures == [
+            {'product_id': scarce_id, 'name': 'Scarce', 'requested': 4, 'available': 3}
+        ]
+        
+        # Nothing was written
+        assert db_manager.get_product_by_id(plenty_id)['quantity'] == 50
+        assert db_manager.get_product_by_id(scarce_id)['quantity'] == 3
+        conn = db_manager.get_connection()
+        assert conn.execute('SELECT COUNT(*) FROM sales WHERE sale_number = ?', (sale_number,)).fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM activity_logs WHERE details = ?", (sale_number,)).fetchone()[0] == 0
+        
+        # A sale that fits is recorded together with its activity entry
+        sale_id = db_manager.create_sale(sale_data, sale_items[:2], activity=("sale_completed", sale_number))
+        assert sale_id > 0
+        assert db_manager.get_product_by_id(scarce_id)['quantity'] == 1
+        assert conn.execute("SELECT COUNT(*) FROM activity_logs WHERE details = ?", (sale_number,)).fetchone()[0] == 1
+    
+    def test_group_commit_sales(self, db_manager):
+        """Test that group-committed sales from several lanes are all recorded"""
+        from concurrent.futures import ThreadPoolExecutor
+        from database.database_manager import InsufficientStockError
+        
+        product_id = db_manager.create_product({'name': 'Lane Product', 'price': 1.00, 'quantity': 20})
+        db_manager.enable_group_commit(max_delay=0.2)
+        writer = db_manager.sale_writer
+        
+        def checkout(lane):
+            sale_data = {
+                'sale_number': f"SALE-LANE-{lane}",
+                'user_id': 1,
+                'subtotal': 2.00,
+                'tax_amount': 0.00,
+                'discount_amount': 0.00,
+                'total_amount': 2.00,
+                'payment_method': 'cash'
+            }
+            items = [{'product_id': product_id, 'quantity': 2, 'unit_price': 1.00, 'total_price': 2.00}]
+            try:
+                return db_manager.create_sale(sale_data, items)
+            except InsufficientStockError:
+                return None
+        
+        try:
+            with ThreadPoolExecutor(max_workers=12) as pool:
+                sale_ids = list(pool.map(checkout, range(12)))
+            
+            # The writer's connection fsyncs every commit (FULL = 2)
+            assert 2 in [c.execute("PRAGMA synchronous").fetchone()[0] for c in db_manager._connections]
+        finally:
+            db_manager.disable_group_commit()
+        
+        # Concurrent lanes shared transactions instead of committing one by one
+        assert writer.largest_batch > 1
+        
+        # 20 units cover exactly 10 sales; the other two are rejected on their own
+        committed = [sale_id for sale_id in sale_ids if sale_id]
+        assert len(committed) == 10
+        assert len(set(committed)) == 10
+        assert db_manager.get_product_by_id(product_id)['quantity'] == 0
+        
+        conn = db_manager.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM sales WHERE sale_number LIKE 'SALE-LANE-%'").fetchone()[0] == 10
+    
+    def test_sales_archiving(self, db_manager, tmp_path):
+        """Test that closed years move to archive files and stay reportable"""
+        import os
+        from database.archive import ArchiveError, archive_path
+        
+        product_id = db_manager.create_product({'name': 'Archive Product', 'price': 5.00, 'quantity': 50})
+        for i, created_at in enumerate(['2022-03-01 10:00:00', '2022-11-30 18:00:00', '2023-06-15 12:00:00']):
+            sale_id = db_manager.create_sale({
+                'sale_number': f"SALE-ARCHIVE-{i}",
+                'user_id': 1,
+                'subtotal': 5.00,
+                'tax_amount': 0.00,
+                'discount_amount': 0.00,
+                'total_amount': 5.00,
+                'payment_method': 'cash'
+            }, [{'product_id': product_id, 'quantity': 1, 'unit_price': 5.00, 'total_price': 5.00}])
+            with db_manager.transaction() as conn:
+                conn.execute("UPDATE sales SET created_at = ? WHERE id = ?", (created_at, sale_id))
+        
+        archive_2022 = archive_path(db_manager.db_path, 2022)
+        before_archiving = str(tmp_path / "before.db")
+        assert db_manager.create_backup(before_archiving)['archives'] == []
+        try:
+            from database.archive import archive_closed_years
+            # One sale per transaction
+            moved = archive_closed_years(db_manager, keep_years=2, today=datetime(2024, 2, 1), batch_size=1)
+            assert list(moved) == [2022]
+            assert moved[2022]['sales'] == 2
+            assert moved[2022]['sale_items'] == 2
+            assert os.path.exists(archive_2022)
+            
+            conn = db_manager.get_connection()
+            assert conn.execute("SELECT COUNT(*) FROM sales WHERE created_at < '2023-01-01'").fetchone()[0] == 0
+            assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 1
+            
+            # Reports reach into the archive only for ranges that need it
+            assert db_manager.get_sales_report('2022-01-01', '2022-12-31', count_only=True) == 2
+            assert db_manager.get_sales_summary('2022-01-01', '2023-12-31')['transactions'] == 3
+            
+            first_page = db_manager.get_sales_report('2022-01-01', '2023-12-31', limit=2)
+            second_page = db_manager.get_sales_report('2022-01-01', '2023-12-31',
+                                                      after_id=first_page[-1]['id'], limit=2)
+            assert [s['sale_number'] for s in first_page + second_page] == [
+                'SALE-ARCHIVE-2', 'SALE-ARCHIVE-1', 'SALE-ARCHIVE-0']
+            
+            # Running the job again is a no-op
+            assert archive_closed_years(db_manager, keep_years=2, today=datetime(2024, 2, 1)) == {}
+            
+            # Archives stay attached only while a snapshot needs them
+            with db_manager.snapshot() as conn:
+                db_manager._sales_source(conn, '2022-01-01', '2023-01-01')
+                assert 'archive_2022' in [row[1] for row in conn.execute("PRAGMA database_list")]
+            assert 'archive_2022' not in [row[1] for row in conn.execute("PRAGMA database_list")]
+            
+            # A needed archive that cannot be attached (SQLite allows 10) is an
+            # error, not a short report
+            too_many = [archive_path(db_manager.db_path, year) for year in range(2010, 2020)]
+            try:
+                for path in too_many:
+                    open(path, 'wb').close()
+                with pytest.raises(ArchiveError):
+                    db_manager.get_sales_report('2010-01-01', '2022-12-31', count_only=True)
+                assert db_manager.get_sales_report('2022-01-01', '2022-12-31', count_only=True) == 2
+            finally:
+                for path in too_many:
+                    os.remove(path)
+            
+            # A backup taken before archiving brings the 2022 sales back into
+            # the main table; reports still count them once
+            db_manager.restore_backup(before_archiving)
+            assert db_manager.get_sales_report('2022-01-01', '2022-12-31', count_only=True) == 2
+            
+            # Backups carry the archives, and restoring puts them back
+            archive_closed_years(db_manager, keep_years=2, today=datetime(2024, 2, 1))
+            after_archiving = str(tmp_path / "after.db")
+            copies = db_manager.create_backup(after_archiving)['archives']
+            assert copies == [archive_path(after_archiving, 2022)]
+            os.remove(archive_2022)
+            
+            result = db_manager.restore_backup(after_archiving)
+            assert result['archives'] == [2022]
+            assert db_manager.get_sales_report('2022-01-01', '2022-12-31', count_only=True) == 2
+        finally:
+            db_manager.close()
+            if os.path.exists(archive_2022):
+                os.remove(archive_2022)